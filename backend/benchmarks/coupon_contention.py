@@ -0,0 +1,97 @@
+"""Contention benchmark for coupon redemption counters.
+
+Runs concurrent redemptions of one coupon, each inside a transaction that stays
+open for ``--hold-ms`` to mimic the rest of ``OrderSerializer.create``, with the
+classic single-row counter and with sharded slots. Uses a throwaway test
+database, so it is safe to run against any configured DATABASES entry::
+
+    cd backend
+    python -m benchmarks.coupon_contention --threads 16 --redemptions 50 --shards 16
+
+Requires PostgreSQL: SQLite serializes every write, so there is no row contention to measure.
+"""
+import argparse
+import os
+import threading
+import time
+
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supermercado.settings')
+    import django
+
+    django.setup()
+
+
+def _run(mode, threads, redemptions, shards, hold_ms):
+    from decimal import Decimal
+
+    from django.db import close_old_connections, connection, transaction
+
+    from shop.coupons import get_redeemed_count, redeem_coupon
+    from shop.models import Coupon
+
+    coupon = Coupon.objects.create(
+        code=f'BENCH-{mode}-{time.time_ns()}',
+        type=Coupon.TYPE_FIXED,
+        amount=Decimal('1'),
+        usage_limit=threads * redemptions,
+        counter_shards=shards if mode == 'sharded' else 0,
+    )
+    barrier = threading.Barrier(threads + 1)
+    failures = []
+
+    def worker():
+        close_old_connections()
+        barrier.wait()
+        try:
+            for _ in range(redemptions):
+                with transaction.atomic():
+                    if not redeem_coupon(coupon):
+                        failures.append(1)
+                    time.sleep(hold_ms / 1000)
+        finally:
+            connection.close()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    coupon.refresh_from_db()
+    total = threads * redemptions
+    print(
+        f'{mode:8s} redemptions={total} elapsed={elapsed:.2f}s '
+        f'throughput={total / elapsed:.0f}/s failed={len(failures)} '
+        f'counted={get_redeemed_count(coupon)}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--redemptions', type=int, default=50, help='Por hilo')
+    parser.add_argument('--shards', type=int, default=16)
+    parser.add_argument('--hold-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    _setup_django()
+    from django.db import connection
+
+    if connection.vendor != 'postgresql':
+        raise SystemExit('Este benchmark requiere PostgreSQL (configurar DATABASE_URL).')
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        for mode in ('classic', 'sharded'):
+            _run(mode, args.threads, args.redemptions, args.shards, args.hold_ms)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""Benchmark: latency and SQL query counts of the main API endpoints.
+
+Seeds a throwaway test database with ``shop.dataset`` (a catalog and 60 days
+of orders), then sends each scenario through the Django test client (the full
+middleware and DRF stack, no network) and records the latency distribution and the number of
+queries. Results are compared with the baselines stored in
+``benchmarks/baselines/endpoints.json``: the run fails (exit status 1) when a
+scenario runs more queries than its budget or its median latency regresses by
+more than ``--tolerance``::
+
+    cd backend
+    python -m benchmarks.endpoints
+    python -m benchmarks.endpoints --only search_accented --iterations 200
+    python -m benchmarks.endpoints --update-baseline   # after an intended change
+
+Baselines are kept per database vendor. Query budgets are exact and portable;
+latencies depend on the machine, so compare them on the same host (or use a
+generous tolerance in CI).
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASELINE_FILE = Path(__file__).resolve().parent / 'baselines' / 'endpoints.json'
+# Latency regressions smaller than this are noise whatever the ratio
+MIN_REGRESSION_MS = 2.0
+
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supermercado.settings')
+    import django
+
+    django.setup()
+
+
+def _populate(products, orders, seed):
+    from django.contrib.auth.models import User
+
+    from shop.dataset import generate_dataset
+    from shop.models import Category
+
+    catalog = generate_dataset(
+        categories=20, products=products, orders=orders, coupons=10, seed=seed, days=60, images=False
+    )
+    User.objects.create_user('bench-staff', password='x', is_staff=True)
+    return catalog, list(Category.objects.order_by('id'))
+
+
+def _scenarios(catalog, categories, rng):
+    from django.contrib.auth.models import User
+
+    from shop.analytics import invalidate_sales_stats_cache
+
+    in_stock = [p for p in catalog if p.is_active and p.stock > 100]
+    staff = User.objects.get(username='bench-staff')
+
+    def checkout(i):
+        items = [{'product_id': p.id, 'quantity': rng.randint(1, 3)} for p in rng.sample(in_stock, 3)]
+        return {
+            'name': 'Bench', 'phone': '351', 'address': 'Calle 1', 'payment_method': 'cash',
+            'delivery_method': 'pickup', 'items': items,
+        }
+
+    # name: (method, path, body factory or None, staff login, untimed setup before each request)
+    return {
+        'product_list': ('get', '/api/products/', None, False, None),
+        'product_list_page_5': ('get', '/api/products/?page=5', None, False, None),
+        'search_accented': ('get', '/api/products/?search=az%C3%BAcar', None, False, None),
+        'search_unaccented': ('get', '/api/products/?search=azucar', None, False, None),
+        'category_filter': ('get', f'/api/products/?category={categories[0].id}', None, False, None),
+        'config': ('get', '/api/config/', None, False, None),
+        'announcements': ('get', '/api/announcements/', None, False, None),
+        'coupon_validate': ('post', '/api/coupons/validate/', lambda i: {'code': 'promo00000'}, False, None),
+        'order_create': ('post', '/api/orders/', checkout, False, None),
+        'sales_stats': ('get', '/api/stats/sales/?top=20', None, staff, None),
+        'sales_stats_cold': ('get', '/api/stats/sales/?top=20', None, staff, invalidate_sales_stats_cache),
+    }
+
+
+def _measure(client, scenario, iterations, warmup):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    method, path, body, staff, setup = scenario
+    if staff:
+        client.force_login(staff)
+    else:
+        client.logout()
+    timings, queries = [], []
+    for i in range(warmup + iterations):
+        if setup:
+            setup()
+        # Throttling stays in the path (its queries count) but each request comes from a new address
+        kwargs = {'REMOTE_ADDR': f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}'}
+        if body:
+            kwargs.update(data=json.dumps(body(i)), content_type='application/json')
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method.upper()} {path} -> {response.status_code}: {response.content[:200]!r}')
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+    timings.sort()
+    return {
+        'queries': max(queries),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+        'max_ms': round(timings[-1], 2),
+    }
+
+
+def _compare(results, baseline, tolerance):
+    failures = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            failures.append(f'{name}: {result["queries"]} queries, budget {base["queries"]}')
+        limit = base['p50_ms'] * (1 + tolerance)
+        if result['p50_ms'] > limit and result['p50_ms'] - base['p50_ms'] > MIN_REGRESSION_MS:
+            failures.append(f'{name}: p50 {result["p50_ms"]} ms, baseline {base["p50_ms"]} ms (+{tolerance:.0%} allowed)')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed p50 regression (0.5 = +50%%)')
+    parser.add_argument('--only', nargs='+', help='Run only these scenarios')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--update-baseline', action='store_true', help='Write the results as the new baseline')
+    args = parser.parse_args()
+
+    _setup_django()
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    logging.getLogger('shop.perf').setLevel(logging.WARNING)
+    # EXPLAINs from the slow query log would show up in the query counts
+    settings.SLOW_QUERY_THRESHOLD_MS = 0
+    # Nor the periodic re-read of the shared cache version stamps
+    settings.CACHE_VERSION_CHECK_SECONDS = float('inf')
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        cache.clear()
+        started = time.perf_counter()
+        catalog, categories = _populate(args.products, args.orders, args.seed)
+        print(f'populate {time.perf_counter() - started:.1f}s  products={args.products} orders={args.orders}')
+
+        scenarios = _scenarios(catalog, categories, random.Random(args.seed))
+        names = args.only or list(scenarios)
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+        client = Client()
+        results = {}
+        print(f'{"scenario":22s} {"queries":>7s} {"p50 ms":>8s} {"p95 ms":>8s} {"max ms":>8s}')
+        for name in names:
+            results[name] = _measure(client, scenarios[name], args.iterations, args.warmup)
+            r = results[name]
+            print(f'{name:22s} {r["queries"]:7d} {r["p50_ms"]:8.2f} {r["p95_ms"]:8.2f} {r["max_ms"]:8.2f}')
+        vendor = connection.vendor
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    baselines = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+    dataset = {'products': args.products, 'orders': args.orders, 'seed': args.seed}
+    if args.update_baseline:
+        stored = baselines.setdefault(vendor, {'dataset': dataset, 'scenarios': {}})
+        stored['dataset'] = dataset
+        stored['scenarios'].update(results)
+        BASELINE_FILE.parent.mkdir(exist_ok=True)
+        BASELINE_FILE.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+        print(f'baseline written to {BASELINE_FILE}')
+        return
+
+    stored = baselines.get(vendor)
+    if stored is None:
+        print(f'no {vendor} baseline; run with --update-baseline to create one')
+        return
+    if stored['dataset'] != dataset:
+        print(f'warning: baseline dataset is {stored["dataset"]}, latencies are not comparable')
+    failures = _compare(results, stored['scenarios'], tolerance=args.tolerance)
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+    print('OK: within query budgets and latency baselines')
+
+
+if __name__ == '__main__':
+    main()
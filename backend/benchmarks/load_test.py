@@ -0,0 +1,362 @@
+"""Load test: concurrent shoppers against a locally started gunicorn server.
+
+Prepares a database (a temporary SQLite file by default, or ``--database-url``),
+fills it with ``shop.dataset`` when it has no products, starts gunicorn on it
+and lets ``--users`` simulated shoppers replay a weighted traffic mix for
+``--duration`` seconds with a stdlib asyncio HTTP client:
+
+- home: config, announcements, categories and promoted products;
+- browse: a random page of the catalog, sometimes by category or best sellers;
+- search: accented and unaccented terms;
+- coupon: coupon validation;
+- checkout: an order of 1-5 of the best-selling products (so orders contend).
+
+Each shopper has its own X-Forwarded-For address, so throttling applies per
+shopper as it would behind the proxy. The report has throughput, p50/p95/p99
+per endpoint, error and 429 rates, and a stock consistency check: for every
+product, the stock before minus the units in orders created during the run
+must equal the stock after::
+
+    cd backend
+    python -m benchmarks.load_test --users 50 --duration 60 --workers 4
+    python -m benchmarks.load_test --database-url postgres://.../loadtest --workers 8 --threads 4
+
+SQLite serializes writes, so checkout numbers on it say little about PostgreSQL.
+Use a scratch database: the run creates orders and changes stock.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from urllib.parse import quote
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+MIX = {'home': 25, 'browse': 30, 'search': 20, 'coupon': 10, 'checkout': 15}
+SEARCH_TERMS = ['azúcar', 'azucar', 'café', 'cafe', 'leche', 'jabón', 'jabon', 'limón', 'yerba', 'pañales', 'fideos']
+HOT_PRODUCTS = 200
+REQUEST_TIMEOUT = 30
+
+
+class HttpClient:
+    """Minimal HTTP/1.1 client on asyncio streams: JSON bodies, keep-alive when the server allows it."""
+
+    def __init__(self, host, port, headers=None):
+        self.host, self.port = host, port
+        self.headers = headers or {}
+        self.reader = self.writer = None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        reused = self.writer is not None
+        if not reused:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            return await self._exchange(method, path, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            if not reused:
+                raise
+            # The server closed an idle keep-alive connection; retry once on a new one
+            return await self.request(method, path, body)
+
+    async def _exchange(self, method, path, body):
+        payload = json.dumps(body).encode() if body is not None else b''
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Accept: application/json',
+            f'Content-Length: {len(payload)}',
+        ]
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        lines += [f'{name}: {value}' for name, value in self.headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed')
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while size := int((await self.reader.readline()).split(b';')[0], 16):
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            await self.reader.readline()
+            data = b''.join(chunks)
+        elif 'content-length' in headers:
+            data = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            data = await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, data
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, label, status, elapsed):
+        self.latencies[label].append(elapsed * 1000)
+        self.statuses[label][status] += 1
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class Shopper:
+    def __init__(self, number, client, plan, stats, rng, think):
+        self.number, self.client, self.plan = number, client, plan
+        self.stats, self.rng, self.think = stats, rng, think
+
+    async def call(self, label, method, path, body=None):
+        started = time.perf_counter()
+        try:
+            status, _ = await asyncio.wait_for(self.client.request(method, path, body), REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.client.close()
+            status = 'timeout'
+        except OSError:
+            self.client.close()
+            status = 'error'
+        self.stats.record(label, status, time.perf_counter() - started)
+        return status
+
+    async def home(self):
+        await self.call('config', 'GET', '/api/config/')
+        await self.call('announcements', 'GET', '/api/announcements/')
+        await self.call('categories', 'GET', '/api/categories/')
+        await self.call('promoted', 'GET', '/api/products/?promoted=true')
+
+    async def browse(self):
+        path = f'/api/products/?page={self.rng.randint(1, self.plan["pages"])}'
+        roll = self.rng.random()
+        if roll < 0.3:
+            path = f'/api/products/?category={self.rng.choice(self.plan["categories"])}'
+        elif roll < 0.5:
+            path += '&ordering=-popularity'
+        await self.call('browse', 'GET', path)
+
+    async def search(self):
+        await self.call('search', 'GET', f'/api/products/?search={quote(self.rng.choice(SEARCH_TERMS))}')
+
+    async def coupon(self):
+        code = self.rng.choice(self.plan['coupons'])
+        await self.call('coupon_validate', 'POST', '/api/coupons/validate/', {'code': code})
+
+    async def checkout(self):
+        products = self.rng.sample(self.plan['hot'], self.rng.randint(1, 5))
+        order = {
+            'name': f'Cliente {self.number}',
+            'phone': '3510000000',
+            'payment_method': 'cash',
+            'delivery_method': 'pickup',
+            'items': [{'product_id': pk, 'quantity': self.rng.randint(1, 3)} for pk in products],
+        }
+        if self.rng.random() < 0.2:
+            order['coupon_code'] = self.rng.choice(self.plan['coupons'])
+        await self.call('checkout', 'POST', '/api/orders/', order)
+
+    async def run(self, start_at, deadline):
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(max(start_at - loop.time(), 0))
+        actions = list(MIX)
+        weights = list(MIX.values())
+        try:
+            while loop.time() < deadline:
+                await getattr(self, self.rng.choices(actions, weights)[0])()
+                if self.think:
+                    await asyncio.sleep(self.rng.expovariate(1 / self.think))
+        finally:
+            self.client.close()
+
+
+async def _run_load(port, plan, args):
+    stats = Stats()
+    loop = asyncio.get_running_loop()
+    begin = loop.time()
+    deadline = begin + args.ramp_up + args.duration
+    shoppers = [
+        Shopper(
+            n,
+            HttpClient('127.0.0.1', port, {'X-Forwarded-For': f'10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}'}),
+            plan,
+            stats,
+            random.Random(args.seed * 100_003 + n),
+            args.think,
+        )
+        for n in range(args.users)
+    ]
+    await asyncio.gather(*(
+        shopper.run(begin + args.ramp_up * n / args.users, deadline) for n, shopper in enumerate(shoppers)
+    ))
+    return stats, loop.time() - begin
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(port, args, env, log_path):
+    command = [
+        sys.executable, '-m', 'gunicorn', 'supermercado.wsgi:application',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(args.workers),
+        '--threads', str(args.threads),
+        '--timeout', '60',
+    ]
+    log = open(log_path, 'w')
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with {server.returncode}, see {log_path}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f'gunicorn did not start listening, see {log_path}')
+
+
+def _prepare(args):
+    from django.core.management import call_command
+    from django.db.models import Max
+
+    from shop.dataset import generate_dataset
+    from shop.models import Category, Coupon, Order, Product
+    from shop.views import ProductPagination
+
+    call_command('migrate', verbosity=0)
+    if not Product.objects.exists():
+        started = time.perf_counter()
+        generate_dataset(
+            categories=50, products=args.products, orders=args.orders, coupons=50, seed=args.seed, images=False
+        )
+        print(f'dataset  {time.perf_counter() - started:.1f}s  products={args.products} orders={args.orders}')
+    active = Product.objects.filter(is_active=True)
+    return {
+        'pages': max(1, -(-active.count() // ProductPagination.page_size)),
+        'categories': list(Category.objects.values_list('id', flat=True)),
+        'coupons': list(Coupon.objects.filter(active=True).values_list('code', flat=True)[:50]) or ['SINCUPON'],
+        'hot': list(active.filter(stock__gt=0).order_by('-popularity', 'id').values_list('id', flat=True)[:HOT_PRODUCTS]),
+        'stock': dict(Product.objects.values_list('id', 'stock')),
+        'last_order': Order.objects.aggregate(last=Max('id'))['last'] or 0,
+    }
+
+
+def _check_stock(plan):
+    from django.db.models import Sum
+
+    from shop.models import Order, OrderItem, Product
+
+    sold = dict(
+        OrderItem.objects.filter(order_id__gt=plan['last_order'])
+        .values_list('product_id')
+        .annotate(units=Sum('quantity'))
+    )
+    mismatched = [
+        (pk, plan['stock'][pk], sold.get(pk, 0), stock)
+        for pk, stock in Product.objects.filter(id__in=plan['stock']).values_list('id', 'stock')
+        if plan['stock'][pk] - sold.get(pk, 0) != stock
+    ]
+    return Order.objects.filter(id__gt=plan['last_order']).count(), sold, mismatched
+
+
+def _report(stats, elapsed, orders, sold, mismatched):
+    total = sum(len(v) for v in stats.latencies.values())
+    print(f'\n{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s')
+    print(f'{"endpoint":16s} {"requests":>8s} {"req/s":>7s} {"p50 ms":>8s} {"p95 ms":>8s} {"p99 ms":>8s} {"errors":>7s} {"429":>7s}')
+    for label in sorted(stats.latencies):
+        values = sorted(stats.latencies[label])
+        statuses = stats.statuses[label]
+        count = len(values)
+        errors = sum(n for status, n in statuses.items() if not isinstance(status, int) or status >= 500)
+        print(
+            f'{label:16s} {count:8d} {count / elapsed:7.1f} {statistics.median(values):8.1f} '
+            f'{_percentile(values, 0.95):8.1f} {_percentile(values, 0.99):8.1f} '
+            f'{errors / count:7.1%} {statuses[429] / count:7.1%}'
+        )
+    checkout = stats.statuses.get('checkout', Counter())
+    print(f'\ncheckout statuses: {dict(sorted(checkout.items(), key=str))}')
+    print(f'orders created: {orders} (201 responses: {checkout[201]}), units sold: {sum(sold.values())}')
+    if mismatched:
+        print(f'STOCK INCONSISTENT for {len(mismatched)} products (id, before, sold, after):')
+        for row in mismatched[:20]:
+            print(f'  {row}')
+    else:
+        print('stock consistent: before - sold == after for every product')
+    return not mismatched and orders == checkout[201]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=60, help='Seconds at full load')
+    parser.add_argument('--ramp-up', type=float, default=10, help='Seconds to start all shoppers')
+    parser.add_argument('--think', type=float, default=1.0, help='Mean pause between actions, seconds')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--database-url', help='Scratch database (default: a temporary SQLite file)')
+    parser.add_argument('--products', type=int, default=20_000)
+    parser.add_argument('--orders', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='shop-load-'))
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url or f'sqlite:///{workdir / "load.sqlite3"}',
+        DJANGO_ALLOWED_HOSTS='127.0.0.1,localhost',
+        DJANGO_PERF_LOG_LEVEL='WARNING',
+        DJANGO_SLOW_QUERY_LOG=str(workdir / 'slow_queries.log'),
+    )
+    os.environ.update(env)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supermercado.settings')
+    import django
+
+    django.setup()
+    from django.db import connection
+
+    plan = _prepare(args)
+    connection.close()
+    port = _free_port()
+    server = _start_server(port, args, env, workdir / 'server.log')
+    try:
+        print(f'{args.users} shoppers, {args.workers} workers x {args.threads} threads, {args.duration:.0f}s at full load')
+        stats, elapsed = asyncio.run(_run_load(port, plan, args))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    ok = _report(stats, elapsed, *_check_stock(plan))
+    print(f'\nserver log: {workdir / "server.log"}\nslow queries: python manage.py slow_queries --file {workdir / "slow_queries.log"}')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
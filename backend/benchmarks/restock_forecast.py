@@ -0,0 +1,77 @@
+"""Benchmark: shop.forecast.restock_forecast over a large catalog.
+
+Fills a throwaway test database with ``--products`` products and daily product
+rollups for the forecast window (each product sells on ``--density`` of the
+days), then times a cold forecast (velocities computed) and a warm one
+(velocities cached, only stock read)::
+
+    cd backend
+    python -m benchmarks.restock_forecast --products 100000
+"""
+import argparse
+import os
+import random
+import time
+from datetime import timedelta
+
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supermercado.settings')
+    import django
+
+    django.setup()
+
+
+def _populate(products, density):
+    from django.utils import timezone
+
+    from shop.forecast import RESTOCK_WINDOW_DAYS
+    from shop.models import Category, DailyProductSales, Product
+
+    category = Category.objects.create(name='Bench', slug='bench')
+    Product.objects.bulk_create(
+        [Product(category=category, name=f'P{i}', price=1, stock=random.randint(0, 500)) for i in range(products)],
+        batch_size=5000,
+    )
+    Product.objects.update(created_at=timezone.now() - timedelta(days=RESTOCK_WINDOW_DAYS + 1))
+    ids = list(Product.objects.values_list('id', flat=True))
+    today = timezone.localdate()
+    for age in range(1, RESTOCK_WINDOW_DAYS + 1):
+        day = today - timedelta(days=age)
+        sold = random.sample(ids, int(len(ids) * density))
+        DailyProductSales.objects.bulk_create(
+            [DailyProductSales(day=day, product_id=pk, quantity=random.randint(1, 20), revenue=1) for pk in sold],
+            batch_size=5000,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--top', type=int, default=50)
+    args = parser.parse_args()
+
+    _setup_django()
+    from django.core.cache import cache
+    from django.db import connection
+
+    from shop.forecast import restock_forecast
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        cache.clear()
+        started = time.perf_counter()
+        _populate(args.products, args.density)
+        print(f'populate {time.perf_counter() - started:8.2f}s')
+        for label in ('cold', 'warm'):
+            started = time.perf_counter()
+            result = restock_forecast(top=args.top)
+            print(f'{label:8s} {time.perf_counter() - started:8.3f}s  products={result["count"]}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Microbenchmark: DRF ScopedRateThrottle vs shop.throttling.GCRAScopedRateThrottle.
+
+Calls ``allow_request`` repeatedly for one client under a generous rate, so the
+ScopedRateThrottle history list keeps growing, and reports the cost per check.
+Uses a throwaway test database and the configured default cache::
+
+    cd backend
+    python -m benchmarks.throttle --requests 5000 --rate 100000/hour
+"""
+import argparse
+import os
+import time
+
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supermercado.settings')
+    import django
+
+    django.setup()
+
+
+def _bench(throttle_cls, rate, requests):
+    from django.contrib.auth.models import AnonymousUser
+    from rest_framework.test import APIRequestFactory
+
+    class View:
+        throttle_scope = 'bench'
+
+    throttle_cls.THROTTLE_RATES = {'bench': rate}
+    request = APIRequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+    request.user = AnonymousUser()
+    view = View()
+
+    timings = []
+    for _ in range(requests):
+        throttle = throttle_cls()
+        started = time.perf_counter()
+        throttle.allow_request(request, view)
+        timings.append(time.perf_counter() - started)
+    # First vs last tenth in call order shows whether the cost grows with history
+    head = timings[: max(1, requests // 10)]
+    tail = timings[-max(1, requests // 10):]
+    timings.sort()
+    print(
+        f'{throttle_cls.__name__:24s} mean={sum(timings) / requests * 1e6:8.1f}us '
+        f'p50={timings[requests // 2] * 1e6:8.1f}us p99={timings[int(requests * 0.99)] * 1e6:8.1f}us '
+        f'first10%={sum(head) / len(head) * 1e6:7.1f}us last10%={sum(tail) / len(tail) * 1e6:7.1f}us'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--rate', default='100000/hour')
+    args = parser.parse_args()
+
+    _setup_django()
+    from django.core.cache import cache
+    from django.db import connection
+    from rest_framework.throttling import ScopedRateThrottle
+
+    from shop.throttling import GCRAScopedRateThrottle
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        cache.clear()
+        _bench(ScopedRateThrottle, args.rate, args.requests)
+        _bench(GCRAScopedRateThrottle, args.rate, args.requests)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -23,5 +23,20 @@ seed.run()
 PYCODE"
 fi
 
+# Prometheus metrics are shared by all gunicorn workers through files in this directory;
+# it is emptied on start so counters from a previous run are not summed in
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+chown appuser:appuser "$PROMETHEUS_MULTIPROC_DIR"
+
+if [ "$DJANGO_ASGI" = "1" ] || [ "$DJANGO_ASGI" = "true" ]; then
+  # Uvicorn workers serve long-lived streams (order feed) without holding a worker each.
+  # Persistent DB connections are not reused across async requests, so default them off.
+  export DJANGO_DB_CONN_MAX_AGE=${DJANGO_DB_CONN_MAX_AGE:-0}
+  echo "Starting Gunicorn (ASGI)..."
+  exec su -s /bin/sh appuser -c "gunicorn --bind 0.0.0.0:8000 --workers ${GUNICORN_WORKERS:-3} --timeout ${GUNICORN_TIMEOUT:-60} -k uvicorn.workers.UvicornWorker supermercado.asgi:application"
+fi
+
 echo "Starting Gunicorn..."
 exec su -s /bin/sh appuser -c "gunicorn --bind 0.0.0.0:8000 --workers ${GUNICORN_WORKERS:-3} --timeout ${GUNICORN_TIMEOUT:-60} supermercado.wsgi:application"
@@ -0,0 +1,10 @@
+# Loaded automatically by gunicorn from the working directory (/app)
+import os
+
+
+def child_exit(server, worker):
+    # Drop the live-gauge files of a dead worker; its counters stay in the totals
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,24 +1,197 @@
-from datetime import datetime
-
-from django.contrib import admin
-from django.db import models
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
 from django.template.response import TemplateResponse
 from django.urls import path
+from django.utils.functional import cached_property
+
+from . import analytics, catalog, catalog_import, forecast
+from .coupons import reconcile_coupon_counters
+from .models import Category, Product, SiteConfig, Order, OrderItem, Coupon, Announcement, PriceAdjustment
+
+
+# Above this many rows changelists stop counting exactly
+ADMIN_EXACT_COUNT_LIMIT = 10_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator for large changelists that never runs a full-table COUNT(*).
+
+    Unfiltered lists on PostgreSQL use the planner's row estimate (pg_class.reltuples);
+    anything else is counted up to ADMIN_EXACT_COUNT_LIMIT rows, so deep pages of a
+    broad search are not reachable but the page always renders quickly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = _estimated_rows(queryset)
+            if estimate > ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return queryset[:ADMIN_EXACT_COUNT_LIMIT].count()
 
-from .models import Category, Product, SiteConfig, Order, OrderItem, Coupon, Announcement
+
+def _estimated_rows(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    # reltuples is -1 until the table is first analyzed
+    return max(int(row[0]), 0) if row else 0
+
+
+class CategoryListFilter(admin.SimpleListFilter):
+    """Category filter listing ids and names only, not whole Category rows."""
+
+    title = 'categoría'
+    parameter_name = 'category'
+
+    def lookups(self, request, model_admin):
+        return Category.objects.order_by('name').values_list('id', 'name')
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(category_id=self.value())
+        return queryset
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'slug')
     prepopulated_fields = {"slug": ("name",)}
+    search_fields = ('name',)
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'offer_price', 'stock', 'is_active', 'promoted', 'promoted_until')
-    list_filter = ('category', 'is_active', 'promoted')
-    search_fields = ('name', 'description')
+    list_display = (
+        'name', 'category', 'price', 'offer_price', 'stock', 'popularity', 'is_active', 'promoted', 'promoted_until'
+    )
+    list_filter = (CategoryListFilter, 'is_active', 'promoted')
+    list_select_related = ('category',)
+    # Only the name is searched: it has a trigram index on PostgreSQL, the description does not
+    search_fields = ('name',)
+    autocomplete_fields = ('category',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['adjust_prices']
+
+    change_list_template = "admin/shop/product/change_list.html"
+
+    @admin.action(description='Ajustar precios')
+    def adjust_prices(self, request, queryset):
+        # Second step of the action: the form below posts back here with "apply"
+        if 'apply' in request.POST:
+            if request.POST.get('select_across') == '1':
+                scope = f'Admin, todo el filtro: {request.GET.urlencode() or "sin filtros"}'
+            else:
+                scope = 'Admin, productos seleccionados'
+            try:
+                params = catalog.parse_price_adjustment(request.POST)
+                entry = catalog.adjust_prices(queryset, user=request.user, scope=scope, **params)
+            except ValueError as exc:
+                self.message_user(request, str(exc), level=messages.ERROR)
+            else:
+                self.message_user(request, f'Precios ajustados en {entry.product_count} productos')
+                return None
+
+        context = dict(
+            self.admin_site.each_context(request),
+            title='Ajustar precios',
+            opts=self.model._meta,
+            count=queryset.count(),
+            selected=request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            select_across=request.POST.get('select_across', '0'),
+            action_checkbox_name=helpers.ACTION_CHECKBOX_NAME,
+            kinds=PriceAdjustment.KINDS,
+            rounding_steps=catalog.ROUNDING_STEPS,
+            values=request.POST,
+        )
+        return TemplateResponse(request, "admin/shop/product/adjust_prices.html", context)
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom = [
+            path("restock/", self.admin_site.admin_view(self.restock_view), name="shop_product_restock"),
+            path("import/", self.admin_site.admin_view(self.import_view), name="shop_product_import"),
+        ]
+        return custom + urls
+
+    def import_view(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            raise PermissionDenied
+        report = None
+        upload = request.FILES.get("file") if request.method == "POST" else None
+        if request.method == "POST" and upload is None:
+            self.message_user(request, "Elegir un archivo .csv o .xlsx", level=messages.ERROR)
+        elif upload is not None:
+            try:
+                # Images need local paths, so uploads import data only (see import_catalog)
+                report = catalog_import.import_catalog(
+                    upload,
+                    catalog_import.file_format(upload.name),
+                    key=request.POST.get("key", "sku"),
+                    dry_run=request.POST.get("dry_run") == "1",
+                )
+            except ValueError as exc:
+                self.message_user(request, str(exc), level=messages.ERROR)
+
+        context = dict(
+            self.admin_site.each_context(request),
+            title="Importar catálogo",
+            opts=self.model._meta,
+            keys=catalog_import.IMPORT_KEYS,
+            report=report,
+            dry_run=request.POST.get("dry_run") == "1",
+        )
+        return TemplateResponse(request, "admin/shop/product/import.html", context)
+
+    def restock_view(self, request):
+        try:
+            params = analytics.parse_stats_params(request.GET)
+        except ValueError as exc:
+            self.message_user(request, str(exc), level=messages.ERROR)
+            params = analytics.parse_stats_params({})
+
+        alerts_only = request.GET.get("alerts") == "1"
+        page, top = params["page"], params["top"]
+        result = forecast.restock_forecast(top=top, page=page, alerts_only=alerts_only)
+        querystring = request.GET.copy()
+        querystring.pop("page", None)
+
+        context = dict(
+            self.admin_site.each_context(request),
+            title="Reposición de stock",
+            rows=result["results"],
+            count=result["count"],
+            alerts_only=alerts_only,
+            lead_days=forecast.RESTOCK_LEAD_DAYS,
+            page=page,
+            previous_page=page - 1 if page > 1 else None,
+            next_page=page + 1 if page * top < result["count"] else None,
+            rank_offset=(page - 1) * top,
+            querystring=querystring.urlencode(),
+        )
+        return TemplateResponse(request, "admin/shop/product/restock.html", context)
+
+
+@admin.register(PriceAdjustment)
+class PriceAdjustmentAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'user', 'kind', 'value', 'rounding', 'fields', 'scope', 'product_count')
+    list_filter = ('kind',)
+    list_select_related = ('user',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(SiteConfig)
@@ -31,6 +204,9 @@ class OrderItemInline(admin.TabularInline):
     extra = 0
     readonly_fields = ('product', 'quantity', 'price')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -38,6 +214,9 @@ class OrderAdmin(admin.ModelAdmin):
     readonly_fields = ('total', 'shipping_cost', 'created_at')
     inlines = [OrderItemInline]
     search_fields = ('name', 'phone')
+    search_help_text = 'Nombre del cliente, teléfono o número de pedido'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     change_list_template = "admin/shop/order/change_list.html"
 
@@ -48,97 +227,58 @@ class OrderAdmin(admin.ModelAdmin):
         ]
         return custom + urls
 
-    def stats_view(self, request):
-        def parse_date(value):
-            if not value:
-                return None
-            try:
-                return datetime.strptime(value, "%Y-%m-%d").date()
-            except ValueError:
-                return None
-
-        start = parse_date(request.GET.get("start"))
-        end = parse_date(request.GET.get("end"))
-
-        items = OrderItem.objects.select_related("product__category", "order")
-        if start:
-            items = items.filter(order__created_at__date__gte=start)
-        if end:
-            items = items.filter(order__created_at__date__lte=end)
-
-        items = items.annotate(
-            line_total=models.ExpressionWrapper(
-                models.F("price") * models.F("quantity"),
-                output_field=models.DecimalField(max_digits=18, decimal_places=2),
-            )
-        )
-
-        by_product = (
-            items.values("product_id", "product__name")
-            .annotate(
-                quantity=models.Sum("quantity"),
-                revenue=models.Sum("line_total"),
-            )
-            .order_by("-revenue")
-        )
+    def get_search_results(self, request, queryset, search_term):
+        # One indexed lookup per search instead of OR-ing every field: digits are a
+        # phone fragment or an order number, anything else is a customer name.
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            query = Q(phone__contains=term)
+            if len(term) <= 12:
+                query |= Q(pk=int(term))
+            return queryset.filter(query), False
+        return queryset.filter(name__icontains=term), False
 
-        by_category = (
-            items.values("product__category_id", "product__category__name")
-            .annotate(
-                quantity=models.Sum("quantity"),
-                revenue=models.Sum("line_total"),
-            )
-            .order_by("-revenue")
-        )
-
-        by_day = (
-            items.annotate(day=models.functions.TruncDay("order__created_at"))
-            .values("day")
-            .annotate(
-                quantity=models.Sum("quantity"),
-                revenue=models.Sum("line_total"),
-            )
-            .order_by("day")
-        )
-
-        by_month = (
-            items.annotate(month=models.functions.TruncMonth("order__created_at"))
-            .values("month")
-            .annotate(
-                quantity=models.Sum("quantity"),
-                revenue=models.Sum("line_total"),
-            )
-            .order_by("month")
-        )
+    def stats_view(self, request):
+        try:
+            params = analytics.parse_stats_params(request.GET)
+        except ValueError as exc:
+            self.message_user(request, str(exc), level=messages.ERROR)
+            params = analytics.parse_stats_params({})
 
-        by_payment = (
-            items.values("order__payment_method")
-            .annotate(
-                quantity=models.Sum("quantity"),
-                revenue=models.Sum("line_total"),
-            )
-            .order_by("order__payment_method")
-        )
+        stats = analytics.sales_stats(**params)
+        page, top = params["page"], params["top"]
+        querystring = request.GET.copy()
+        querystring.pop("page", None)
 
         context = dict(
             self.admin_site.each_context(request),
             title="Estadísticas de ventas",
-            start=start,
-            end=end,
-            by_product=by_product,
-            by_category=by_category,
-            by_day=by_day,
-            by_month=by_month,
-            by_payment=by_payment,
+            start=params["start"],
+            end=params["end"],
+            page=page,
+            previous_page=page - 1 if page > 1 else None,
+            next_page=page + 1 if page * top < stats["by_product_count"] else None,
+            product_rank_offset=(page - 1) * top,
+            querystring=querystring.urlencode(),
+            **stats,
         )
         return TemplateResponse(request, "admin/shop/order/stats.html", context)
 
 
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
-    list_display = ('code', 'type', 'amount', 'percent', 'percent_cap', 'min_subtotal', 'active')
+    list_display = ('code', 'type', 'amount', 'percent', 'percent_cap', 'min_subtotal', 'active', 'counter_shards')
     list_filter = ('type', 'active')
     search_fields = ('code',)
+    actions = ['reconcile_counters']
+
+    @admin.action(description='Reconciliar contadores de uso')
+    def reconcile_counters(self, request, queryset):
+        for coupon in queryset:
+            reconcile_coupon_counters(coupon)
+        self.message_user(request, f'{queryset.count()} cupones reconciliados')
 
 
 @admin.register(Announcement)
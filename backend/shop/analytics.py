@@ -0,0 +1,328 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Min, Sum
+from django.utils import timezone
+
+from .cache_versions import bump_version, get_version
+from .models import (
+    Category,
+    DailyCategorySales,
+    DailyPaymentSales,
+    DailyProductSales,
+    Order,
+    OrderItem,
+    Product,
+)
+
+# Sales analytics shared by the stats API and the admin stats page. Breakdowns
+# come from the daily rollups (shop.rollups). A requested range is split at month
+# boundaries and every segment made only of closed days is cached without expiry
+# under the shared "sales_stats" version stamp (shop.cache_versions), which rollup
+# rebuilds and late orders bump from any process, so only today is recomputed.
+SALES_STATS_CACHE_VERSION = 'sales_stats'
+DEFAULT_TOP_PRODUCTS = 50
+
+# Dimensions available to scan_order_items, as SQL over the filtered OrderItem rows
+SCAN_DIMENSIONS = {
+    'product_id': 'oi.product_id',
+    'category_id': 'p.category_id',
+    'payment_method': 'o.payment_method',
+    'day': '(o.created_at AT TIME ZONE %(tz)s)::date',
+    'month': "date_trunc('month', o.created_at AT TIME ZONE %(tz)s)::date",
+}
+
+# Totals behind every stats response: ``{bucket: {key: [quantity, revenue]}}``
+STATS_GROUPINGS = {
+    'product': ('product_id',),
+    'category': ('category_id',),
+    'payment': ('payment_method',),
+    'day': ('day',),
+}
+ROLLUP_SOURCES = (
+    ('product', DailyProductSales, 'product_id'),
+    ('category', DailyCategorySales, 'category_id'),
+    ('payment', DailyPaymentSales, 'payment_method'),
+    ('day', DailyPaymentSales, 'day'),
+)
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def local_day_range(start=None, end=None):
+    """Half-open ``[from, to)`` timestamps covering local days ``start..end`` in TIME_ZONE.
+
+    Comparing ``created_at`` against plain timestamps, instead of casting it to a
+    date, lets the database use the index on ``Order.created_at``.
+    """
+    return (
+        _local_midnight(start) if start else None,
+        _local_midnight(end + timedelta(days=1)) if end else None,
+    )
+
+
+def filter_order_items(items, start=None, end=None):
+    since, until = local_day_range(start, end)
+    if since:
+        items = items.filter(order__created_at__gte=since)
+    if until:
+        items = items.filter(order__created_at__lt=until)
+    return items
+
+
+def _parse_day(raw, name):
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw).date()
+    except ValueError:
+        raise ValueError(f'{name} inválido, use YYYY-MM-DD')
+
+
+def _parse_positive_int(raw, name, default):
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise ValueError(f'{name} debe ser un entero positivo')
+    return value
+
+
+def parse_stats_params(params):
+    """Read ``start``, ``end``, ``top`` and ``page`` from a query dict; ValueError on bad input."""
+    return {
+        'start': _parse_day(params.get('start'), 'start'),
+        'end': _parse_day(params.get('end'), 'end'),
+        'top': _parse_positive_int(params.get('top'), 'top', DEFAULT_TOP_PRODUCTS),
+        'page': _parse_positive_int(params.get('page'), 'page', 1),
+    }
+
+
+def sales_stats_cache_version():
+    return get_version(SALES_STATS_CACHE_VERSION)
+
+
+def invalidate_sales_stats_cache():
+    """Drop cached closed-day segments here now and in every worker once the transaction commits."""
+    bump_version(SALES_STATS_CACHE_VERSION)
+
+
+def _empty_totals():
+    return {bucket: {} for bucket in STATS_GROUPINGS}
+
+
+def _rollup_totals(first, last):
+    totals = _empty_totals()
+    for bucket, model, key_field in ROLLUP_SOURCES:
+        rows = (
+            model.objects.filter(day__gte=first, day__lte=last)
+            .values(key_field)
+            .annotate(units=Sum('quantity'), amount=Sum('revenue'))
+            .values_list(key_field, 'units', 'amount')
+            .order_by()
+        )
+        totals[bucket] = {key: [units, amount] for key, units, amount in rows}
+    return totals
+
+
+def month_segments(start, end):
+    """Split ``[start, end]`` at month boundaries; a month cut by a range edge stays one segment."""
+    segments = []
+    first = start
+    while first <= end:
+        next_month = (first.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min(end, next_month - timedelta(days=1))
+        segments.append((first, last))
+        first = last + timedelta(days=1)
+    return segments
+
+
+def _merge(into, totals):
+    for bucket, rows in totals.items():
+        target = into[bucket]
+        for key, (units, amount) in rows.items():
+            if key in target:
+                target[key] = [target[key][0] + units, target[key][1] + amount]
+            else:
+                target[key] = [units, amount]
+    return into
+
+
+def _stats_totals(start, end):
+    today = timezone.localdate()
+    if start is None:
+        start = DailyPaymentSales.objects.aggregate(first=Min('day'))['first']
+    end = min(end, today) if end else today
+    totals = _empty_totals()
+    if start is None or start > end:
+        return totals
+
+    closed_end = min(end, today - timedelta(days=1))
+    if start <= closed_end:
+        version = sales_stats_cache_version()
+        segments = month_segments(start, closed_end)
+        keys = {seg: f'sales_stats:{version}:{seg[0]}:{seg[1]}' for seg in segments}
+        cached = cache.get_many(keys.values())
+        for seg in segments:
+            seg_totals = cached.get(keys[seg])
+            if seg_totals is None:
+                seg_totals = _rollup_totals(*seg)
+                cache.set(keys[seg], seg_totals, None)
+            _merge(totals, seg_totals)
+    if end == today:
+        _merge(totals, _rollup_totals(today, today))
+    return totals
+
+
+def _sorted_by_revenue(rows):
+    return sorted(rows.items(), key=lambda kv: (-kv[1][1], kv[0]))
+
+
+def _shape(totals, top=None, page=1):
+    """Turn merged totals into the response rows, paginating by_product to the top-N."""
+    products = _sorted_by_revenue(totals['product'])
+    if top:
+        products = products[(page - 1) * top: page * top]
+    product_names = dict(
+        Product.objects.filter(id__in=[pk for pk, _ in products]).values_list('id', 'name')
+    )
+    categories = _sorted_by_revenue(totals['category'])
+    category_names = dict(
+        Category.objects.filter(id__in=[pk for pk, _ in categories]).values_list('id', 'name')
+    )
+
+    months = defaultdict(lambda: [0, Decimal('0')])
+    for day, (units, amount) in totals['day'].items():
+        month = months[day.replace(day=1)]
+        month[0] += units
+        month[1] += amount
+
+    # day/month keep the shape of the TruncDay/TruncMonth results the endpoints used to return
+    return {
+        'by_product': [
+            {'product_id': pk, 'product__name': product_names.get(pk), 'quantity': q, 'revenue': r}
+            for pk, (q, r) in products
+        ],
+        'by_product_count': len(totals['product']),
+        'by_category': [
+            {
+                'product__category_id': pk,
+                'product__category__name': category_names.get(pk),
+                'quantity': q,
+                'revenue': r,
+            }
+            for pk, (q, r) in categories
+        ],
+        'by_day': [
+            {'day': _local_midnight(day), 'quantity': q, 'revenue': r}
+            for day, (q, r) in sorted(totals['day'].items())
+        ],
+        'by_month': [
+            {'month': _local_midnight(month), 'quantity': q, 'revenue': r}
+            for month, (q, r) in sorted(months.items())
+        ],
+        'by_payment': [
+            {'order__payment_method': method, 'quantity': q, 'revenue': r}
+            for method, (q, r) in sorted(totals['payment'].items())
+        ],
+    }
+
+
+def sales_stats(start=None, end=None, top=None, page=1):
+    """Sales breakdowns for local days in ``[start, end]``, read from the cached daily rollups.
+
+    ``top``/``page`` paginate ``by_product`` (highest revenue first); ``None`` returns all.
+    """
+    return _shape(_stats_totals(start, end), top, page)
+
+
+def _scan_grouping_sets(groupings, start, end):
+    dims = [d for d in SCAN_DIMENSIONS if any(d in g for g in groupings.values())]
+    since, until = local_day_range(start, end)
+    where, params = [], {'tz': timezone.get_current_timezone_name()}
+    if since:
+        where.append('o.created_at >= %(since)s')
+        params['since'] = since
+    if until:
+        where.append('o.created_at < %(until)s')
+        params['until'] = until
+    qn = connection.ops.quote_name
+    sql = f"""
+        SELECT GROUPING({', '.join(dims)}), {', '.join(dims)}, SUM(quantity), SUM(line_total)
+        FROM (
+            SELECT {', '.join(f'{SCAN_DIMENSIONS[d]} AS {d}' for d in dims)},
+                   oi.quantity, oi.price * oi.quantity AS line_total
+            FROM {qn(OrderItem._meta.db_table)} oi
+            JOIN {qn(Order._meta.db_table)} o ON o.id = oi.order_id
+            JOIN {qn(Product._meta.db_table)} p ON p.id = oi.product_id
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+        ) AS facts
+        GROUP BY GROUPING SETS ({', '.join('(' + ', '.join(g) + ')' for g in groupings.values())})
+    """
+    # GROUPING() sets bit (n - 1 - i) when dims[i] is not part of the row's grouping set
+    masks = {
+        sum(1 << (len(dims) - 1 - i) for i, d in enumerate(dims) if d not in g):
+            (name, [dims.index(d) for d in g])
+        for name, g in groupings.items()
+    }
+    result = {name: {} for name in groupings}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for row in cursor:
+            name, positions = masks[row[0]]
+            values = row[1:1 + len(dims)]
+            result[name][tuple(values[i] for i in positions)] = [row[-2], row[-1]]
+    return result
+
+
+def _scan_python(groupings, start, end):
+    rows = filter_order_items(OrderItem.objects.all(), start, end).values_list(
+        'product_id', 'product__category_id', 'order__payment_method', 'order__created_at', 'quantity', 'price'
+    )
+    totals = {name: defaultdict(lambda: [0, Decimal('0')]) for name in groupings}
+    plan = list(groupings.items())
+    local_days = {}
+    for product_id, category_id, payment_method, created_at, quantity, price in rows.iterator(chunk_size=2000):
+        day = local_days.get(created_at)
+        if day is None:
+            day = local_days[created_at] = timezone.localtime(created_at).date()
+        values = {
+            'product_id': product_id,
+            'category_id': category_id,
+            'payment_method': payment_method,
+            'day': day,
+            'month': day.replace(day=1),
+        }
+        line = price * quantity
+        for name, dims in plan:
+            bucket = totals[name][tuple(values[d] for d in dims)]
+            bucket[0] += quantity
+            bucket[1] += line
+    return {name: dict(t) for name, t in totals.items()}
+
+
+def scan_order_items(groupings, start=None, end=None):
+    """Aggregate OrderItem over several groupings reading the filtered rows once.
+
+    ``groupings`` maps a name to a tuple of SCAN_DIMENSIONS; the result maps each
+    name to ``{key_tuple: [quantity, revenue]}``. PostgreSQL answers with a single
+    GROUPING SETS statement, other databases stream the rows and sum in Python.
+    """
+    if connection.vendor == 'postgresql':
+        return _scan_grouping_sets(groupings, start, end)
+    return _scan_python(groupings, start, end)
+
+
+def sales_stats_from_items(start=None, end=None, top=None, page=1):
+    """Same result as sales_stats() computed from OrderItem instead of the rollups."""
+    scan = scan_order_items(STATS_GROUPINGS, start, end)
+    totals = {bucket: {key[0]: value for key, value in rows.items()} for bucket, rows in scan.items()}
+    return _shape(totals, top, page)
@@ -6,3 +6,8 @@ class ShopConfig(AppConfig):
     name = 'shop'
     verbose_name = 'Supermercado - Tienda'
 
+    def ready(self):
+        from . import catalog  # noqa: F401  (registers the catalog cache version receiver)
+        from . import coupons  # noqa: F401  (registers coupon cache receivers)
+        from . import instrumentation  # noqa: F401  (SQL timing wrapper, also outside requests)
+        from . import rollups  # noqa: F401  (subtracts deleted orders from the sales rollups)
@@ -0,0 +1,45 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing on a single blake2b digest."""
+
+    def __init__(self, size_bits, num_hashes, bits=None):
+        self.size_bits = max(8, int(size_bits))
+        self.num_hashes = max(1, int(num_hashes))
+        nbytes = (self.size_bits + 7) // 8
+        self.bits = bytearray(bits) if bits is not None else bytearray(nbytes)
+        if len(self.bits) != nbytes:
+            raise ValueError('bits length does not match size_bits')
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate=0.01):
+        """Size the filter so ``capacity`` items give roughly ``error_rate`` false positives."""
+        capacity = max(1, capacity)
+        size_bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        num_hashes = round(size_bits / capacity * math.log(2))
+        return cls(size_bits, num_hashes)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.size_bits
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def dumps(self):
+        return (self.size_bits, self.num_hashes, bytes(self.bits))
+
+    @classmethod
+    def loads(cls, data):
+        size_bits, num_hashes, bits = data
+        return cls(size_bits, num_hashes, bits)
@@ -0,0 +1,61 @@
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import CacheVersion
+
+# Version stamps for families of cached entries (coupons, sales stats, catalog).
+# The default cache is per worker, so a stamp kept there never reaches the other
+# workers or management commands. The stamps live in CacheVersion instead; each
+# worker memoizes them and re-reads the row at most every
+# CACHE_VERSION_CHECK_SECONDS, which bounds how long another process's change
+# can go unnoticed. Cache keys embed the stamp, so a bump orphans old entries.
+
+_lock = threading.Lock()
+# name -> (version, monotonic time of the last database read)
+_versions = {}
+
+
+def _remember(name, version):
+    with _lock:
+        _versions[name] = (version, time.monotonic())
+
+
+def _read(name):
+    return CacheVersion.objects.filter(name=name).values_list('version', flat=True).first()
+
+
+def get_version(name):
+    """Current stamp for ``name``, from this worker's memo while it is fresh."""
+    with _lock:
+        entry = _versions.get(name)
+    if entry is not None and time.monotonic() - entry[1] < settings.CACHE_VERSION_CHECK_SECONDS:
+        return entry[0]
+    version = _read(name)
+    if version is None:
+        CacheVersion.objects.bulk_create([CacheVersion(name=name, version=time.time_ns())], ignore_conflicts=True)
+        version = _read(name)
+    _remember(name, version)
+    return version
+
+
+def _publish(name):
+    version = time.time_ns()
+    if not CacheVersion.objects.filter(name=name).update(version=version):
+        CacheVersion.objects.bulk_create([CacheVersion(name=name, version=version)], ignore_conflicts=True)
+        version = _read(name)
+    _remember(name, version)
+
+
+def bump_version(name):
+    """Invalidate every entry keyed on ``name``, in this worker now and everywhere once committed.
+
+    The local stamp changes right away; the shared row gets a new stamp after the
+    caller's transaction commits, so other workers cannot cache pre-commit data
+    under it and the row is not locked for the rest of the transaction.
+    """
+    _remember(name, time.time_ns())
+    transaction.on_commit(partial(_publish, name), robust=True)
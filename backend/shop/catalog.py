@@ -0,0 +1,147 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.db import DataError, transaction
+from django.db.models import Case, DecimalField, F, Max, Value, When
+from django.db.models.functions import Greatest, Round
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache_versions import bump_version, get_version
+from .models import PriceAdjustment, Product
+
+# Catalog-wide writes. Caches holding serialized products (and so prices) key on
+# the shared "catalog" version stamp (shop.cache_versions); any product save
+# bumps it, and a bulk price change or an import bumps it once for the whole
+# batch, seen by every worker within CACHE_VERSION_CHECK_SECONDS. adjust_prices
+# rewrites price/offer_price of a product queryset in one set-based UPDATE: no
+# per-row save(), so none of the pre_save image checks run, and one
+# PriceAdjustment row audits the change.
+CATALOG_CACHE_VERSION = 'catalog'
+
+PRICE_FIELDS = ('price', 'offer_price')
+# Adjusted prices are rounded half up to a multiple of one of these steps
+ROUNDING_STEPS = tuple(Decimal(step) for step in ('0.01', '0.10', '1', '5', '10', '50', '100'))
+DEFAULT_ROUNDING = ROUNDING_STEPS[0]
+MIN_PERCENT = Decimal('-90')
+MAX_PERCENT = Decimal('500')
+
+_PRICE_OUTPUT = DecimalField(max_digits=10, decimal_places=2)
+# Largest value the price columns hold (numeric(10, 2))
+MAX_PRICE = Decimal(10) ** (_PRICE_OUTPUT.max_digits - _PRICE_OUTPUT.decimal_places) - Decimal('0.01')
+# Value() quantizes to the output field's places; 12.5% needs a 1.125 factor
+_FACTOR_OUTPUT = DecimalField(max_digits=8, decimal_places=4)
+
+
+def catalog_cache_version():
+    return get_version(CATALOG_CACHE_VERSION)
+
+
+def bump_catalog_cache_version():
+    bump_version(CATALOG_CACHE_VERSION)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def bump_catalog_on_product_change(**kwargs):
+    bump_catalog_cache_version()
+
+
+def _parse_decimal(raw, name):
+    try:
+        value = Decimal(str(raw).strip())
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'{name} debe ser un número')
+    if not value.is_finite():
+        raise ValueError(f'{name} debe ser un número')
+    return value.quantize(Decimal('0.01'))
+
+
+def parse_price_adjustment(params):
+    """Read ``kind``, ``value``, ``rounding`` and ``fields`` from request data; ValueError on bad input."""
+    kind = params.get('kind')
+    if kind not in dict(PriceAdjustment.KINDS):
+        raise ValueError('kind debe ser percent o amount')
+    value = _parse_decimal(params.get('value'), 'value')
+    if not value:
+        raise ValueError('value no puede ser cero')
+    if kind == 'percent' and not MIN_PERCENT <= value <= MAX_PERCENT:
+        raise ValueError(f'El porcentaje debe estar entre {MIN_PERCENT} y {MAX_PERCENT}')
+
+    raw_rounding = params.get('rounding')
+    rounding = _parse_decimal(raw_rounding, 'rounding') if raw_rounding else DEFAULT_ROUNDING
+    if rounding not in ROUNDING_STEPS:
+        raise ValueError(f'rounding debe ser uno de {", ".join(str(step) for step in ROUNDING_STEPS)}')
+
+    fields = params.getlist('fields') if hasattr(params, 'getlist') else params.get('fields')
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    fields = [field.strip() for field in fields or () if field.strip()]
+    if not set(fields) <= set(PRICE_FIELDS):
+        raise ValueError(f'fields solo admite {", ".join(PRICE_FIELDS)}')
+    return {
+        'kind': kind,
+        'value': value,
+        'rounding': rounding,
+        'fields': tuple(field for field in PRICE_FIELDS if field in fields) or PRICE_FIELDS,
+    }
+
+
+def _adjusted(field, kind, value, rounding):
+    if kind == 'percent':
+        target = F(field) * Value(1 + value / 100, output_field=_FACTOR_OUTPUT)
+    else:
+        target = F(field) + Value(value, output_field=_PRICE_OUTPUT)
+    step = Value(rounding, output_field=_PRICE_OUTPUT)
+    # Never below one step: a price cannot drop to zero or go negative
+    adjusted = Greatest(Round(target / step) * step, step, output_field=_PRICE_OUTPUT)
+    if Product._meta.get_field(field).null:
+        # GREATEST skips NULLs on PostgreSQL; products without an offer keep none
+        adjusted = Case(
+            When(**{f'{field}__isnull': False}, then=adjusted), default=Value(None), output_field=_PRICE_OUTPUT
+        )
+    return adjusted
+
+
+def _check_max_price(queryset, kind, value, rounding, fields):
+    """ValueError if the highest adjusted price would not fit in the price columns."""
+    if value <= 0:
+        return
+    highest = max(
+        (price for price in queryset.aggregate(*[Max(field) for field in fields]).values() if price is not None),
+        default=None,
+    )
+    if highest is None:
+        return
+    if kind == 'percent':
+        target = highest * (1 + value / 100).quantize(Decimal('0.0001'))
+    else:
+        target = highest + value
+    if (target / rounding).quantize(Decimal('1'), ROUND_HALF_UP) * rounding > MAX_PRICE:
+        raise ValueError(f'El ajuste llevaría algún precio por encima del máximo ({MAX_PRICE})')
+
+
+def adjust_prices(queryset, kind, value, rounding=DEFAULT_ROUNDING, fields=PRICE_FIELDS, user=None, scope=''):
+    """Apply a percentage or fixed change to ``fields`` of every product in ``queryset``.
+
+    One UPDATE for the whole set, one PriceAdjustment audit row and one catalog
+    cache bump. Returns the PriceAdjustment; ValueError, with nothing changed,
+    when a resulting price would exceed MAX_PRICE.
+    """
+    _check_max_price(queryset, kind, value, rounding, fields)
+    updates = {field: _adjusted(field, kind, value, rounding) for field in fields}
+    try:
+        with transaction.atomic():
+            count = queryset.order_by().update(**updates)
+            entry = PriceAdjustment.objects.create(
+                user=user if user is not None and user.is_authenticated else None,
+                kind=kind,
+                value=value,
+                rounding=rounding,
+                fields=','.join(fields),
+                scope=scope[:240],
+                product_count=count,
+            )
+            bump_catalog_cache_version()
+    except DataError:
+        # A price raised concurrently past the check above
+        raise ValueError(f'El ajuste llevaría algún precio por encima del máximo ({MAX_PRICE})')
+    return entry
@@ -0,0 +1,363 @@
+import csv
+import io
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .catalog import MAX_PRICE, bump_catalog_cache_version
+from .models import Category, Product
+
+# Supplier price lists (CSV or XLSX) into the catalog. Rows are streamed in
+# chunks; each chunk is matched against existing products by SKU or name with a
+# single query, then new rows go out with bulk_create and changed ones with
+# bulk_update inside one transaction per chunk, so an import never holds a long
+# transaction and a failure keeps the chunks already committed. Only columns
+# present in the file are compared and written. Local image files are copied to
+# storage by a thread pool once all rows are in. No save() runs per product.
+
+IMPORT_CHUNK_SIZE = 2000
+IMPORT_UPDATE_BATCH_SIZE = 500
+IMPORT_IMAGE_WORKERS = 8
+# Errors kept for the report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+IMPORT_KEYS = ('sku', 'name')
+# Header aliases (lowercase, no accents) -> Product field
+COLUMNS = {
+    'sku': 'sku', 'codigo': 'sku', 'code': 'sku',
+    'name': 'name', 'nombre': 'name', 'producto': 'name',
+    'category': 'category', 'categoria': 'category', 'rubro': 'category',
+    'description': 'description', 'descripcion': 'description',
+    'price': 'price', 'precio': 'price',
+    'offer_price': 'offer_price', 'precio_oferta': 'offer_price', 'oferta': 'offer_price',
+    'stock': 'stock',
+    'is_active': 'is_active', 'activo': 'is_active',
+    'image': 'image', 'imagen': 'image',
+}
+TRUE_VALUES = {'1', 'true', 'si', 'sí', 'yes', 'x', 'verdadero'}
+FALSE_VALUES = {'0', 'false', 'no', 'falso', ''}
+# Cells checked against their column before reaching the database: field -> (label, max length)
+MAX_LENGTHS = {
+    'sku': ('sku', Product._meta.get_field('sku').max_length),
+    'name': ('nombre', Product._meta.get_field('name').max_length),
+    'category': ('categoría', Category._meta.get_field('name').max_length),
+}
+# stock is an integer column on PostgreSQL
+MAX_STOCK = 2 ** 31 - 1
+# Dots between groups of three digits, as in 12.999
+THOUSANDS = re.compile(r'^\d{1,3}(\.\d{3})+$')
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def _header_key(value):
+    text = slugify(str(value or '')).replace('-', '_')
+    return COLUMNS.get(text)
+
+
+def _csv_rows(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    yield from csv.reader(text, dialect)
+
+
+def _xlsx_rows(fileobj):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_catalog_rows(fileobj, fmt):
+    """Yield ``(line, {field: raw value})`` for each data row of a CSV or XLSX file object."""
+    rows = _xlsx_rows(fileobj) if fmt == 'xlsx' else _csv_rows(fileobj)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError('El archivo está vacío')
+    fields = [_header_key(value) for value in header]
+    if not any(fields):
+        raise ValueError('No se reconoce ninguna columna del encabezado')
+    for line, values in enumerate(rows, start=2):
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield line, {field: value for field, value in zip(fields, values) if field}
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _number(value, name):
+    if isinstance(value, (int, float, Decimal)):
+        number = Decimal(str(value))
+    else:
+        text = _text(value).replace('$', '').replace(' ', '')
+        if ',' in text:
+            # 1.234,56 as exported by spreadsheets in es-AR
+            text = text.replace('.', '').replace(',', '.')
+        elif THOUSANDS.match(text):
+            # 2.500 or 1.200.000: es-AR thousands without decimals, never 2.5
+            text = text.replace('.', '')
+        try:
+            number = Decimal(text)
+        except InvalidOperation:
+            raise ImportRowError(f'{name} inválido: {value!r}')
+    if not number.is_finite() or number < 0:
+        raise ImportRowError(f'{name} inválido: {value!r}')
+    return number
+
+
+def _decimal(value, name):
+    number = _number(value, name)
+    if number > MAX_PRICE:
+        raise ImportRowError(f'{name} mayor que el máximo ({MAX_PRICE}): {value!r}')
+    return number.quantize(Decimal('0.01'))
+
+
+def _stock(value):
+    if not _text(value):
+        return 0
+    number = _number(value, 'stock')
+    if number != number.to_integral_value() or number > MAX_STOCK:
+        # Units are whole; 1.5 is a typo, not something to truncate
+        raise ImportRowError(f'stock inválido: {value!r}')
+    return int(number)
+
+
+def _parse_row(raw):
+    """Typed values for the Product fields present in ``raw``; ImportRowError on bad input."""
+    values = {}
+    for field in ('sku', 'name', 'description', 'category', 'image'):
+        if field in raw:
+            values[field] = _text(raw[field])
+            if field in MAX_LENGTHS and len(values[field]) > MAX_LENGTHS[field][1]:
+                raise ImportRowError(f'{MAX_LENGTHS[field][0]} de más de {MAX_LENGTHS[field][1]} caracteres')
+    if 'price' in raw:
+        values['price'] = _decimal(raw['price'], 'precio')
+    if 'offer_price' in raw:
+        values['offer_price'] = _decimal(raw['offer_price'], 'oferta') if _text(raw['offer_price']) else None
+    if 'stock' in raw:
+        values['stock'] = _stock(raw['stock'])
+    if 'is_active' in raw:
+        flag = raw['is_active']
+        text = _text(flag).lower()
+        if isinstance(flag, bool):
+            values['is_active'] = flag
+        elif text in TRUE_VALUES or text in FALSE_VALUES:
+            values['is_active'] = text in TRUE_VALUES
+        else:
+            raise ImportRowError(f'activo inválido: {flag!r}')
+    if values.get('sku') == '':
+        values['sku'] = None
+    return values
+
+
+class CatalogImporter:
+    """Imports one file; counts end up in ``report``."""
+
+    def __init__(self, key='sku', images_dir=None, replace_images=False, chunk_size=IMPORT_CHUNK_SIZE,
+                 image_workers=IMPORT_IMAGE_WORKERS, dry_run=False, progress=None):
+        if key not in IMPORT_KEYS:
+            raise ValueError(f'key debe ser uno de {", ".join(IMPORT_KEYS)}')
+        self.key = key
+        self.images_dir = Path(images_dir).resolve() if images_dir else None
+        self.replace_images = replace_images
+        self.chunk_size = chunk_size
+        self.image_workers = image_workers
+        self.dry_run = dry_run
+        self.progress = progress or (lambda message: None)
+        self.categories = {}
+        for category in Category.objects.only('id', 'name', 'slug'):
+            self.categories[category.slug] = category
+            self.categories.setdefault(category.name.casefold(), category)
+        self.image_jobs = []
+        self.report = {
+            'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'images': 0,
+            'categories_created': 0, 'errors': [],
+        }
+
+    def error(self, line, message, skipped=True):
+        self.report['skipped'] += skipped
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append((line, message))
+
+    def run(self, rows):
+        if self.dry_run:
+            # Everything in one transaction that is rolled back; images are not copied
+            with transaction.atomic():
+                self.import_rows(rows)
+                transaction.set_rollback(True)
+            return self.report
+        self.import_rows(rows)
+        if self.report['inserted'] or self.report['updated']:
+            bump_catalog_cache_version()
+        if self.image_jobs:
+            self.attach_images()
+        return self.report
+
+    def import_rows(self, rows):
+        rows = iter(rows)
+        for chunk in iter(lambda: list(islice(rows, self.chunk_size)), []):
+            self.report['rows'] += len(chunk)
+            with transaction.atomic():
+                self.import_chunk(chunk)
+            self.progress(
+                f'{self.report["rows"]} filas: {self.report["inserted"]} nuevas, '
+                f'{self.report["updated"]} actualizadas, {self.report["unchanged"]} sin cambios'
+            )
+
+    def _category(self, name):
+        category = self.categories.get(slugify(name)) or self.categories.get(name.casefold())
+        if category is None:
+            slug = slugify(name)[:50]
+            if not slug:
+                raise ImportRowError(f'categoría inválida: {name!r}')
+            category = Category.objects.create(name=name[:120], slug=slug)
+            self.categories[slug] = self.categories[name.casefold()] = category
+            self.report['categories_created'] += 1
+        return category
+
+    def _typed_chunk(self, chunk):
+        by_key = {}
+        for line, raw in chunk:
+            try:
+                values = _parse_row(raw)
+                key = values.get(self.key)
+                if not key:
+                    raise ImportRowError(f'falta {self.key}')
+                if 'category' in values:
+                    name = values.pop('category')
+                    if not name:
+                        raise ImportRowError('falta la categoría')
+                    values['category_id'] = self._category(name).pk
+            except ImportRowError as exc:
+                self.error(line, str(exc))
+                continue
+            # A key repeated in the file: the last row wins
+            by_key[key] = (line, values)
+        return by_key
+
+    def import_chunk(self, chunk):
+        by_key = self._typed_chunk(chunk)
+        skus = {values['sku'] for _, values in by_key.values() if values.get('sku')}
+        existing, sku_owners = {}, {}
+        # Products matched by key plus those already holding a SKU the chunk assigns
+        lookup = Q(**{f'{self.key}__in': list(by_key)}) | Q(sku__in=skus)
+        for product in Product.objects.filter(lookup).order_by('-id'):
+            if product.sku:
+                sku_owners[product.sku] = product.pk
+            # Duplicate names in the catalog: the oldest product is the one kept in sync
+            existing[getattr(product, self.key)] = product
+
+        to_create, to_update, changed_fields = [], [], set()
+        claimed = {}
+        for key, (line, values) in by_key.items():
+            product = existing.get(key)
+            sku = values.get('sku')
+            if sku:
+                owner = sku_owners.get(sku)
+                if owner is not None and owner != (product.pk if product else None):
+                    self.error(line, f'el sku {sku} ya es de otro producto')
+                    continue
+                if claimed.setdefault(sku, key) != key:
+                    self.error(line, f'el sku {sku} se repite en el archivo')
+                    continue
+            image = values.pop('image', None)
+            if image and self.images_dir is not None and not self._image_path(image).is_relative_to(self.images_dir):
+                # Absolute paths or ../ in the supplier file would copy any readable file into public media
+                self.error(line, f'imagen fuera de la carpeta de imágenes: {image!r}')
+                continue
+            if product is None:
+                missing = [field for field in ('name', 'category_id', 'price') if not values.get(field)]
+                if missing:
+                    self.error(line, f'producto nuevo sin {", ".join(missing)}')
+                    continue
+                product = Product(**values)
+                to_create.append(product)
+            else:
+                changed = {field for field, value in values.items() if getattr(product, field) != value}
+                for field in changed:
+                    setattr(product, field, values[field])
+                if changed:
+                    to_update.append(product)
+                    changed_fields |= changed
+                else:
+                    self.report['unchanged'] += 1
+            if image and self.images_dir is not None:
+                self.image_jobs.append((product, line, image))
+
+        Product.objects.bulk_create(to_create, batch_size=self.chunk_size)
+        if to_update:
+            Product.objects.bulk_update(to_update, sorted(changed_fields), batch_size=IMPORT_UPDATE_BATCH_SIZE)
+        self.report['inserted'] += len(to_create)
+        self.report['updated'] += len(to_update)
+
+    def _image_path(self, relative):
+        return (self.images_dir / relative).resolve()
+
+    def _store_image(self, job):
+        product, line, relative = job
+        path = self._image_path(relative)
+        if not path.is_file():
+            return product, line, None
+        with open(path, 'rb') as fh:
+            name = Product.image.field.generate_filename(product, path.name)
+            return product, line, Product.image.field.storage.save(name, File(fh, name=path.name))
+
+    def attach_images(self):
+        jobs = [
+            (product, line, relative) for product, line, relative in self.image_jobs
+            if self.replace_images or not product.image
+        ]
+        self.image_jobs = []
+        stored, replaced = [], []
+        with ThreadPoolExecutor(max_workers=self.image_workers) as pool:
+            for product, line, name in pool.map(self._store_image, jobs):
+                if name is None:
+                    self.error(line, 'imagen no encontrada', skipped=False)
+                    continue
+                if product.image:
+                    replaced.append(product.image.name)
+                product.image = name
+                stored.append(product)
+        for start in range(0, len(stored), IMPORT_UPDATE_BATCH_SIZE):
+            with transaction.atomic():
+                Product.objects.bulk_update(stored[start:start + IMPORT_UPDATE_BATCH_SIZE], ['image'])
+        # bulk_update skips the pre_save receiver that would have removed the old files
+        storage = Product.image.field.storage
+        for name in replaced:
+            storage.delete(name)
+        if stored:
+            bump_catalog_cache_version()
+        self.report['images'] += len(stored)
+        self.progress(f'{len(stored)} imágenes asociadas')
+
+
+def import_catalog(fileobj, fmt, **options):
+    """Import a CSV/XLSX binary file object; see CatalogImporter for ``options``. Returns the report."""
+    if fmt not in ('csv', 'xlsx'):
+        raise ValueError('Formato no soportado: usar .csv o .xlsx')
+    importer = CatalogImporter(**options)
+    return importer.run(iter_catalog_rows(fileobj, fmt))
+
+
+def file_format(name):
+    return os.path.splitext(str(name))[1].lower().lstrip('.')
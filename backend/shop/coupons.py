@@ -0,0 +1,230 @@
+import random
+import threading
+import time
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .bloom import BloomFilter
+from .cache_versions import bump_version, get_version
+from .models import Coupon, CouponRedemptionSlot, SharedBloomFilter, normalize_coupon_code
+
+# Coupon lookups go through two layers that never touch the database for known
+# answers:
+#   * a Bloom filter of active normalized codes, which rejects unknown codes
+#     outright. The first worker to need it after a version change scans the
+#     codes and stores the serialized filter in a SharedBloomFilter row tagged
+#     with that version; the other workers load the row instead of rescanning;
+#   * a per-worker memo of coupons already looked up by normalized code.
+# Both are keyed on the shared "coupons" version stamp (shop.cache_versions),
+# bumped on every Coupon change from any process, so a coupon created by another
+# worker or by generate_coupons is seen within CACHE_VERSION_CHECK_SECONDS. The
+# TTL only bounds how stale a memoized ``used_count`` can get.
+COUPON_CACHE_VERSION = 'coupons'
+COUPON_BLOOM_ERROR_RATE = 0.01
+COUPON_SNAPSHOT_TTL = 60
+
+_lock = threading.Lock()
+_state = {'version': None, 'loaded_at': 0.0, 'bloom': None, 'coupons': {}}
+
+
+def build_coupon_bloom():
+    now = timezone.now()
+    codes = list(
+        Coupon.objects.filter(active=True)
+        .exclude(expires_at__lte=now)
+        .values_list('code_normalized', flat=True)
+    )
+    bloom = BloomFilter.for_capacity(len(codes), COUPON_BLOOM_ERROR_RATE)
+    for code in codes:
+        bloom.add(code)
+    return bloom
+
+
+def _shared_bloom(version):
+    stored = (
+        SharedBloomFilter.objects.filter(name=COUPON_CACHE_VERSION, version=version)
+        .values_list('size_bits', 'num_hashes', 'bits')
+        .first()
+    )
+    if stored is not None:
+        return BloomFilter.loads(stored)
+    bloom = build_coupon_bloom()
+    size_bits, num_hashes, bits = bloom.dumps()
+    fields = {'version': version, 'size_bits': size_bits, 'num_hashes': num_hashes, 'bits': bits}
+    # Never replace a filter stored for a newer version by a slower worker
+    if not SharedBloomFilter.objects.filter(name=COUPON_CACHE_VERSION, version__lt=version).update(**fields):
+        SharedBloomFilter.objects.bulk_create(
+            [SharedBloomFilter(name=COUPON_CACHE_VERSION, **fields)], ignore_conflicts=True
+        )
+    return bloom
+
+
+def _local_state():
+    version = get_version(COUPON_CACHE_VERSION)
+    with _lock:
+        if (
+            _state['version'] != version
+            or time.monotonic() - _state['loaded_at'] >= COUPON_SNAPSHOT_TTL
+        ):
+            _state.update(version=version, loaded_at=time.monotonic(), bloom=None, coupons={})
+        bloom, coupons = _state['bloom'], _state['coupons']
+    if bloom is None:
+        bloom = _shared_bloom(version)
+        with _lock:
+            if _state['version'] == version:
+                _state['bloom'] = bloom
+    return bloom, coupons
+
+
+def get_cached_coupon(code):
+    """Return the coupon for ``code`` if it is currently usable.
+
+    Unknown codes are rejected by the Bloom filter and known ones are memoized per
+    worker, so repeated validations cost no query. ``used_count`` may lag behind;
+    redemption must still re-check the usage limit atomically.
+    """
+    normalized = normalize_coupon_code(code)
+    if not normalized:
+        return None
+    bloom, coupons = _local_state()
+    if normalized not in bloom:
+        return None
+    try:
+        coupon = coupons[normalized]
+    except KeyError:
+        coupon = Coupon.objects.filter(code_normalized=normalized, active=True).first()
+        coupons[normalized] = coupon
+    if coupon is None:
+        return None
+    if coupon.expires_at and coupon.expires_at <= timezone.now():
+        return None
+    if coupon.usage_limit is not None and coupon.used_count >= coupon.usage_limit:
+        return None
+    return coupon
+
+
+def redeem_coupon(coupon):
+    """Count one use of ``coupon`` inside the caller's transaction; False when exhausted.
+
+    Classic coupons do a conditional UPDATE on ``Coupon.used_count``. Sharded ones
+    increment a random CouponRedemptionSlot instead, falling back to the other
+    slots when it is full, so concurrent checkouts rarely wait on the same row.
+    """
+    if coupon.counter_shards:
+        slots = list(range(coupon.counter_shards))
+        random.shuffle(slots)
+        for slot in slots:
+            updated = CouponRedemptionSlot.objects.filter(
+                Q(capacity__isnull=True) | Q(used_count__lt=F('capacity')),
+                coupon_id=coupon.pk,
+                coupon__active=True,
+                slot=slot,
+            ).update(used_count=F('used_count') + 1)
+            if updated:
+                return True
+        return False
+    if coupon.usage_limit is None:
+        return True
+    now = timezone.now()
+    return bool(
+        Coupon.objects.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=now),
+            pk=coupon.pk,
+            active=True,
+            used_count__lt=F('usage_limit'),
+        ).update(used_count=F('used_count') + 1)
+    )
+
+
+def _split_capacity(remaining, shards):
+    base, extra = divmod(remaining, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def reconcile_coupon_counters(coupon):
+    """Fold slot counts into ``Coupon.used_count`` and rebalance the remaining capacity.
+
+    Slots are updated in place under row locks, creating or folding away rows to
+    match ``counter_shards``. Returns the reconciled total.
+    """
+    with transaction.atomic():
+        coupon = Coupon.objects.select_for_update().get(pk=coupon.pk)
+        slots = {
+            s.slot: s
+            for s in CouponRedemptionSlot.objects.select_for_update().filter(coupon=coupon)
+        }
+        if not coupon.counter_shards and not slots:
+            return coupon.used_count
+
+        total = sum(s.used_count for s in slots.values()) if slots else coupon.used_count
+        shards = coupon.counter_shards
+        if shards:
+            if not slots:
+                # Al activar el sharding el conteo previo arranca en el slot 0
+                slots[0] = CouponRedemptionSlot(coupon=coupon, slot=0, used_count=total)
+            extra = [s for n, s in slots.items() if n >= shards]
+            for s in extra:
+                del slots[s.slot]
+                slots.setdefault(0, CouponRedemptionSlot(coupon=coupon, slot=0))
+                slots[0].used_count += s.used_count
+            if extra:
+                CouponRedemptionSlot.objects.filter(pk__in=[s.pk for s in extra]).delete()
+            for n in range(shards):
+                slots.setdefault(n, CouponRedemptionSlot(coupon=coupon, slot=n, used_count=0))
+
+            if coupon.usage_limit is None:
+                shares = [None] * shards
+            else:
+                shares = _split_capacity(max(coupon.usage_limit - total, 0), shards)
+            for n, share in enumerate(shares):
+                slot = slots[n]
+                slot.capacity = None if share is None else slot.used_count + share
+            CouponRedemptionSlot.objects.bulk_create([s for s in slots.values() if s.pk is None])
+            CouponRedemptionSlot.objects.bulk_update(
+                [s for s in slots.values() if s.pk is not None], ['used_count', 'capacity']
+            )
+        else:
+            CouponRedemptionSlot.objects.filter(coupon=coupon).delete()
+        # update() en lugar de save(): no hace falta reconstruir el filtro Bloom
+        Coupon.objects.filter(pk=coupon.pk).update(used_count=total)
+    forget_coupon(coupon.code)
+    return total
+
+
+def get_redeemed_count(coupon):
+    """Live usage count, summing the slots for sharded coupons."""
+    if not coupon.counter_shards:
+        return coupon.used_count
+    total = CouponRedemptionSlot.objects.filter(coupon=coupon).aggregate(total=Sum('used_count'))['total']
+    return total or 0
+
+
+def forget_coupon(code):
+    """Drop one memoized coupon in this worker, e.g. after its ``used_count`` changed."""
+    with _lock:
+        _state['coupons'].pop(normalize_coupon_code(code), None)
+
+
+def invalidate_coupon_cache():
+    with _lock:
+        _state.update(version=None, bloom=None, coupons={})
+    bump_version(COUPON_CACHE_VERSION)
+
+
+@receiver([post_save, post_delete], sender=Coupon)
+def clear_coupon_cache(**kwargs):
+    invalidate_coupon_cache()
+
+
+@receiver(post_save, sender=Coupon)
+def sync_coupon_redemption_slots(sender, instance, raw=False, **kwargs):
+    """Keep slot rows in line with ``counter_shards`` and ``usage_limit`` after admin edits."""
+    if raw:
+        return
+    slots = CouponRedemptionSlot.objects.filter(coupon=instance)
+    if instance.counter_shards or slots.exists():
+        reconcile_coupon_counters(instance)
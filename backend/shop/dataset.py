@@ -0,0 +1,302 @@
+import io
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import accumulate
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .coupons import invalidate_coupon_cache
+from .models import Announcement, Category, Coupon, Order, OrderItem, Product, SiteConfig
+
+# Synthetic catalog and order history for performance work (generate_dataset).
+# Everything comes from one random.Random(seed) and a fixed end date, so the
+# same arguments on an empty database produce the same rows. Product demand
+# follows a Zipf-like curve, orders fall inside store hours and are created in
+# chronological order (ids grow with time, as in production), and placeholder
+# images are drawn locally with Pillow: one picture per product kind, saved as a
+# separate file per product because deleting a product deletes its image.
+
+DATASET_BATCH_SIZE = 5000
+STORE_OPENS = 8
+STORE_HOURS = 14
+SHIPPING_COST = Decimal('1200.00')
+COUPON_ORDER_SHARE = 0.05
+DELIVERY_SHARE = 0.6
+# Share of products listed during the order history instead of before it
+NEW_PRODUCT_SHARE = 0.05
+IMAGE_SIZE = 240
+
+DEPARTMENTS = {
+    'Lácteos': ['Leche entera', 'Leche descremada', 'Yogur bebible', 'Queso cremoso', 'Queso rallado',
+                'Manteca', 'Crema de leche', 'Dulce de leche', 'Ricota', 'Postre de chocolate'],
+    'Almacén': ['Azúcar común', 'Arroz largo fino', 'Harina 000', 'Fideos tirabuzón', 'Aceite de girasol',
+                'Puré de tomate', 'Atún al natural', 'Lentejas', 'Garbanzos', 'Sal fina', 'Pimentón',
+                'Orégano', 'Mayonesa', 'Mostaza', 'Kétchup', 'Choclo amarillo', 'Arvejas'],
+    'Desayuno y merienda': ['Yerba mate', 'Café molido', 'Café instantáneo', 'Té en saquitos', 'Cacao en polvo',
+                            'Mermelada de durazno', 'Miel', 'Avena instantánea', 'Galletitas de agua',
+                            'Budín de limón', 'Alfajor de maicena'],
+    'Bebidas': ['Gaseosa cola', 'Agua mineral', 'Jugo de naranja', 'Agua saborizada', 'Soda',
+                'Cerveza rubia', 'Vino tinto Malbec', 'Sidra', 'Fernet'],
+    'Panadería': ['Pan lactal', 'Pan rallado', 'Tostadas de arroz', 'Grisines', 'Prepizza'],
+    'Carnicería': ['Jamón cocido', 'Salame', 'Milanesas de nalga', 'Hamburguesas', 'Salchichas'],
+    'Frutas y verduras': ['Manzana roja', 'Banana', 'Limón', 'Papa', 'Cebolla', 'Tomate perita',
+                          'Zanahoria', 'Lechuga criolla', 'Zapallo anco'],
+    'Limpieza': ['Lavandina', 'Detergente', 'Jabón en polvo', 'Suavizante', 'Limpiavidrios', 'Esponja',
+                 'Desengrasante', 'Bolsas de residuos'],
+    'Perfumería': ['Champú', 'Acondicionador', 'Jabón de tocador', 'Desodorante', 'Pasta dental',
+                   'Papel higiénico', 'Pañales', 'Algodón'],
+    'Mascotas': ['Alimento para gatos', 'Alimento para perros', 'Piedras sanitarias'],
+}
+SECTIONS = ['Ofertas', 'Importados', 'Orgánicos', 'Sin TACC', 'Mayorista', 'Marca propia', 'Temporada',
+            'Regionales', 'Económicos', 'Premium', 'Congelados', 'Línea light', 'Para chicos', 'Veganos',
+            'Gourmet', 'Kioscos', 'Pack ahorro', 'Novedades', 'Clásicos', 'Artesanales']
+BRANDS = ['Don Julián', 'La Agrícola', 'El Ñandú', 'Santa Mónica', 'Los Álamos', 'Doña Inés', 'Campo Verde',
+          'Del Señor', 'Nuestra Huerta', 'Río Cuarto', 'La Pampeña', 'San Cayetano']
+VARIANTS = ['', 'clásico', 'light', 'sin TACC', 'orgánico', 'familiar', 'reducido en sodio', 'con vitaminas',
+            'edición especial', 'económico', 'premium', 'pack ahorro']
+SIZES = ['200 g', '500 g', '1 kg', '750 ml', '1 L', '1,5 L', '2,25 L', 'x6 u.', 'x12 u.', '3 kg']
+FIRST_NAMES = ['María', 'José', 'Lucía', 'Martín', 'Sofía', 'Joaquín', 'Valentina', 'Tomás', 'Camila',
+               'Nicolás', 'Agustina', 'Matías', 'Florencia', 'Ramón', 'Inés', 'Germán', 'Begoña', 'Iñaki']
+LAST_NAMES = ['González', 'Rodríguez', 'Gómez', 'Fernández', 'López', 'Díaz', 'Martínez', 'Pérez',
+              'Sánchez', 'Romero', 'Álvarez', 'Muñoz', 'Peña', 'Ibáñez', 'Suárez', 'Giménez']
+STREETS = ['Av. Colón', 'Bv. San Juan', 'Av. Vélez Sarsfield', 'Obispo Trejo', 'Av. Hipólito Yrigoyen',
+           'Belgrano', 'Dean Funes', 'Av. Rafael Núñez', 'Ituzaingó', 'Av. Maipú']
+PALETTE = [(231, 76, 60), (46, 134, 193), (39, 174, 96), (243, 156, 18), (142, 68, 173),
+           (22, 160, 133), (211, 84, 0), (52, 73, 94), (192, 57, 43), (41, 128, 185)]
+
+
+@contextmanager
+def explicit_created_at(*models):
+    """Let bulk_create keep the ``created_at`` we set instead of auto_now_add's now()."""
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _placeholder(label, color):
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', (IMAGE_SIZE, IMAGE_SIZE), color)
+    draw = ImageDraw.Draw(image)
+    initials = ''.join(word[0] for word in label.split()[:2]).upper()
+    draw.text((IMAGE_SIZE // 2, IMAGE_SIZE // 2), initials, fill='white', anchor='mm')
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=70)
+    return out.getvalue()
+
+
+def _money(value):
+    return value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class DatasetGenerator:
+    def __init__(self, seed=1, end=None, days=730, batch_size=DATASET_BATCH_SIZE, images=True, progress=None):
+        self.rng = random.Random(seed)
+        self.end = end or timezone.localdate()
+        self.days = days
+        self.start = self.end - timedelta(days=days - 1)
+        self.batch_size = batch_size
+        self.images = images
+        self.progress = progress or (lambda message: None)
+
+    def _aware(self, day, seconds=0):
+        return timezone.make_aware(datetime.combine(day, time.min)) + timedelta(seconds=seconds)
+
+    def categories(self, count):
+        names = list(DEPARTMENTS) + [f'{dept} · {section}' for section in SECTIONS for dept in DEPARTMENTS]
+        names = names[:count]
+        if len(names) < count:
+            raise ValueError(f'A lo sumo {len(names)} categorías')
+        colors = {dept: PALETTE[i % len(PALETTE)] for i, dept in enumerate(DEPARTMENTS)}
+        objs = []
+        for name in names:
+            dept = name.split(' · ')[0]
+            category = Category(name=name, slug=slugify(name))
+            if self.images:
+                category.image = default_storage.save(
+                    f'categories/dataset/{category.slug}.jpg', ContentFile(_placeholder(name, colors[dept]))
+                )
+            objs.append(category)
+        with transaction.atomic():
+            created = Category.objects.bulk_create(objs, batch_size=self.batch_size)
+        self.progress(f'{len(created)} categorías')
+        return created
+
+    def products(self, count, categories):
+        by_dept = {}
+        for category in categories:
+            by_dept.setdefault(category.name.split(' · ')[0], []).append(category)
+        kinds = [(dept, base) for dept, bases in DEPARTMENTS.items() if dept in by_dept for base in bases]
+        combos = [(kind, brand, variant, size) for kind in kinds for brand in BRANDS
+                  for variant in VARIANTS for size in SIZES]
+        self.rng.shuffle(combos)
+        pictures = {}
+        history_start = self._aware(self.start)
+        created_total = 0
+        catalog = []
+        for offset in range(0, count, self.batch_size):
+            batch = []
+            for i in range(offset, min(offset + self.batch_size, count)):
+                (dept, base), brand, variant, size = combos[i % len(combos)]
+                name = ' '.join(part for part in (base, variant, brand, size) if part)
+                if i >= len(combos):
+                    name = f'{name} #{i // len(combos) + 1}'
+                price = Decimal(self.rng.randint(250, 25000)) - Decimal('0.10')
+                if self.rng.random() < NEW_PRODUCT_SHARE:
+                    created_at = history_start + timedelta(seconds=self.rng.uniform(0, self.days * 86400))
+                else:
+                    created_at = history_start - timedelta(seconds=self.rng.uniform(0, 365 * 86400))
+                product = Product(
+                    category=self.rng.choice(by_dept[dept]),
+                    name=name,
+                    description=f'{base} {brand}. Presentación {size}.',
+                    price=price,
+                    offer_price=_money(price * Decimal('0.85')) if self.rng.random() < 0.08 else None,
+                    stock=0 if self.rng.random() < 0.03 else self.rng.randint(1, 500),
+                    is_active=self.rng.random() > 0.02,
+                    promoted=self.rng.random() < 0.01,
+                    created_at=created_at,
+                )
+                if self.images:
+                    if base not in pictures:
+                        pictures[base] = _placeholder(base, PALETTE[len(pictures) % len(PALETTE)])
+                    product.image = default_storage.save(
+                        f'products/dataset/p{i:07d}.jpg', ContentFile(pictures[base])
+                    )
+                batch.append(product)
+            with transaction.atomic(), explicit_created_at(Product):
+                catalog.extend(Product.objects.bulk_create(batch))
+            created_total += len(batch)
+            self.progress(f'{created_total}/{count} productos')
+        return catalog
+
+    def coupons(self, count):
+        coupons = []
+        for i in range(count):
+            kind = self.rng.choice([Coupon.TYPE_FIXED, Coupon.TYPE_PERCENT, Coupon.TYPE_FREE_SHIPPING])
+            code = f'PROMO{i:05d}'
+            coupons.append(Coupon(
+                code=code,
+                code_normalized=code.lower(),
+                type=kind,
+                amount=Decimal(self.rng.choice([500, 1000, 2000])) if kind == Coupon.TYPE_FIXED else 0,
+                percent=Decimal(self.rng.choice([5, 10, 15, 20])) if kind == Coupon.TYPE_PERCENT else 0,
+                percent_cap=Decimal(self.rng.choice([0, 3000, 5000])) if kind == Coupon.TYPE_PERCENT else 0,
+                min_subtotal=Decimal(self.rng.choice([0, 5000, 10000])),
+            ))
+        with transaction.atomic():
+            # bulk_create skips pre_save, so code_normalized is filled in above
+            created = Coupon.objects.bulk_create(coupons, batch_size=self.batch_size)
+            transaction.on_commit(invalidate_coupon_cache)
+        self.progress(f'{len(created)} cupones')
+        return created
+
+    def _discount(self, coupon, subtotal):
+        """Discount and shipping as OrderSerializer would apply them; None if the coupon doesn't apply."""
+        if subtotal < coupon.min_subtotal:
+            return None
+        if coupon.type == Coupon.TYPE_FIXED:
+            return min(coupon.amount, subtotal), None
+        if coupon.type == Coupon.TYPE_PERCENT:
+            raw = subtotal * coupon.percent / 100
+            return _money(min(raw, coupon.percent_cap) if coupon.percent_cap > 0 else raw), None
+        return Decimal('0'), Decimal('0')
+
+    def orders(self, count, catalog, coupons):
+        sellable = [p for p in catalog if p.is_active]
+        # Zipf-like demand: the k-th most popular product sells ~1/k as much as the first
+        demand = list(accumulate(1 / (k + 1) for k in range(len(sellable))))
+        self.rng.shuffle(sellable)
+        prices = [p.offer_price or p.price for p in sellable]
+        span = self.days * 86400
+        created = 0
+        for offset in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - offset)
+            # Each batch covers its own slice of the history, so ids grow with time
+            slice_start, slice_len = span * offset / count, span * size / count
+            moments = sorted(slice_start + self.rng.random() * slice_len for _ in range(size))
+            orders, baskets = [], []
+            for moment in moments:
+                day = self.start + timedelta(days=int(moment // 86400))
+                seconds = STORE_OPENS * 3600 + (moment % 86400) / 86400 * STORE_HOURS * 3600
+                picks = self.rng.choices(range(len(sellable)), cum_weights=demand, k=self.rng.randint(1, 8))
+                basket = {idx: self.rng.choice((1, 1, 1, 2, 2, 3)) for idx in picks}
+                subtotal = sum(prices[idx] * qty for idx, qty in basket.items())
+                delivery = self.rng.random() < DELIVERY_SHARE
+                shipping = SHIPPING_COST if delivery else Decimal('0')
+                discount, code = Decimal('0'), ''
+                if coupons and self.rng.random() < COUPON_ORDER_SHARE:
+                    coupon = self.rng.choice(coupons)
+                    applied = self._discount(coupon, subtotal)
+                    if applied is not None:
+                        discount, code = applied[0], coupon.code
+                        if applied[1] is not None:
+                            shipping = applied[1]
+                first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                orders.append(Order(
+                    name=f'{first} {last}',
+                    phone=f'351{self.rng.randint(4000000, 6999999)}',
+                    address=f'{self.rng.choice(STREETS)} {self.rng.randint(1, 4500)}' if delivery else '',
+                    payment_method=self.rng.choice(('cash', 'transfer')),
+                    delivery_method='delivery' if delivery else 'pickup',
+                    total=subtotal - discount + shipping,
+                    discount_total=discount,
+                    coupon_code=code,
+                    shipping_cost=shipping,
+                    created_at=self._aware(day, seconds),
+                ))
+                baskets.append(basket)
+            with transaction.atomic(), explicit_created_at(Order):
+                Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, product=sellable[idx], quantity=qty, price=prices[idx])
+                    for order, basket in zip(orders, baskets)
+                    for idx, qty in basket.items()
+                ], batch_size=self.batch_size * 2)
+            created += size
+            self.progress(f'{created}/{count} pedidos')
+
+    def site(self):
+        SiteConfig.objects.update_or_create(id=1, defaults={
+            'whatsapp_phone': '+5493510000000',
+            'alias_or_cbu': 'alias.dataset - Supermercado (Banco) - CUIT 30-00000000-0',
+            'shipping_cost': SHIPPING_COST,
+        })
+        Announcement.objects.bulk_create([
+            Announcement(title='Envío gratis los martes', message='En compras mayores a $20.000'),
+            Announcement(title='Nuevos productos sin TACC', message='Mirá la sección Almacén · Sin TACC'),
+        ])
+
+
+def generate_dataset(categories=200, products=100_000, orders=2_000_000, coupons=500, seed=1, end=None,
+                     days=730, batch_size=DATASET_BATCH_SIZE, images=True, derived=True, progress=None):
+    """Fill the database with a synthetic store; returns the generator's created catalog."""
+    generator = DatasetGenerator(seed=seed, end=end, days=days, batch_size=batch_size, images=images,
+                                 progress=progress)
+    generator.site()
+    category_objs = generator.categories(categories)
+    catalog = generator.products(products, category_objs)
+    coupon_objs = generator.coupons(coupons)
+    generator.orders(orders, catalog, coupon_objs)
+    if derived:
+        from .popularity import update_popularity
+        from .recommendations import rebuild_cooccurrence
+        from .rollups import rebuild_sales_rollups
+
+        rebuild_sales_rollups()
+        generator.progress('resúmenes diarios de ventas recalculados')
+        update_popularity(today=generator.end)
+        rebuild_cooccurrence()
+        generator.progress('popularidad y recomendaciones recalculadas')
+    return catalog
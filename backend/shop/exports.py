@@ -0,0 +1,131 @@
+import csv
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .analytics import filter_order_items
+from .models import OrderItem
+
+# Streaming sales export. Rows are read with .iterator(), which uses a
+# server-side cursor on PostgreSQL, and written out in ~64 KB chunks so memory
+# stays constant and the worker keeps sending bytes however long the range is.
+# Under ASGI Django would drain a sync iterator with sync_to_async(list) before
+# sending anything, so the view hands it over wrapped in as_async().
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FLUSH_BYTES = 64 * 1024
+
+ORDER_FIELDS = (
+    'order_id', 'order__created_at', 'order__name', 'order__phone', 'order__payment_method',
+    'order__delivery_method', 'order__coupon_code', 'order__discount_total',
+    'order__shipping_cost', 'order__total',
+)
+ITEM_FIELDS = ('product_id', 'product__name', 'quantity', 'price')
+
+CSV_HEADER = (
+    'order_id', 'created_at', 'name', 'phone', 'payment_method', 'delivery_method',
+    'coupon_code', 'discount_total', 'shipping_cost', 'total',
+    'product_id', 'product_name', 'quantity', 'price', 'line_total',
+)
+
+
+def _item_rows(start=None, end=None):
+    items = filter_order_items(OrderItem.objects.all(), start, end)
+    rows = items.order_by('order_id', 'id').values_list(*ORDER_FIELDS, *ITEM_FIELDS)
+    return rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _local_iso(value):
+    return timezone.localtime(value).isoformat()
+
+
+class _Echo:
+    """File-like object handing back whatever csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv_lines(start=None, end=None):
+    """One CSV line per order item, with the order columns repeated on each line."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    n = len(ORDER_FIELDS)
+    for row in _item_rows(start, end):
+        order, (product_id, product_name, quantity, price) = row[:n], row[n:]
+        yield writer.writerow(
+            (order[0], _local_iso(order[1]), *order[2:], product_id, product_name, quantity, price, price * quantity)
+        )
+
+
+def iter_ndjson_lines(start=None, end=None):
+    """One JSON object per order with its items nested, relying on rows ordered by order."""
+    n = len(ORDER_FIELDS)
+    current, current_id = None, None
+    for row in _item_rows(start, end):
+        if row[0] != current_id:
+            if current is not None:
+                yield json.dumps(current, ensure_ascii=False) + '\n'
+            (current_id, created_at, name, phone, payment_method, delivery_method,
+             coupon_code, discount_total, shipping_cost, total) = row[:n]
+            current = {
+                'id': current_id,
+                'created_at': _local_iso(created_at),
+                'name': name,
+                'phone': phone,
+                'payment_method': payment_method,
+                'delivery_method': delivery_method,
+                'coupon_code': coupon_code,
+                'discount_total': str(discount_total),
+                'shipping_cost': str(shipping_cost),
+                'total': str(total),
+                'items': [],
+            }
+        product_id, product_name, quantity, price = row[n:]
+        current['items'].append(
+            {'product_id': product_id, 'product_name': product_name, 'quantity': quantity, 'price': str(price)}
+        )
+    if current is not None:
+        yield json.dumps(current, ensure_ascii=False) + '\n'
+
+
+def buffered(lines, size=EXPORT_FLUSH_BYTES):
+    """Join text lines into UTF-8 chunks of roughly ``size`` bytes."""
+    parts, pending = [], 0
+    for line in lines:
+        parts.append(line)
+        pending += len(line)
+        if pending >= size:
+            yield ''.join(parts).encode('utf-8')
+            parts, pending = [], 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+def gzipped(chunks):
+    """Compress a byte stream into a gzip member, flushing after every chunk."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def as_async(chunks):
+    """Async iterator advancing the sync ``chunks`` one chunk at a time in Django's sync thread.
+
+    thread_sensitive keeps the export's database cursor on the thread that opened it.
+    """
+    chunks = iter(chunks)
+    step = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    try:
+        while (chunk := await step(chunks, done)) is not done:
+            yield chunk
+    finally:
+        # A client that disconnects must not leave the server-side cursor open
+        if hasattr(chunks, 'close'):
+            await sync_to_async(chunks.close, thread_sensitive=True)()
@@ -0,0 +1,139 @@
+import math
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .analytics import sales_stats_cache_version
+from .models import DailyProductSales, Product
+
+# Restock forecast. Sales velocity is an exponentially weighted moving average
+# of units sold per closed day, computed for the whole catalog at once from the
+# daily product rollups: a single query grouped by product sums
+# ``weight(day) * quantity`` over the window. Velocities only change when a day
+# closes or rollups are rebuilt, so they are cached per day and sales-stats
+# version; stock is live.
+
+RESTOCK_WINDOW_DAYS = 56
+RESTOCK_HALF_LIFE_DAYS = 7
+# Alert when stock runs out sooner than a reorder takes to arrive
+RESTOCK_LEAD_DAYS = 7
+# Suggested reorders cover the lead time plus this many days of sales
+RESTOCK_COVER_DAYS = 14
+
+DECAY = 0.5 ** (1 / RESTOCK_HALF_LIFE_DAYS)
+
+
+def _fetch_array(queryset, columns):
+    """Run a values_list() queryset on a raw cursor straight into an int64 array."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, columns)
+
+
+def _weighted_sales(today):
+    """Array of ``(product_id, sum of DECAY ** age * quantity)`` over the window, one row per product sold.
+
+    The day weights are a small derived table joined on ``day``, so the database
+    reads each day through the (day, product) index and returns one row per product.
+    """
+    weights = ' UNION ALL '.join(['SELECT %s AS day, CAST(%s AS DOUBLE PRECISION) AS weight'] * RESTOCK_WINDOW_DAYS)
+    params = []
+    for age in range(RESTOCK_WINDOW_DAYS):
+        params += [today - timedelta(days=age + 1), DECAY ** age]
+    table = connection.ops.quote_name(DailyProductSales._meta.db_table)
+    sql = f"""
+        SELECT s.product_id, SUM(s.quantity * w.weight)
+        FROM {table} s
+        JOIN ({weights}) w ON w.day = s.day
+        GROUP BY s.product_id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 2)
+
+
+def _velocities(today):
+    """Return ``(product_ids, velocity)`` sorted by id, velocity in units per day."""
+    ids = _fetch_array(Product.objects.order_by('id').values_list('id'), 1)[:, 0]
+    weighted = np.zeros(len(ids))
+    if len(ids):
+        rows = _weighted_sales(today)
+        sold = rows[:, 0].astype(np.int64)
+        idx = np.searchsorted(ids, sold).clip(max=len(ids) - 1)
+        known = ids[idx] == sold
+        weighted[idx[known]] = rows[known, 1]
+
+    # Normalise over the days each product has been listed, so new ones are not diluted
+    listed = np.full(len(ids), RESTOCK_WINDOW_DAYS)
+    window_start = timezone.make_aware(
+        datetime.combine(today - timedelta(days=RESTOCK_WINDOW_DAYS), time.min)
+    )
+    for pk, created_at in Product.objects.filter(created_at__gt=window_start).values_list('id', 'created_at'):
+        i = np.searchsorted(ids, pk)
+        if i < len(ids) and ids[i] == pk:
+            listed[i] = max((today - timezone.localdate(created_at)).days, 1)
+    return ids, weighted * (1 - DECAY) / (1 - DECAY ** listed)
+
+
+def sales_velocity(today=None):
+    today = today or timezone.localdate()
+    key = f'restock_velocity:{sales_stats_cache_version()}:{today}'
+    cached = cache.get(key)
+    if cached is None:
+        cached = _velocities(today)
+        cache.set(key, cached, 60 * 60 * 24)
+    return cached
+
+
+def restock_forecast(top=None, page=1, alerts_only=False, today=None):
+    """Active products ordered by urgency (soonest stockout first).
+
+    Returns ``{'count', 'results'}`` where results is the requested page; products
+    without recent sales have no stockout estimate and sort last.
+    """
+    today = today or timezone.localdate()
+    ids, velocity = sales_velocity(today)
+    stock_rows = _fetch_array(
+        Product.objects.filter(is_active=True).order_by('id').values_list('id', 'stock'), 2
+    )
+    product_ids, stock = stock_rows[:, 0], stock_rows[:, 1]
+
+    rate = np.zeros(len(product_ids))
+    if len(ids):
+        idx = np.searchsorted(ids, product_ids).clip(max=len(ids) - 1)
+        known = ids[idx] == product_ids
+        rate[known] = velocity[idx[known]]
+    with np.errstate(divide='ignore'):
+        days_left = np.where(rate > 0, stock / rate, np.inf)
+    reorder = np.maximum(np.ceil(rate * (RESTOCK_LEAD_DAYS + RESTOCK_COVER_DAYS)) - stock, 0)
+
+    order = np.lexsort((-rate, days_left))
+    if alerts_only:
+        order = order[days_left[order] <= RESTOCK_LEAD_DAYS]
+    count = len(order)
+    if top:
+        order = order[(page - 1) * top: page * top]
+
+    names = Product.objects.all()
+    if top:
+        names = names.filter(id__in=product_ids[order].tolist())
+    names = dict(names.values_list('id', 'name'))
+    results = []
+    for i in order:
+        days = days_left[i]
+        finite = math.isfinite(days)
+        results.append({
+            'product_id': int(product_ids[i]),
+            'name': names.get(int(product_ids[i])),
+            'stock': int(stock[i]),
+            'velocity': round(float(rate[i]), 2),
+            'days_to_stockout': round(float(days), 1) if finite else None,
+            'stockout_date': today + timedelta(days=math.floor(days)) if finite else None,
+            'reorder_quantity': int(reorder[i]),
+            'alert': bool(days <= RESTOCK_LEAD_DAYS),
+        })
+    return {'count': count, 'results': results}
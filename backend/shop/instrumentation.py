@@ -0,0 +1,255 @@
+import cProfile
+import contextvars
+import json
+import logging
+import random
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import observe_request
+from .slow_queries import record_slow_query
+
+# Per-request performance metrics. ServerTimingMiddleware opens a RequestMetrics
+# in a context variable; the SQL execute wrapper, the instrumented cache backend,
+# the timed serializers and the timed JSON renderer add to it when one is active
+# and are a plain pass-through otherwise. Totals go out as a Server-Timing header, one JSON
+# log line on the "shop.perf" logger per request and the Prometheus metrics.
+# Statements over SLOW_QUERY_THRESHOLD_MS, in or out of a request, go to the
+# slow query log (shop.slow_queries).
+
+logger = logging.getLogger('shop.perf')
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = (
+        'request', 'started', 'sql_count', 'sql_time', 'serialize_time', 'serializing', 'render_time',
+        'cache_hits', 'cache_misses',
+    )
+
+    def __init__(self, request=None):
+        self.request = request
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+        self.render_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def current_metrics():
+    return _current.get()
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    started = time.perf_counter()
+    try:
+        result = execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        if metrics is not None:
+            metrics.sql_count += 1
+            metrics.sql_time += elapsed
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold and elapsed * 1000 >= threshold:
+        view = _view_name(metrics.request) if metrics is not None else None
+        try:
+            record_slow_query(context['connection'], sql, params, many, elapsed, view)
+        except Exception:
+            # An unwritable log or an EXPLAIN in a broken transaction must not fail the query
+            logger.warning('No se pudo registrar la consulta lenta', exc_info=True)
+    return result
+
+
+def _install_sql_wrapper(connection):
+    # Installed once per connection wrapper; it survives reconnects
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_wrapper)
+
+
+@receiver(connection_created)
+def install_sql_wrapper(sender, connection, **kwargs):
+    _install_sql_wrapper(connection)
+
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    """Counts hits and misses of get()/get_many() for the active request."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        metrics = _current.get()
+        if metrics is not None:
+            if value is _MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
+
+
+class TimedSerializerMixin:
+    """Adds ``to_representation`` time to the request's ``serialize`` phase.
+
+    Only the outermost call is timed, so nested serializers are not counted twice;
+    with ``many=True`` that is each item. SQL run while serializing (lazy relations)
+    stays in ``db``.
+    """
+
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None or metrics.serializing:
+            return super().to_representation(instance)
+        metrics.serializing = True
+        sql_before = metrics.sql_time
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.serialize_time += elapsed - (metrics.sql_time - sql_before)
+            metrics.serializing = False
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer that adds its encoding time to the request's ``render`` phase."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            metrics.render_time += time.perf_counter() - started
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class ServerTimingMiddleware:
+    """Times each request and reports it in a Server-Timing header and a JSON log line.
+
+    Settings: SERVER_TIMING_HEADER (send the header), SERVER_TIMING_PROFILE_RATE
+    (share of requests run under cProfile) and SERVER_TIMING_PROFILE_THRESHOLD_MS
+    (sampled profiles slower than this are written to SERVER_TIMING_PROFILE_DIR).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Stay async under ASGI so streaming views (the order feed) are not buffered
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.send_header = getattr(settings, 'SERVER_TIMING_HEADER', True)
+        self.profile_rate = getattr(settings, 'SERVER_TIMING_PROFILE_RATE', 0.0)
+        self.profile_threshold = getattr(settings, 'SERVER_TIMING_PROFILE_THRESHOLD_MS', 500) / 1000
+        self.profile_dir = Path(getattr(settings, 'SERVER_TIMING_PROFILE_DIR', 'profiles'))
+        # Connections opened before this module was imported never sent connection_created
+        for connection in connections.all():
+            _install_sql_wrapper(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics(request)
+        token = _current.set(metrics)
+        profiler = None
+        if self.profile_rate and random.random() < self.profile_rate:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            _current.reset(token)
+        return self._finish(request, response, metrics, profiler)
+
+    async def __acall__(self, request):
+        # cProfile sees every task on the event loop, so async requests are not sampled
+        metrics = RequestMetrics(request)
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, None)
+
+    def _finish(self, request, response, metrics, profiler):
+        total = time.perf_counter() - metrics.started
+        view = _view_name(request)
+        observe_request(view, request.method, response.status_code, total, metrics)
+        if profiler is not None and total >= self.profile_threshold:
+            self._dump_profile(profiler, view, total)
+        if self.send_header:
+            response['Server-Timing'] = self._header(metrics, total)
+        logger.info(json.dumps({
+            'view': view,
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sql_count': metrics.sql_count,
+            'sql_ms': round(metrics.sql_time * 1000, 2),
+            'serialize_ms': round(metrics.serialize_time * 1000, 2),
+            'render_ms': round(metrics.render_time * 1000, 2),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+        }, separators=(',', ':')))
+        return response
+
+    @staticmethod
+    def _header(metrics, total):
+        app = max(total - metrics.sql_time - metrics.serialize_time - metrics.render_time, 0)
+        return ', '.join([
+            f'db;dur={metrics.sql_time * 1000:.2f};desc="{metrics.sql_count} queries"',
+            f'serialize;dur={metrics.serialize_time * 1000:.2f}',
+            f'render;dur={metrics.render_time * 1000:.2f}',
+            f'app;dur={app * 1000:.2f}',
+            f'cache;desc="{metrics.cache_hits} hits {metrics.cache_misses} misses"',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+    def _dump_profile(self, profiler, view, total):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{view.replace(":", "_").replace("/", "_")}-{int(total * 1000)}ms.prof'
+        profiler.dump_stats(self.profile_dir / name)
+        logger.warning('Perfil guardado: %s', self.profile_dir / name)
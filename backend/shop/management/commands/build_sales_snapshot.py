@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from shop.snapshot import SNAPSHOT_BATCH_SIZE, build_sales_snapshot, snapshot_dir
+
+
+class Command(BaseCommand):
+    help = 'Agrega los ítems de pedidos nuevos al snapshot columnar de ventas (archivos .npy).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Directorio del snapshot (por defecto SALES_SNAPSHOT_DIR)')
+        parser.add_argument('--rebuild', action='store_true', help='Descarta el snapshot y lo arma desde cero')
+        parser.add_argument('--batch-size', type=int, default=SNAPSHOT_BATCH_SIZE)
+
+    def handle(self, *args, **opts):
+        directory = opts['dir'] or snapshot_dir()
+        added = build_sales_snapshot(directory, rebuild=opts['rebuild'], batch_size=opts['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{added} filas agregadas al snapshot en {directory}'))
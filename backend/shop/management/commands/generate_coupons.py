@@ -0,0 +1,92 @@
+import csv
+import secrets
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from shop.coupons import invalidate_coupon_cache
+from shop.models import COUPON_CODE_MAX_LENGTH, Coupon, normalize_coupon_code
+
+# Sin caracteres ambiguos (0/O, 1/I/L) para códigos que se tipean a mano
+ALPHABET = 'ABCDEFGHJKMNPQRSTUVWXYZ23456789'
+
+
+class Command(BaseCommand):
+    help = 'Genera cupones únicos en masa para campañas (bulk_create por lotes).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100_000)
+        parser.add_argument('--prefix', default='')
+        parser.add_argument('--length', type=int, default=8, help='Largo de la parte aleatoria')
+        parser.add_argument('--type', choices=[t for t, _ in Coupon.TYPES], default=Coupon.TYPE_FIXED)
+        parser.add_argument('--amount', type=Decimal, default=Decimal('0'))
+        parser.add_argument('--percent', type=Decimal, default=Decimal('0'))
+        parser.add_argument('--percent-cap', type=Decimal, default=Decimal('0'))
+        parser.add_argument('--min-subtotal', type=Decimal, default=Decimal('0'))
+        parser.add_argument('--usage-limit', type=int, default=1)
+        parser.add_argument('--expires-days', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--output', help='CSV donde escribir los códigos generados')
+
+    def handle(self, *args, **opts):
+        count = opts['count']
+        prefix = opts['prefix'].strip().upper()
+        length = opts['length']
+        if count <= 0:
+            raise CommandError('--count debe ser positivo')
+        if len(prefix) + length > COUPON_CODE_MAX_LENGTH:
+            raise CommandError(f'prefijo + largo no puede superar {COUPON_CODE_MAX_LENGTH} caracteres')
+        if len(ALPHABET) ** length < count * 4:
+            raise CommandError('--length demasiado corto para la cantidad pedida')
+
+        existing = set(
+            Coupon.objects.filter(code_normalized__startswith=normalize_coupon_code(prefix))
+            .values_list('code_normalized', flat=True)
+        )
+        codes = []
+        seen = set()
+        while len(codes) < count:
+            code = prefix + ''.join(secrets.choice(ALPHABET) for _ in range(length))
+            normalized = normalize_coupon_code(code)
+            if normalized in seen or normalized in existing:
+                continue
+            seen.add(normalized)
+            codes.append(code)
+
+        expires_at = None
+        if opts['expires_days'] is not None:
+            expires_at = timezone.now() + timedelta(days=opts['expires_days'])
+        template = dict(
+            type=opts['type'],
+            amount=opts['amount'],
+            percent=opts['percent'],
+            percent_cap=opts['percent_cap'],
+            min_subtotal=opts['min_subtotal'],
+            usage_limit=opts['usage_limit'] or None,
+            expires_at=expires_at,
+            active=True,
+        )
+
+        batch_size = opts['batch_size']
+        with transaction.atomic():
+            for start in range(0, len(codes), batch_size):
+                # bulk_create no dispara pre_save: code_normalized se completa acá
+                Coupon.objects.bulk_create(
+                    [
+                        Coupon(code=code, code_normalized=normalize_coupon_code(code), **template)
+                        for code in codes[start:start + batch_size]
+                    ],
+                    batch_size=batch_size,
+                )
+            transaction.on_commit(invalidate_coupon_cache)
+
+        if opts['output']:
+            with open(opts['output'], 'w', newline='', encoding='utf-8') as fh:
+                writer = csv.writer(fh)
+                writer.writerow(['code'])
+                writer.writerows([code] for code in codes)
+
+        self.stdout.write(self.style.SUCCESS(f'{len(codes)} cupones creados'))
@@ -0,0 +1,54 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.dataset import DATASET_BATCH_SIZE, generate_dataset
+from shop.models import Order, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera un catálogo e historial de pedidos sintéticos para pruebas de carga '
+        '(bulk_create por lotes, imágenes locales, reproducible con --seed).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=200)
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--orders', type=int, default=2_000_000)
+        parser.add_argument('--coupons', type=int, default=500)
+        parser.add_argument('--days', type=int, default=730, help='Días de historial de pedidos')
+        parser.add_argument('--end', type=date.fromisoformat, help='Último día del historial (AAAA-MM-DD, por defecto hoy)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=DATASET_BATCH_SIZE)
+        parser.add_argument('--no-images', action='store_true', help='No generar imágenes de ejemplo')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='No recalcular resúmenes de ventas, popularidad ni recomendaciones')
+        parser.add_argument('--force', action='store_true', help='Generar aunque la base ya tenga datos')
+
+    def handle(self, *args, **opts):
+        if not opts['force'] and (Product.objects.exists() or Order.objects.exists()):
+            raise CommandError('La base ya tiene productos o pedidos; usar --force para agregar igual')
+        started = time.perf_counter()
+
+        def progress(message):
+            self.stdout.write(f'[{time.perf_counter() - started:7.1f}s] {message}')
+
+        try:
+            generate_dataset(
+                categories=opts['categories'],
+                products=opts['products'],
+                orders=opts['orders'],
+                coupons=opts['coupons'],
+                seed=opts['seed'],
+                end=opts['end'],
+                days=opts['days'],
+                batch_size=opts['batch_size'],
+                images=not opts['no_images'],
+                derived=not opts['skip_derived'],
+                progress=progress,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f'Dataset generado en {time.perf_counter() - started:.1f}s'))
@@ -0,0 +1,62 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.catalog_import import IMPORT_CHUNK_SIZE, IMPORT_IMAGE_WORKERS, IMPORT_KEYS, file_format, import_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa una lista de precios de proveedor (CSV o XLSX) leyendo el archivo por partes: '
+        'compara por SKU o nombre, inserta y actualiza por lotes y asocia imágenes locales en paralelo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Archivo .csv o .xlsx con encabezado (sku, nombre, categoría, precio, ...)')
+        parser.add_argument('--key', choices=IMPORT_KEYS, default='sku',
+                            help='Columna para encontrar productos existentes')
+        parser.add_argument('--images-dir',
+                            help='Carpeta de las imágenes de la columna "imagen" (por defecto, la del archivo)')
+        parser.add_argument('--replace-images', action='store_true', help='Reemplazar imágenes ya cargadas')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='Filas por transacción')
+        parser.add_argument('--workers', type=int, default=IMPORT_IMAGE_WORKERS, help='Hilos para copiar imágenes')
+        parser.add_argument('--dry-run', action='store_true', help='Calcular los cambios sin guardarlos')
+
+    def handle(self, *args, **opts):
+        path = Path(opts['file'])
+        if not path.is_file():
+            raise CommandError(f'No existe el archivo {path}')
+        if opts['chunk_size'] <= 0:
+            raise CommandError('--chunk-size debe ser positivo')
+        started = time.perf_counter()
+
+        def progress(message):
+            self.stdout.write(f'[{time.perf_counter() - started:7.1f}s] {message}')
+
+        try:
+            with open(path, 'rb') as fh:
+                report = import_catalog(
+                    fh,
+                    file_format(path),
+                    key=opts['key'],
+                    images_dir=opts['images_dir'] or path.parent,
+                    replace_images=opts['replace_images'],
+                    chunk_size=opts['chunk_size'],
+                    image_workers=opts['workers'],
+                    dry_run=opts['dry_run'],
+                    progress=progress,
+                )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        for line, message in report['errors']:
+            self.stderr.write(f'fila {line}: {message}')
+        summary = (
+            f'{report["rows"]} filas en {time.perf_counter() - started:.1f}s: {report["inserted"]} nuevos, '
+            f'{report["updated"]} actualizados, {report["unchanged"]} sin cambios, {report["skipped"]} omitidos, '
+            f'{report["images"]} imágenes, {report["categories_created"]} categorías nuevas'
+        )
+        if opts['dry_run']:
+            summary += ' (simulación, no se guardó nada)'
+        self.stdout.write(self.style.SUCCESS(summary))
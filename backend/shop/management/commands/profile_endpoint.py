@@ -0,0 +1,83 @@
+import io
+import logging
+import pstats
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import slugify
+
+from shop.profiling import profile_endpoint
+
+
+class Command(BaseCommand):
+    help = (
+        'Perfila un endpoint con el cliente de pruebas contra la base actual: guarda profile.pstats '
+        '(cProfile) y stacks.collapsed (para flamegraph.pl o speedscope) y separa el tiempo de SQL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Ruta con query string, p. ej. /api/products/?search=leche')
+        parser.add_argument('--repeat', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=5, help='Pedidos previos sin perfilar')
+        parser.add_argument('--method', default='GET', choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+        parser.add_argument('--data', help='Cuerpo JSON; las escrituras se deshacen al final de cada pedido')
+        parser.add_argument('--user', help='Usuario con el que iniciar sesión')
+        parser.add_argument('--sampling-only', action='store_true',
+                            help='Solo el muestreador de pilas, sin el costo extra de cProfile')
+        parser.add_argument('--output', help='Directorio de salida (por defecto SERVER_TIMING_PROFILE_DIR/<ruta>-<fecha>)')
+        parser.add_argument('--top', type=int, default=25, help='Funciones a listar')
+
+    def handle(self, *args, **opts):
+        if opts['repeat'] <= 0:
+            raise CommandError('--repeat debe ser positivo')
+        user = None
+        if opts['user']:
+            try:
+                user = get_user_model().objects.get(username=opts['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No existe el usuario {opts["user"]}')
+        output = opts['output'] or (
+            Path(settings.SERVER_TIMING_PROFILE_DIR)
+            / f'{slugify(opts["path"])[:60]}-{datetime.now():%Y%m%d-%H%M%S}'
+        )
+
+        # One JSON line per request from ServerTimingMiddleware would bury the report
+        logging.getLogger('shop.perf').setLevel(logging.WARNING)
+        result = profile_endpoint(
+            opts['path'],
+            method=opts['method'].lower(),
+            data=opts['data'],
+            repeat=opts['repeat'],
+            warmup=opts['warmup'],
+            user=user,
+            use_cprofile=not opts['sampling_only'],
+            output=output,
+        )
+
+        self.stdout.write(f'{opts["method"]} {opts["path"]}  x{result["requests"]}  respuestas {result["statuses"]}')
+        self.stdout.write(
+            f'por pedido: total {result["wall_ms"]:.2f} ms  SQL {result["sql_ms"]:.2f} ms '
+            f'({result["queries"]:.1f} consultas)  Python {result["python_ms"]:.2f} ms'
+        )
+        if result['samples']:
+            self.stdout.write(
+                f'muestras: {result["samples"]}, {result["sql_samples"] / result["samples"]:.0%} en SQL'
+            )
+        if result['profiler'] is not None:
+            report = io.StringIO()
+            stats = pstats.Stats(result['profiler'], stream=report)
+            stats.sort_stats('cumulative').print_stats(opts['top'])
+            self.stdout.write(report.getvalue())
+        else:
+            self_time = Counter()
+            for stack, count in result['sampler'].counts.items():
+                self_time[stack.rsplit(';', 1)[-1]] += count
+            self.stdout.write('Funciones con más muestras propias:')
+            for frame, count in self_time.most_common(opts['top']):
+                self.stdout.write(f'  {count:6d}  {frame}')
+        for kind, path in result['files'].items():
+            self.stdout.write(self.style.SUCCESS(f'{kind}: {path}'))
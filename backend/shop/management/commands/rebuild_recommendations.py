@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from shop.recommendations import rebuild_cooccurrence
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la matriz de productos comprados juntos desde OrderItem y las recomendaciones por producto.'
+
+    def handle(self, *args, **opts):
+        written = rebuild_cooccurrence()
+        self.stdout.write(self.style.SUCCESS(f'{written} pares de productos; recomendaciones regeneradas'))
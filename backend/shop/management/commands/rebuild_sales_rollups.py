@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.rollups import rebuild_sales_rollups
+
+
+def _parse_day(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {value} (use YYYY-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las tablas de ventas diarias (producto, categoría, método de pago) desde OrderItem.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Primer día a recalcular (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Último día a recalcular (YYYY-MM-DD)')
+
+    def handle(self, *args, **opts):
+        written = rebuild_sales_rollups(_parse_day(opts['start']), _parse_day(opts['end']))
+        for name, count in written.items():
+            self.stdout.write(f'{name}: {count} filas')
+        self.stdout.write(self.style.SUCCESS('Rollups de ventas reconstruidos'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from shop.coupons import reconcile_coupon_counters
+from shop.models import Coupon
+
+
+class Command(BaseCommand):
+    help = 'Consolida los contadores repartidos en slots en Coupon.used_count y rebalancea la capacidad.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('codes', nargs='*', help='Códigos a reconciliar (por defecto, todos los sharded)')
+
+    def handle(self, *args, **opts):
+        coupons = Coupon.objects.filter(redemption_slots__isnull=False).distinct()
+        if opts['codes']:
+            coupons = Coupon.objects.filter(code_normalized__in=[c.lower() for c in opts['codes']])
+        done = 0
+        for coupon in coupons.iterator():
+            total = reconcile_coupon_counters(coupon)
+            self.stdout.write(f'{coupon.code}: {total} usos')
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f'{done} cupones reconciliados'))
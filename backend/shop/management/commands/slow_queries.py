@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.slow_queries import summarize_slow_queries
+
+
+class Command(BaseCommand):
+    help = 'Resume el registro de consultas lentas agrupando por huella (fingerprint), peores primero.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Archivo del registro (por defecto SLOW_QUERY_LOG_FILE)')
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--sort', choices=['total', 'max', 'count'], default='total',
+                            help='Ordenar por tiempo total, máximo o cantidad de ejecuciones')
+        parser.add_argument('--since', type=float, help='Solo las últimas N horas')
+        parser.add_argument('--plans', action='store_true', help='Mostrar el último plan de cada consulta')
+
+    def handle(self, *args, **opts):
+        since = time.time() - opts['since'] * 3600 if opts['since'] else None
+        summary = summarize_slow_queries(opts['file'], since=since, sort=opts['sort'])
+        if not summary:
+            self.stdout.write('No hay consultas lentas registradas')
+            return
+        for entry in summary[:opts['top']]:
+            self.stdout.write(self.style.WARNING(
+                f"{entry['fingerprint']}  {entry['count']}x  total {entry['total_ms']:.0f} ms  "
+                f"prom {entry['avg_ms']:.1f} ms  máx {entry['max_ms']:.1f} ms"
+            ))
+            self.stdout.write(f"  vista: {entry['view'] or '-'}  origen: {entry['origin'] or '-'}")
+            self.stdout.write(f"  {entry['sql'][:300]}")
+            if opts['plans'] and entry['plan']:
+                for line in entry['plan'].splitlines():
+                    self.stdout.write(f'    {line}')
+        self.stdout.write(f'{len(summary)} consultas distintas')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from shop.popularity import update_popularity
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la popularidad (ventas recientes con decaimiento) de los productos. Ejecutar periódicamente.'
+
+    def handle(self, *args, **opts):
+        updated = update_popularity()
+        self.stdout.write(self.style.SUCCESS(f'Popularidad actualizada en {updated} productos'))
@@ -0,0 +1,61 @@
+import os
+
+from django.db import transaction
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+
+# Prometheus metrics. Under gunicorn every worker is a separate process, so with
+# PROMETHEUS_MULTIPROC_DIR set (entrypoint.sh does it) prometheus_client keeps
+# the values in mmap'd files in that directory and /metrics sums all workers;
+# without it (runserver, tests) they live in the process registry.
+# Request metrics are fed by ServerTimingMiddleware, business counters by the
+# code that commits the change, after commit so rolled-back orders don't count.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    'shop_http_request_duration_seconds', 'Request latency by route', ['route', 'method'], buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter('shop_http_requests', 'Requests by route and status', ['route', 'method', 'status'])
+DB_QUERIES = Counter('shop_db_queries', 'SQL queries run while serving requests', ['route'])
+DB_TIME = Counter('shop_db_query_seconds', 'Time spent in SQL while serving requests', ['route'])
+CACHE_REQUESTS = Counter('shop_cache_requests', 'Cache lookups while serving requests', ['result'])
+THROTTLED = Counter('shop_throttle_rejections', 'Requests rejected by the rate limiter', ['scope'])
+ORDERS_CREATED = Counter('shop_orders_created', 'Orders committed')
+STOCKOUTS = Counter('shop_stockouts', 'Products whose stock reached zero with an order')
+COUPON_REDEMPTIONS = Counter('shop_coupon_redemptions', 'Coupons applied to committed orders')
+
+
+def observe_request(route, method, status, duration, metrics):
+    REQUEST_LATENCY.labels(route, method).observe(duration)
+    REQUESTS.labels(route, method, str(status)).inc()
+    if metrics.sql_count:
+        DB_QUERIES.labels(route).inc(metrics.sql_count)
+        DB_TIME.labels(route).inc(metrics.sql_time)
+    if metrics.cache_hits:
+        CACHE_REQUESTS.labels('hit').inc(metrics.cache_hits)
+    if metrics.cache_misses:
+        CACHE_REQUESTS.labels('miss').inc(metrics.cache_misses)
+
+
+def record_order_created(stockouts=0, coupon_redeemed=False):
+    """Count an order once its transaction commits."""
+
+    def _inc():
+        ORDERS_CREATED.inc()
+        if stockouts:
+            STOCKOUTS.inc(stockouts)
+        if coupon_redeemed:
+            COUPON_REDEMPTIONS.inc()
+
+    transaction.on_commit(_inc, robust=True)
+
+
+def render_metrics():
+    """Return ``(body, content_type)`` in the Prometheus text exposition format."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
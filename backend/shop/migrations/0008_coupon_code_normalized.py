@@ -0,0 +1,48 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def populate_code_normalized(apps, schema_editor):
+    Coupon = apps.get_model("shop", "Coupon")
+    coupons = list(Coupon.objects.only("id", "code").order_by("id"))
+    by_code = defaultdict(list)
+    for coupon in coupons:
+        coupon.code_normalized = (coupon.code or "").strip()[:40].lower()
+        by_code[coupon.code_normalized].append(coupon.code)
+    # Codes that only differ in case/whitespace cannot share the unique column.
+    # Merging them would reassign usage counts and limits, so leave that to the
+    # operator instead of guessing which coupon survives.
+    clashes = {code: codes for code, codes in by_code.items() if len(codes) > 1}
+    if clashes:
+        listing = "; ".join(
+            f"{code!r}: {', '.join(repr(c) for c in codes)}" for code, codes in sorted(clashes.items())
+        )
+        raise RuntimeError(
+            "Hay cupones cuyos códigos solo difieren en mayúsculas o espacios y no pueden "
+            f"convivir con el código normalizado único: {listing}. Renombrar o eliminar los "
+            "duplicados (por ejemplo desde el admin) y volver a correr migrate."
+        )
+    Coupon.objects.bulk_update(coupons, ["code_normalized"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0007_coupon_expires_at_coupon_usage_limit_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coupon",
+            name="code_normalized",
+            field=models.CharField(default="", editable=False, max_length=40),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_code_normalized, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="coupon",
+            name="code_normalized",
+            field=models.CharField(editable=False, max_length=40, unique=True),
+        ),
+    ]
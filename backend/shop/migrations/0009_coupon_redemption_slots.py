@@ -0,0 +1,50 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0008_coupon_code_normalized"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coupon",
+            name="counter_shards",
+            field=models.PositiveSmallIntegerField(
+                default=0,
+                help_text="0 = contador simple. Para cupones masivos con límite de uso, p. ej. 16.",
+            ),
+        ),
+        migrations.CreateModel(
+            name="CouponRedemptionSlot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("slot", models.PositiveSmallIntegerField()),
+                ("used_count", models.PositiveIntegerField(default=0)),
+                ("capacity", models.PositiveIntegerField(blank=True, null=True)),
+                (
+                    "coupon",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="redemption_slots",
+                        to="shop.coupon",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="couponredemptionslot",
+            constraint=models.UniqueConstraint(
+                fields=("coupon", "slot"), name="unique_coupon_redemption_slot"
+            ),
+        ),
+    ]
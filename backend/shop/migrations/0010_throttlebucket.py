@@ -0,0 +1,20 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0009_coupon_redemption_slots"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ThrottleBucket",
+            fields=[
+                ("key", models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ("tat", models.FloatField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0010_throttlebucket"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyCategorySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("quantity", models.PositiveBigIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DailyPaymentSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "payment_method",
+                    models.CharField(
+                        choices=[("cash", "Efectivo"), ("transfer", "Transferencia")],
+                        max_length=20,
+                    ),
+                ),
+                ("quantity", models.PositiveBigIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DailyProductSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("quantity", models.PositiveBigIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales",
+                        to="shop.product",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="dailypaymentsales",
+            constraint=models.UniqueConstraint(
+                fields=("day", "payment_method"), name="unique_daily_payment_sales"
+            ),
+        ),
+        migrations.AddField(
+            model_name="dailycategorysales",
+            name="category",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="daily_sales",
+                to="shop.category",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailyproductsales",
+            constraint=models.UniqueConstraint(
+                fields=("day", "product"), name="unique_daily_product_sales"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailycategorysales",
+            constraint=models.UniqueConstraint(
+                fields=("day", "category"), name="unique_daily_category_sales"
+            ),
+        ),
+    ]
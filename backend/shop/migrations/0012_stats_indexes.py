@@ -0,0 +1,23 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0011_daily_sales_rollups"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["created_at"], name="order_created_at_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="orderitem",
+            index=models.Index(
+                fields=["order", "product"], name="orderitem_order_product_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0012_stats_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductRecommendation",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="recommendation",
+                        serialize=False,
+                        to="shop.product",
+                    ),
+                ),
+                ("related_ids", models.JSONField(default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProductCooccurrence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "other",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="shop.product",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cooccurrences",
+                        to="shop.product",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["product", "-count"], name="cooccurrence_top_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="productcooccurrence",
+            constraint=models.UniqueConstraint(
+                fields=("product", "other"), name="unique_product_cooccurrence"
+            ),
+        ),
+    ]
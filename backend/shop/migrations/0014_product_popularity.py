@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0013_product_recommendations"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="popularity",
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+    ]
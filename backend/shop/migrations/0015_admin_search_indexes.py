@@ -0,0 +1,39 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Trigram indexes behind the admin changelist searches (icontains on order name
+# and phone, product name). PostgreSQL only; built CONCURRENTLY so a table with
+# millions of orders keeps taking writes while they build.
+TRIGRAM_INDEXES = [
+    ("order_name_trgm_idx", "shop_order", "UPPER(name) gin_trgm_ops"),
+    ("order_phone_trgm_idx", "shop_order", "phone gin_trgm_ops"),
+    ("product_name_trgm_idx", "shop_product", "UPPER(name) gin_trgm_ops"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, table, expression in TRIGRAM_INDEXES:
+        schema_editor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin ({expression})")
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("shop", "0014_product_popularity"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
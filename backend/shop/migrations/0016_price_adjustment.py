@@ -0,0 +1,57 @@
+# Generated by Django 4.2.10 on 2026-10-19 06:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("shop", "0015_admin_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PriceAdjustment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("percent", "Porcentaje"), ("amount", "Monto fijo")],
+                        max_length=10,
+                    ),
+                ),
+                ("value", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("rounding", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("fields", models.CharField(max_length=40)),
+                ("scope", models.CharField(max_length=240)),
+                ("product_count", models.PositiveIntegerField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ajuste de precios",
+                "verbose_name_plural": "Ajustes de precios",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
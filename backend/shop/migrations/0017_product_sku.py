@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0016_price_adjustment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="sku",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
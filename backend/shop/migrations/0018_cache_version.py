@@ -0,0 +1,20 @@
+# Generated by Django 4.2.10 on 2026-10-19 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0017_product_sku"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CacheVersion",
+            fields=[
+                ("name", models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ("version", models.BigIntegerField()),
+            ],
+        ),
+    ]
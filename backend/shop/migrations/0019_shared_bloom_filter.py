@@ -0,0 +1,23 @@
+# Generated by Django 4.2.10 on 2026-10-19 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0018_cache_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SharedBloomFilter",
+            fields=[
+                ("name", models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ("version", models.BigIntegerField()),
+                ("size_bits", models.PositiveBigIntegerField()),
+                ("num_hashes", models.PositiveSmallIntegerField()),
+                ("bits", models.BinaryField()),
+            ],
+        ),
+    ]
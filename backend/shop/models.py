@@ -1,6 +1,8 @@
 import logging
 
+from django.conf import settings
 from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
@@ -12,6 +14,13 @@ logger = logging.getLogger(__name__)
 SITE_CONFIG_CACHE_KEY = 'site_config'
 SITE_CONFIG_CACHE_TIMEOUT = 60 * 5
 
+COUPON_CODE_MAX_LENGTH = 40
+
+
+def normalize_coupon_code(code):
+    """Canonical form used to store and look up coupon codes."""
+    return (code or '').strip()[:COUPON_CODE_MAX_LENGTH].lower()
+
 
 class Category(models.Model):
     name = models.CharField(max_length=120)
@@ -35,6 +44,8 @@ class Category(models.Model):
 
 class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
+    # Supplier code, the key catalog imports match on; optional for hand-made products
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -52,6 +63,8 @@ class Product(models.Model):
     promoted = models.BooleanField(default=False, db_index=True)
     promoted_until = models.DateTimeField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Time-decayed units sold, scaled to 0..1 against the best seller; see shop.popularity
+    popularity = models.FloatField(default=0, db_index=True, editable=False)
 
     class Meta:
         ordering = ['name']
@@ -115,6 +128,9 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='order_created_at_idx'),
+        ]
 
     def __str__(self):
         return f'Pedido #{self.id} - {self.name}'
@@ -126,10 +142,57 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'product'], name='orderitem_order_product_idx'),
+        ]
+
     def __str__(self):
         return f'{self.product.name} x{self.quantity}'
 
 
+class DailyProductSales(models.Model):
+    """Units and revenue per product and local day, maintained by shop.rollups."""
+
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.PositiveBigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_daily_product_sales'),
+        ]
+
+
+class DailyCategorySales(models.Model):
+    """Units and revenue per category and local day, maintained by shop.rollups."""
+
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.PositiveBigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='unique_daily_category_sales'),
+        ]
+
+
+class DailyPaymentSales(models.Model):
+    """Units and revenue per payment method and local day, maintained by shop.rollups."""
+
+    day = models.DateField()
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_METHODS)
+    quantity = models.PositiveBigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'payment_method'], name='unique_daily_payment_sales'),
+        ]
+
+
 class Coupon(models.Model):
     TYPE_FIXED = 'fixed'
     TYPE_PERCENT = 'percent'
@@ -140,7 +203,9 @@ class Coupon(models.Model):
         (TYPE_FREE_SHIPPING, 'Envío gratis'),
     )
 
-    code = models.CharField(max_length=40, unique=True)
+    code = models.CharField(max_length=COUPON_CODE_MAX_LENGTH, unique=True)
+    # Lowercase copy of ``code`` so lookups hit the unique index instead of UPPER()/LIKE
+    code_normalized = models.CharField(max_length=COUPON_CODE_MAX_LENGTH, unique=True, editable=False)
     type = models.CharField(max_length=20, choices=TYPES)
     amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # para fijo
     percent = models.DecimalField(max_digits=5, decimal_places=2, default=0)  # para %
@@ -150,16 +215,141 @@ class Coupon(models.Model):
     expires_at = models.DateTimeField(null=True, blank=True)
     usage_limit = models.PositiveIntegerField(null=True, blank=True)
     used_count = models.PositiveIntegerField(default=0)
+    # >0 reparte los canjes en N filas de CouponRedemptionSlot para evitar una fila caliente;
+    # used_count pasa a actualizarse al reconciliar
+    counter_shards = models.PositiveSmallIntegerField(
+        default=0, help_text='0 = contador simple. Para cupones masivos con límite de uso, p. ej. 16.'
+    )
 
     def __str__(self):
         return self.code
 
+    def validate_unique(self, exclude=None):
+        super().validate_unique(exclude)
+        # code_normalized is not editable, so model forms never check its unique index
+        if exclude and 'code' in exclude:
+            return
+        clash = Coupon.objects.filter(code_normalized=normalize_coupon_code(self.code)).exclude(pk=self.pk)
+        if clash.exists():
+            raise ValidationError({'code': 'Ya existe un cupón con este código (sin distinguir mayúsculas).'})
+
+
+class CouponRedemptionSlot(models.Model):
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='redemption_slots')
+    slot = models.PositiveSmallIntegerField()
+    used_count = models.PositiveIntegerField(default=0)
+    # Parte del usage_limit asignada a este slot (null = sin límite)
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['coupon', 'slot'], name='unique_coupon_redemption_slot'),
+        ]
+
+    def __str__(self):
+        return f'{self.coupon_id}#{self.slot}'
+
+
+class ThrottleBucket(models.Model):
+    """GCRA state per throttle key, shared by every worker (see shop.throttling)."""
+
+    key = models.CharField(max_length=100, primary_key=True)
+    # Theoretical arrival time (epoch seconds) of the next request that conforms to the rate
+    tat = models.FloatField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class CacheVersion(models.Model):
+    """Version stamp of a family of cached entries, shared by every worker (see shop.cache_versions)."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f'{self.name}@{self.version}'
+
+
+class SharedBloomFilter(models.Model):
+    """Serialized Bloom filter built for one cache version, loaded by every worker (see shop.coupons)."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField()
+    size_bits = models.PositiveBigIntegerField()
+    num_hashes = models.PositiveSmallIntegerField()
+    bits = models.BinaryField()
+
+    def __str__(self):
+        return f'{self.name} ({self.size_bits} bits)'
+
+
+
+class ProductCooccurrence(models.Model):
+    """Orders containing both products; one row per direction, maintained by shop.recommendations."""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cooccurrences')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='unique_product_cooccurrence'),
+        ]
+        indexes = [
+            models.Index(fields=['product', '-count'], name='cooccurrence_top_idx'),
+        ]
+
+
+class ProductRecommendation(models.Model):
+    """Materialized top-K "frequently bought together" products, best first."""
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='recommendation')
+    related_ids = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Recomendaciones de {self.product_id}'
+
+
+class PriceAdjustment(models.Model):
+    """Audit row for one bulk price change (see shop.catalog.adjust_prices)."""
+
+    KINDS = (
+        ('percent', 'Porcentaje'),
+        ('amount', 'Monto fijo'),
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    kind = models.CharField(max_length=10, choices=KINDS)
+    value = models.DecimalField(max_digits=10, decimal_places=2)
+    rounding = models.DecimalField(max_digits=10, decimal_places=2)
+    fields = models.CharField(max_length=40)
+    scope = models.CharField(max_length=240)
+    product_count = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Ajuste de precios'
+        verbose_name_plural = 'Ajustes de precios'
+
+    def __str__(self):
+        sign = '+' if self.value > 0 else ''
+        unit = '%' if self.kind == 'percent' else ''
+        return f'{sign}{self.value}{unit} en {self.product_count} productos ({self.scope})'
+
 
 @receiver([post_save, post_delete], sender=SiteConfig)
 def clear_site_config_cache(**kwargs):
     cache.delete(SITE_CONFIG_CACHE_KEY)
 
 
+@receiver(pre_save, sender=Coupon)
+def set_coupon_code_normalized(sender, instance, **kwargs):
+    instance.code_normalized = normalize_coupon_code(instance.code)
+
+
 @receiver(post_delete, sender=Category)
 def delete_category_image_on_delete(sender, instance, **kwargs):
     """Ensure images are removed from storage when a category is deleted."""
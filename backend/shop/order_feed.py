@@ -0,0 +1,175 @@
+import asyncio
+import json
+import logging
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Order
+
+# Live feed of new orders for staff, streamed as Server-Sent Events. Each process
+# runs a single OrderFeed task however many clients are connected: on PostgreSQL
+# it LISTENs for the NOTIFY sent inside the order transaction (delivered on
+# commit), elsewhere it polls Order.id above a high-water mark. Clients get an
+# asyncio.Queue each, so a connection costs no thread or database connection.
+
+ORDER_FEED_CHANNEL = 'shop_new_orders'
+ORDER_FEED_POLL_SECONDS = 2
+# Ids are assigned before commit, so a slow transaction can commit below the
+# high-water mark; the poll re-reads this many ids back and skips those seen
+ORDER_FEED_POLL_LOOKBACK = 50
+ORDER_FEED_BACKLOG = 50
+ORDER_FEED_QUEUE_SIZE = 100
+ORDER_FEED_RETRY_SECONDS = 5
+ORDER_FEED_HEARTBEAT_SECONDS = 15
+# Streams end after this long and the browser reconnects with Last-Event-ID;
+# this bounds generators left behind by clients that vanished without a disconnect
+ORDER_FEED_MAX_SECONDS = 300
+
+logger = logging.getLogger(__name__)
+
+
+def order_summary(order, items):
+    return {
+        'id': order.id,
+        'name': order.name,
+        'total': str(order.total),
+        'payment_method': order.payment_method,
+        'delivery_method': order.delivery_method,
+        'items': items,
+        'created_at': timezone.localtime(order.created_at).isoformat(),
+    }
+
+
+def notify_new_order(order, items):
+    """Queue a NOTIFY for the feed; PostgreSQL delivers it only if the transaction commits."""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_notify(%s, %s)',
+            [ORDER_FEED_CHANNEL, json.dumps(order_summary(order, items), separators=(',', ':'))],
+        )
+
+
+def _summaries(limit=ORDER_FEED_BACKLOG, **filters):
+    orders = (
+        Order.objects.filter(**filters)
+        .annotate(item_count=Count('items'))
+        .order_by('id')
+    )
+    return [order_summary(o, o.item_count) for o in orders[:limit]]
+
+
+async def recent_orders(after_id):
+    """Orders above ``after_id`` (e.g. the Last-Event-ID of a reconnecting client)."""
+    return await sync_to_async(_summaries)(id__gt=after_id)
+
+
+class OrderFeed:
+    def __init__(self):
+        self.subscribers = set()
+        self.task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=ORDER_FEED_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.task = loop.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def publish(self, summary):
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(summary)
+            except asyncio.QueueFull:
+                # A client that stopped reading loses events instead of stalling the feed
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                if connections['default'].vendor == 'postgresql':
+                    await self._listen()
+                else:
+                    await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Order feed failed, restarting')
+            await asyncio.sleep(ORDER_FEED_RETRY_SECONDS)
+
+    async def _listen(self):
+        import psycopg
+
+        # Django's params carry a sync cursor factory and adapters; LISTEN needs neither
+        params = {
+            key: value
+            for key, value in connections['default'].get_connection_params().items()
+            if key not in ('cursor_factory', 'context')
+        }
+        async with await psycopg.AsyncConnection.connect(**params, autocommit=True) as conn:
+            await conn.execute(f'LISTEN {ORDER_FEED_CHANNEL}')
+            async for notify in conn.notifies():
+                self.publish(json.loads(notify.payload))
+
+    async def _poll(self):
+        latest = await Order.objects.order_by('-id').values_list('id', flat=True).afirst() or 0
+        seen = deque(maxlen=ORDER_FEED_POLL_LOOKBACK + ORDER_FEED_BACKLOG)
+        async for pk in Order.objects.filter(id__gt=latest - ORDER_FEED_POLL_LOOKBACK).values_list('id', flat=True):
+            seen.append(pk)
+        while True:
+            await asyncio.sleep(ORDER_FEED_POLL_SECONDS)
+            rows = await sync_to_async(_summaries)(
+                limit=ORDER_FEED_POLL_LOOKBACK + ORDER_FEED_BACKLOG, id__gt=latest - ORDER_FEED_POLL_LOOKBACK
+            )
+            for summary in rows:
+                if summary['id'] in seen:
+                    continue
+                seen.append(summary['id'])
+                latest = max(latest, summary['id'])
+                self.publish(summary)
+
+
+order_feed = OrderFeed()
+
+
+def _event(summary):
+    return f"id: {summary['id']}\nevent: order\ndata: {json.dumps(summary, separators=(',', ':'))}\n\n"
+
+
+async def order_feed_events(after_id=None):
+    """SSE stream: orders above ``after_id`` first, then new ones as they arrive."""
+    queue = order_feed.subscribe()
+    loop = asyncio.get_running_loop()
+    try:
+        yield f'retry: {ORDER_FEED_RETRY_SECONDS * 1000}\n\n'
+        last_sent = 0
+        if after_id is not None:
+            for summary in await recent_orders(after_id):
+                last_sent = summary['id']
+                yield _event(summary)
+        deadline = loop.time() + ORDER_FEED_MAX_SECONDS
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                summary = await asyncio.wait_for(
+                    queue.get(), timeout=min(ORDER_FEED_HEARTBEAT_SECONDS, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if summary['id'] > last_sent:
+                last_sent = summary['id']
+                yield _event(summary)
+    finally:
+        order_feed.unsubscribe(queue)
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import DailyProductSales, Product
+
+# Best-seller ranking. Product.popularity holds units sold with each day weighted
+# by POPULARITY_DECAY ** age, divided by the top score so it stays in 0..1 and
+# can be blended into search relevance. update_popularity() rewrites it in one
+# UPDATE from the daily product rollups; run it periodically (e.g. hourly).
+
+POPULARITY_HALF_LIFE_DAYS = 14
+# Beyond ~6 half-lives a day weighs under 2% of today
+POPULARITY_WINDOW_DAYS = 90
+POPULARITY_DECAY = 0.5 ** (1 / POPULARITY_HALF_LIFE_DAYS)
+# Share of search relevance given to popularity (trigram similarity is 0..2)
+SEARCH_POPULARITY_WEIGHT = 0.3
+
+
+def _decayed_units(today):
+    weight = Case(
+        *[
+            When(day=today - timedelta(days=age), then=Value(POPULARITY_DECAY ** age))
+            for age in range(POPULARITY_WINDOW_DAYS)
+        ],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return Sum(F('quantity') * weight, output_field=FloatField())
+
+
+def update_popularity(today=None):
+    """Recompute Product.popularity from the last POPULARITY_WINDOW_DAYS of rollups.
+
+    Only products that sold in the window or still have a score are written.
+    Returns the number of products updated.
+    """
+    today = today or timezone.localdate()
+    recent = DailyProductSales.objects.filter(
+        day__gt=today - timedelta(days=POPULARITY_WINDOW_DAYS), day__lte=today
+    )
+    scores = recent.values('product_id').annotate(score=_decayed_units(today)).order_by()
+    top = scores.order_by('-score').values_list('score', flat=True).first()
+    if not top:
+        return Product.objects.filter(popularity__gt=0).update(popularity=0)
+
+    score = Subquery(scores.filter(product_id=OuterRef('pk')).values('score')[:1])
+    return Product.objects.filter(
+        Q(popularity__gt=0) | Q(id__in=recent.values('product_id'))
+    ).update(popularity=Coalesce(score, Value(0.0)) / top)
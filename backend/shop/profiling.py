@@ -0,0 +1,167 @@
+import cProfile
+import json
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client
+
+# Endpoint profiling for profile_endpoint. Requests go through the Django test
+# client (full middleware and DRF stack) against the configured database.
+# cProfile gives exact call counts and a .pstats file; a stack sampler thread
+# (stdlib, sys._current_frames) gives collapsed stacks for flame graphs with
+# SQL marked as a [SQL] leaf. An execute wrapper adds up query count and time
+# so the SQL share is reported apart from Python time.
+
+PROFILE_SAMPLE_INTERVAL = 0.001
+SQL_FRAME = '[SQL]'
+# Stacks are cut below this frame so flame graphs start at the request
+_ROOT_FUNCTION = 'profiled_request'
+
+
+def _short_path(filename):
+    if '/site-packages/' in filename:
+        return filename.split('/site-packages/', 1)[1]
+    for base in (f'{settings.BASE_DIR}/', f'{sysconfig.get_paths()["stdlib"]}/'):
+        if filename.startswith(base):
+            return filename[len(base):]
+    return filename
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's stack every ``interval`` seconds into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self.in_sql = 0
+        self.active = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            if not self.active:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code.co_name != _ROOT_FUNCTION:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if frame is None:
+                continue
+            stack.reverse()
+            if self.in_sql:
+                stack.append(SQL_FRAME)
+            self.counts[';'.join(stack)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as fh:
+            for stack, count in self.counts.most_common():
+                fh.write(f'{stack} {count}\n')
+
+
+class SqlTimer:
+    """Execute wrapper adding up queries and their time, and flagging SQL to the sampler."""
+
+    def __init__(self, sampler):
+        self.count = 0
+        self.time = 0.0
+        self.sampler = sampler
+
+    def __call__(self, execute, sql, params, many, context):
+        self.sampler.in_sql += 1
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - started
+            self.count += 1
+            self.sampler.in_sql -= 1
+
+
+def profiled_request(client, method, path, data, rollback):
+    kwargs = {}
+    if data is not None:
+        kwargs = {'data': data, 'content_type': 'application/json'}
+    if not rollback:
+        return getattr(client, method)(path, **kwargs)
+    # Writes are undone so the profile can be repeated against a real database
+    with transaction.atomic():
+        response = getattr(client, method)(path, **kwargs)
+        transaction.set_rollback(True)
+    return response
+
+
+def profile_endpoint(path, method='get', data=None, repeat=100, warmup=5, user=None, use_cprofile=True,
+                     output=None, interval=PROFILE_SAMPLE_INTERVAL):
+    """Profile ``repeat`` requests to ``path``; writes profile.pstats and stacks.collapsed to ``output``.
+
+    Returns a summary dict with wall, SQL and Python time per request.
+    """
+    client = Client(SERVER_NAME=_allowed_host())
+    if user is not None:
+        client.force_login(user)
+    if data is not None and not isinstance(data, str):
+        data = json.dumps(data)
+    rollback = method not in ('get', 'head', 'options')
+
+    for _ in range(warmup):
+        profiled_request(client, method, path, data, rollback)
+
+    statuses = Counter()
+    sampler = StackSampler(threading.get_ident(), interval)
+    timer = SqlTimer(sampler)
+    profiler = cProfile.Profile() if use_cprofile else None
+    sampler.start()
+    started = time.perf_counter()
+    with connection.execute_wrapper(timer):
+        sampler.active = True
+        if profiler is not None:
+            profiler.enable()
+        try:
+            for _ in range(repeat):
+                statuses[profiled_request(client, method, path, data, rollback).status_code] += 1
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            sampler.active = False
+    wall = time.perf_counter() - started
+    sampler.stop()
+
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    files = {'collapsed': output / 'stacks.collapsed'}
+    sampler.write_collapsed(files['collapsed'])
+    if profiler is not None:
+        files['pstats'] = output / 'profile.pstats'
+        profiler.dump_stats(files['pstats'])
+    return {
+        'requests': repeat,
+        'statuses': dict(statuses),
+        'wall_ms': wall * 1000 / repeat,
+        'sql_ms': timer.time * 1000 / repeat,
+        'python_ms': (wall - timer.time) * 1000 / repeat,
+        'queries': timer.count / repeat,
+        'samples': sum(sampler.counts.values()),
+        'sql_samples': sum(n for stack, n in sampler.counts.items() if stack.endswith(SQL_FRAME)),
+        'files': files,
+        'profiler': profiler,
+        'sampler': sampler,
+    }
+
+
+def _allowed_host():
+    hosts = [h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')]
+    return hosts[0] if hosts else 'testserver'
@@ -0,0 +1,111 @@
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .catalog import catalog_cache_version
+from .models import OrderItem, Product, ProductCooccurrence, ProductRecommendation
+
+# "Frequently bought together". ProductCooccurrence is a sparse product x product
+# matrix counting the orders that contained both products. Each new order bumps
+# the pairs of its basket after commit and re-materializes the top-K list of the
+# products involved into ProductRecommendation, so /related/ never aggregates.
+
+RELATED_TOP_K = 8
+# Pairs grow quadratically with the basket; larger orders (stock-ups, wholesale)
+# say little about what goes together and are left out of the counts
+COOCCURRENCE_MAX_BASKET = 40
+RELATED_CACHE_TIMEOUT = 60 * 5
+REBUILD_BATCH_SIZE = 1000
+
+
+def related_cache_key(product_id):
+    # Versioned by the catalog so price changes drop every cached list at once
+    return f'product_related:{catalog_cache_version()}:{product_id}'
+
+
+def materialize_recommendations(product_ids=None):
+    """Rewrite the top-K list of ``product_ids`` (all products when None) from the counts."""
+    ranked = ProductCooccurrence.objects.annotate(
+        rank=Window(RowNumber(), partition_by=F('product_id'), order_by=[F('count').desc(), F('other_id')])
+    ).filter(rank__lte=RELATED_TOP_K)
+    if product_ids is not None:
+        ranked = ranked.filter(product_id__in=product_ids)
+    related = {pk: [] for pk in product_ids or ()}
+    for product_id, other_id in ranked.order_by('product_id', 'rank').values_list('product_id', 'other_id'):
+        related.setdefault(product_id, []).append(other_id)
+
+    ProductRecommendation.objects.bulk_create(
+        [ProductRecommendation(product_id=pk, related_ids=ids) for pk, ids in related.items()],
+        batch_size=REBUILD_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['related_ids', 'updated_at'],
+    )
+    keys = [related_cache_key(pk) for pk in related]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+    return len(related)
+
+
+def record_order_cooccurrence(product_ids):
+    """Count every pair of a committed order's products and refresh their top-K lists.
+
+    Runs after commit so the pair rows, shared by many checkouts, are not locked
+    for the length of the order transaction.
+    """
+    basket = sorted(set(product_ids))
+    if not 2 <= len(basket) <= COOCCURRENCE_MAX_BASKET:
+        return
+    with transaction.atomic():
+        ProductCooccurrence.objects.bulk_create(
+            [ProductCooccurrence(product_id=a, other_id=b) for a in basket for b in basket if a != b],
+            ignore_conflicts=True,
+        )
+        pairs = ProductCooccurrence.objects.filter(product_id__in=basket, other_id__in=basket).exclude(
+            product_id=F('other_id')
+        )
+        # Lock in a fixed order so overlapping baskets queue instead of deadlocking
+        list(pairs.select_for_update().order_by('product_id', 'other_id').values_list('id', flat=True))
+        pairs.update(count=F('count') + 1)
+        materialize_recommendations(basket)
+
+
+def rebuild_cooccurrence():
+    """Recompute the whole matrix from OrderItem with one self-join, then every top-K list."""
+    qn = connection.ops.quote_name
+    table = qn(OrderItem._meta.db_table)
+    sql = f"""
+        SELECT a.product_id, b.product_id, COUNT(DISTINCT a.order_id)
+        FROM {table} a
+        JOIN {table} b ON b.order_id = a.order_id AND b.product_id <> a.product_id
+        WHERE a.order_id IN (
+            SELECT order_id FROM {table} GROUP BY order_id HAVING COUNT(DISTINCT product_id) <= %s
+        )
+        GROUP BY a.product_id, b.product_id
+    """
+    written = 0
+    with transaction.atomic():
+        ProductCooccurrence.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [COOCCURRENCE_MAX_BASKET])
+            rows = (
+                ProductCooccurrence(product_id=a, other_id=b, count=n) for a, b, n in cursor
+            )
+            while batch := list(islice(rows, REBUILD_BATCH_SIZE)):
+                ProductCooccurrence.objects.bulk_create(batch)
+                written += len(batch)
+        ProductRecommendation.objects.all().delete()
+        materialize_recommendations()
+    return written
+
+
+def related_products(product_id):
+    """Active recommended products for ``product_id``, best first, from the materialized list."""
+    rec = ProductRecommendation.objects.filter(product_id=product_id).values_list('related_ids', flat=True).first()
+    if not rec:
+        return []
+    products = Product.objects.filter(id__in=rec, is_active=True).select_related('category').in_bulk()
+    return [products[pk] for pk in rec if pk in products]
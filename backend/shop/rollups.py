@@ -0,0 +1,161 @@
+from collections import defaultdict
+from decimal import Decimal
+from itertools import islice
+
+from django.db import models, transaction
+from django.db.models import Case, F, Max, Min, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .analytics import invalidate_sales_stats_cache, month_segments, scan_order_items
+from .models import DailyCategorySales, DailyPaymentSales, DailyProductSales, Order
+
+# Daily sales rollups, one row per (local day, key). They are incremented inside
+# the order transaction, decremented when an order is deleted, and can be rebuilt
+# from OrderItem at any time, so admin edits of order items or raw inserts that
+# bypass OrderSerializer only need a backfill.
+
+REBUILD_BATCH_SIZE = 1000
+
+_QUANTITY_OUTPUT = models.PositiveBigIntegerField()
+_REVENUE_OUTPUT = models.DecimalField(max_digits=14, decimal_places=2)
+
+
+def _per_key(key_field, totals, index, default, output_field):
+    return Case(
+        *[When(**{key_field: k}, then=Value(totals[k][index])) for k in sorted(totals)],
+        default=Value(default),
+        output_field=output_field,
+    )
+
+
+def _increment(model, key_field, day, totals):
+    """Add ``{key: (quantity, revenue)}`` to the rows of ``day`` with two statements."""
+    if not totals:
+        return
+    keys = sorted(totals)
+    model.objects.bulk_create(
+        [model(day=day, **{key_field: key}) for key in keys], ignore_conflicts=True
+    )
+    model.objects.filter(day=day, **{f'{key_field}__in': keys}).update(
+        quantity=F('quantity') + _per_key(key_field, totals, 0, 0, _QUANTITY_OUTPUT),
+        revenue=F('revenue') + _per_key(key_field, totals, 1, Decimal('0'), _REVENUE_OUTPUT),
+    )
+
+
+def _decrement(model, key_field, day, totals):
+    """Subtract ``{key: (quantity, revenue)}`` from the rows of ``day``, dropping rows left without sales."""
+    if not totals:
+        return
+    rows = model.objects.filter(day=day, **{f'{key_field}__in': sorted(totals)})
+    # Floored at zero: rows missed by a backfill must not violate the unsigned quantity
+    rows.update(
+        quantity=Greatest(
+            F('quantity') - _per_key(key_field, totals, 0, 0, _QUANTITY_OUTPUT), Value(0), output_field=_QUANTITY_OUTPUT
+        ),
+        revenue=Greatest(
+            F('revenue') - _per_key(key_field, totals, 1, Decimal('0'), _REVENUE_OUTPUT), Value(Decimal('0')),
+            output_field=_REVENUE_OUTPUT,
+        ),
+    )
+    # A rebuild writes no row for a key without sales
+    rows.filter(quantity=0).delete()
+
+
+def _order_totals(order, order_items):
+    """``(day, {rollup model: {key: [quantity, revenue]}})`` for one order."""
+    by_product = defaultdict(lambda: [0, Decimal('0')])
+    by_category = defaultdict(lambda: [0, Decimal('0')])
+    quantity, revenue = 0, Decimal('0')
+    for item in order_items:
+        line = item.price * item.quantity
+        for bucket in (by_product[item.product_id], by_category[item.product.category_id]):
+            bucket[0] += item.quantity
+            bucket[1] += line
+        quantity += item.quantity
+        revenue += line
+    by_payment = {order.payment_method: (quantity, revenue)} if quantity else {}
+    return timezone.localdate(order.created_at), {
+        DailyProductSales: by_product,
+        DailyCategorySales: by_category,
+        DailyPaymentSales: by_payment,
+    }
+
+
+def record_order_sales(order, order_items):
+    """Add a new order to the daily rollups; call inside the order transaction.
+
+    Meant to run as the last step before commit so the per-day rows, which every
+    checkout of the day touches, stay locked as briefly as possible.
+    """
+    day, totals = _order_totals(order, order_items)
+    _increment(DailyProductSales, 'product_id', day, totals[DailyProductSales])
+    _increment(DailyCategorySales, 'category_id', day, totals[DailyCategorySales])
+    _increment(DailyPaymentSales, 'payment_method', day, totals[DailyPaymentSales])
+    if day < timezone.localdate():
+        # Committed after midnight: the day may already be cached as closed
+        invalidate_sales_stats_cache()
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_sales(sender, instance, **kwargs):
+    """Subtract an order from the daily rollups before it and its items are deleted.
+
+    Runs inside the deletion's transaction, so the rollups only change if the
+    order really goes away.
+    """
+    day, totals = _order_totals(instance, instance.items.select_related('product'))
+    _decrement(DailyProductSales, 'product_id', day, totals[DailyProductSales])
+    _decrement(DailyCategorySales, 'category_id', day, totals[DailyCategorySales])
+    _decrement(DailyPaymentSales, 'payment_method', day, totals[DailyPaymentSales])
+    if day < timezone.localdate():
+        # Closed days are cached without expiry
+        invalidate_sales_stats_cache()
+
+
+def _order_days(start, end):
+    """First and last local day with orders inside ``[start, end]``; ``(None, None)`` without orders."""
+    bounds = Order.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+    if bounds['first'] is None:
+        return None, None
+    first, last = timezone.localdate(bounds['first']), timezone.localdate(bounds['last'])
+    return max(first, start) if start else first, min(last, end) if end else last
+
+
+def rebuild_sales_rollups(start=None, end=None):
+    """Recompute the rollups for local days in ``[start, end]`` (both optional) from OrderItem.
+
+    Order items are scanned one calendar month at a time, each scan feeding all
+    three rollups, so memory holds at most a month of (day, key) totals however
+    long the range is. Returns the number of rows written per rollup model.
+    """
+    targets = {
+        DailyProductSales: 'product_id',
+        DailyCategorySales: 'category_id',
+        DailyPaymentSales: 'payment_method',
+    }
+    groupings = {model: ('day', key_field) for model, key_field in targets.items()}
+    written = {model.__name__: 0 for model in targets}
+    with transaction.atomic():
+        for model in targets:
+            rows = model.objects.all()
+            if start:
+                rows = rows.filter(day__gte=start)
+            if end:
+                rows = rows.filter(day__lte=end)
+            rows.delete()
+        first, last = _order_days(start, end)
+        for segment in month_segments(first, last) if first else ():
+            scan = scan_order_items(groupings, *segment)
+            for model, key_field in targets.items():
+                objs = (
+                    model(day=day, quantity=quantity, revenue=revenue, **{key_field: key})
+                    for (day, key), (quantity, revenue) in scan.pop(model).items()
+                )
+                while batch := list(islice(objs, REBUILD_BATCH_SIZE)):
+                    model.objects.bulk_create(batch)
+                    written[model.__name__] += len(batch)
+        invalidate_sales_stats_cache()
+    return written
@@ -2,7 +2,23 @@ from rest_framework import serializers
 from django.db import transaction
 from django.db.models import F, Case, When, IntegerField, Q
 from django.utils import timezone
-from .models import Category, Product, SiteConfig, Order, OrderItem, Coupon, Announcement
+from .coupons import forget_coupon, get_cached_coupon, redeem_coupon
+from .instrumentation import TimedSerializerMixin
+from .models import (
+    Category,
+    Product,
+    SiteConfig,
+    Order,
+    OrderItem,
+    Coupon,
+    Announcement,
+    PriceAdjustment,
+    normalize_coupon_code,
+)
+from .metrics import record_order_created
+from .order_feed import notify_new_order
+from .recommendations import record_order_cooccurrence
+from .rollups import record_order_sales
 
 
 def get_valid_coupon_qs(code):
@@ -10,7 +26,7 @@ def get_valid_coupon_qs(code):
     if not code:
         return Coupon.objects.none()
     now = timezone.now()
-    coupon_qs = Coupon.objects.filter(code__iexact=code, active=True)
+    coupon_qs = Coupon.objects.filter(code_normalized=normalize_coupon_code(code), active=True)
     return coupon_qs.filter(
         Q(expires_at__isnull=True) | Q(expires_at__gt=now),
         Q(usage_limit__isnull=True) | Q(used_count__lt=F("usage_limit")),
@@ -27,7 +43,7 @@ def _absolute_or_none(file_or_spec, request):
     return request.build_absolute_uri(url) if request else url
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     image_thumbnail = serializers.SerializerMethodField()
 
     class Meta:
@@ -39,7 +55,7 @@ class CategorySerializer(serializers.ModelSerializer):
         return _absolute_or_none(getattr(obj, 'image_thumbnail', None), request)
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), source='category', write_only=True, required=False
@@ -63,18 +79,26 @@ class ProductSerializer(serializers.ModelSerializer):
         return _absolute_or_none(getattr(obj, 'image_thumbnail', None), request)
 
 
-class SiteConfigSerializer(serializers.ModelSerializer):
+class ProductStockSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Minimal projection used to refresh prices and stock of a persisted cart."""
+
+    class Meta:
+        model = Product
+        fields = ['id', 'price', 'offer_price', 'stock', 'is_active']
+
+
+class SiteConfigSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = SiteConfig
         fields = ['whatsapp_phone', 'alias_or_cbu', 'shipping_cost', 'updated_at']
 
 
-class OrderItemCreateSerializer(serializers.Serializer):
+class OrderItemCreateSerializer(TimedSerializerMixin, serializers.Serializer):
     product_id = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1)
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = OrderItemCreateSerializer(many=True)
     coupon_code = serializers.CharField(write_only=True, required=False, allow_blank=True)
 
@@ -123,6 +147,7 @@ class OrderSerializer(serializers.ModelSerializer):
 
             order_items = []
             cases = []
+            stockouts = 0
 
             for pid, quantity in consolidated.items():
                 product = products[pid]
@@ -134,6 +159,7 @@ class OrderSerializer(serializers.ModelSerializer):
                     OrderItem(order=order, product=product, quantity=quantity, price=price)
                 )
                 cases.append(When(id=product.id, then=F('stock') - quantity))
+                stockouts += product.stock == quantity
 
             OrderItem.objects.bulk_create(order_items)
             Product.objects.filter(id__in=products.keys()).update(
@@ -142,16 +168,18 @@ class OrderSerializer(serializers.ModelSerializer):
 
             # Aplicar cupón si viene
             discount = 0
+            redeemed = False
             if code:
-                coupon_qs = get_valid_coupon_qs(code)
-                c = coupon_qs.first()
+                c = get_cached_coupon(code)
                 if c and total >= c.min_subtotal:
-                    updated = 1
+                    # The cached used_count may be stale: redemption re-checks the limit atomically
+                    updated = 1 if redeem_coupon(c) else 0
                     if c.usage_limit is not None:
-                        updated = coupon_qs.filter(
-                            pk=c.pk, used_count__lt=F("usage_limit")
-                        ).update(used_count=F("used_count") + 1)
+                        # Forget the memoized copy now and again once the new count is committed
+                        forget_coupon(code)
+                        transaction.on_commit(lambda: forget_coupon(code), robust=True)
                     if updated == 1:
+                        redeemed = True
                         if c.type == Coupon.TYPE_FIXED:
                             discount = min(c.amount, total)
                         elif c.type == Coupon.TYPE_PERCENT:
@@ -165,20 +193,27 @@ class OrderSerializer(serializers.ModelSerializer):
             order.discount_total = discount
             order.total = total - discount + order.shipping_cost
             order.save(update_fields=['total', 'discount_total', 'coupon_code', 'shipping_cost'])
+            record_order_sales(order, order_items)
+            notify_new_order(order, len(order_items))
+            record_order_created(stockouts=stockouts, coupon_redeemed=redeemed)
+            product_ids = [item.product_id for item in order_items]
+            # Bookkeeping after the order committed: robust callbacks log their errors
+            # instead of turning a placed order into a 500
+            transaction.on_commit(lambda: record_order_cooccurrence(product_ids), robust=True)
             return order
 
     def validate_coupon_code(self, value):
         if not value:
             return ''
         code = value.strip()[:40]
-        coupon = get_valid_coupon_qs(code).first()
+        coupon = get_cached_coupon(code)
         if not coupon:
             raise serializers.ValidationError('Cupón inválido')
         self._coupon = coupon
         return code
 
 
-class CouponSerializer(serializers.ModelSerializer):
+class CouponSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Coupon
         fields = [
@@ -187,7 +222,15 @@ class CouponSerializer(serializers.ModelSerializer):
         ]
 
 
-class AnnouncementSerializer(serializers.ModelSerializer):
+class AnnouncementSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Announcement
         fields = ['id', 'title', 'message', 'active', 'start_at', 'end_at', 'created_at']
+
+
+class PriceAdjustmentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    user = serializers.StringRelatedField()
+
+    class Meta:
+        model = PriceAdjustment
+        fields = ['id', 'created_at', 'user', 'kind', 'value', 'rounding', 'fields', 'scope', 'product_count']
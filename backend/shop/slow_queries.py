@@ -0,0 +1,187 @@
+import contextvars
+import json
+import logging
+import re
+import time
+import traceback
+from collections import Counter, defaultdict
+from hashlib import sha1
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+# Slow query log. The SQL execute wrapper in shop.instrumentation hands over
+# every statement slower than SLOW_QUERY_THRESHOLD_MS; it is written as one JSON
+# line to a rotating file with the view and the code frame that ran it, plus
+# the plan from EXPLAIN (PostgreSQL, without ANALYZE so nothing runs twice) or
+# EXPLAIN QUERY PLAN (SQLite). ``summarize_slow_queries`` groups the file by
+# fingerprint (the statement with literals and IN lists folded) for the
+# ``slow_queries`` command.
+
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+# The same statement shape is explained at most once per process in this window
+SLOW_QUERY_EXPLAIN_INTERVAL = 300
+SLOW_QUERY_MAX_SQL = 5000
+
+logger = logging.getLogger('shop.slow_queries')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_handler = None
+
+_explaining = contextvars.ContextVar('slow_query_explaining', default=False)
+_last_explained = {}
+
+_FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%s|\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+_EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+# Frames that are never the origin of a query: the database layer and this plumbing
+_SKIP_FRAMES = ('/django/db/', 'shop/instrumentation.py', 'shop/slow_queries.py')
+
+
+def fingerprint(sql):
+    normalized = sql
+    for pattern, replacement in _FINGERPRINT_RULES:
+        normalized = pattern.sub(replacement, normalized)
+    normalized = normalized.strip()
+    return sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+def _origin():
+    """Innermost frame of project code that led to the query, else the innermost caller."""
+    base = str(settings.BASE_DIR)
+    fallback = None
+    for frame in reversed(traceback.extract_stack()):
+        if any(part in frame.filename for part in _SKIP_FRAMES):
+            continue
+        if frame.filename.startswith(base) and '/site-packages/' not in frame.filename:
+            return f'{Path(frame.filename).relative_to(base)}:{frame.lineno} in {frame.name}'
+        if fallback is None:
+            fallback = f'{frame.filename}:{frame.lineno} in {frame.name}'
+    return fallback
+
+
+def explain(connection, sql, params):
+    """Return the plan of a SELECT as text, or None when it can't be explained."""
+    if connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN '
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        return None
+    if not _EXPLAINABLE.match(sql):
+        return None
+    token = _explaining.set(True)
+    try:
+        # A savepoint (or its own transaction) so a failing EXPLAIN can't poison the caller's
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except DatabaseError:
+        return None
+    finally:
+        _explaining.reset(token)
+    if connection.vendor == 'postgresql':
+        return '\n'.join(row[0] for row in rows)
+    # SQLite rows are (id, parent, notused, detail); indent children under their parent
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node] + detail)
+    return '\n'.join(lines)
+
+
+def _log():
+    global _handler
+    path = Path(settings.SLOW_QUERY_LOG_FILE).resolve()
+    if _handler is None or _handler.baseFilename != str(path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if _handler is not None:
+            logger.removeHandler(_handler)
+            _handler.close()
+        _handler = RotatingFileHandler(
+            path, maxBytes=SLOW_QUERY_LOG_MAX_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS, encoding='utf-8'
+        )
+        logger.addHandler(_handler)
+    return logger
+
+
+def record_slow_query(connection, sql, params, many, duration, view=None):
+    if _explaining.get():
+        return
+    key, normalized = fingerprint(sql)
+    plan = None
+    now = time.time()
+    if not many and getattr(settings, 'SLOW_QUERY_EXPLAIN', True):
+        if now - _last_explained.get(key, 0) >= SLOW_QUERY_EXPLAIN_INTERVAL:
+            _last_explained[key] = now
+            plan = explain(connection, sql, params)
+    _log().info(json.dumps({
+        'ts': round(now, 3),
+        'fingerprint': key,
+        'duration_ms': round(duration * 1000, 2),
+        'view': view,
+        'origin': _origin(),
+        'vendor': connection.vendor,
+        'sql': sql[:SLOW_QUERY_MAX_SQL],
+        'normalized': normalized[:SLOW_QUERY_MAX_SQL],
+        'plan': plan,
+    }, separators=(',', ':')))
+
+
+def _log_files(path):
+    path = Path(path)
+    # Oldest rotation first (highest number), the live file last
+    rotated = [p for p in path.parent.glob(f'{path.name}.*') if p.suffix[1:].isdigit()]
+    rotated.sort(key=lambda p: int(p.suffix[1:]), reverse=True)
+    return rotated + ([path] if path.exists() else [])
+
+
+def summarize_slow_queries(path=None, since=None, sort='total'):
+    """Group the slow query log (current file and rotations) by fingerprint, worst first.
+
+    ``since`` is a unix timestamp; ``sort`` is one of ``total``, ``max`` or ``count``.
+    """
+    groups = defaultdict(lambda: {
+        'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'views': Counter(), 'origins': Counter(), 'plan': None,
+    })
+    for file in _log_files(path or settings.SLOW_QUERY_LOG_FILE):
+        with open(file, encoding='utf-8') as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if since and entry['ts'] < since:
+                    continue
+                group = groups[entry['fingerprint']]
+                group['count'] += 1
+                group['total_ms'] += entry['duration_ms']
+                group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+                group['views'][entry['view']] += 1
+                group['origins'][entry['origin']] += 1
+                group['sql'] = entry['normalized']
+                group['plan'] = entry['plan'] or group['plan']
+
+    key = {'total': 'total_ms', 'max': 'max_ms', 'count': 'count'}[sort]
+    summary = []
+    for fp, group in sorted(groups.items(), key=lambda item: item[1][key], reverse=True):
+        summary.append({
+            'fingerprint': fp,
+            'count': group['count'],
+            'total_ms': round(group['total_ms'], 2),
+            'avg_ms': round(group['total_ms'] / group['count'], 2),
+            'max_ms': group['max_ms'],
+            'view': group['views'].most_common(1)[0][0],
+            'origin': group['origins'].most_common(1)[0][0],
+            'sql': group['sql'],
+            'plan': group['plan'],
+        })
+    return summary
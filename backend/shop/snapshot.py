@@ -0,0 +1,299 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import OrderItem
+
+# Columnar snapshot of order facts for ad-hoc analysis. Each column is a .npy
+# file opened as a memory map; rows are appended in OrderItem id order and
+# meta.json records how many are valid, so readers never see a half-written
+# batch. Questions are answered with vectorised group-bys over the columns and
+# never touch the transactional database.
+
+SNAPSHOT_BATCH_SIZE = 10000
+# Items of orders younger than this are left for the next run: their transaction
+# may still be open, and a lower id committing later would otherwise be skipped.
+SNAPSHOT_SETTLE_SECONDS = 300
+INITIAL_CAPACITY = 1 << 16
+
+COLUMNS = {
+    'order_id': np.int64,
+    'ts': np.int64,  # UTC epoch seconds
+    'local_ts': np.int64,  # wall-clock seconds in TIME_ZONE, for day/hour buckets
+    'product_id': np.int64,
+    'category_id': np.int64,
+    'quantity': np.int32,
+    'unit_price': np.int64,  # cents
+    'payment_method': np.int8,  # index into meta['codes']['payment_method']
+    'delivery_method': np.int8,
+    'customer': np.uint64,  # hash of the phone digits, 0 when empty
+}
+CODED_COLUMNS = ('payment_method', 'delivery_method')
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def snapshot_dir():
+    return Path(settings.SALES_SNAPSHOT_DIR)
+
+
+def _read_meta(directory):
+    try:
+        with open(directory / 'meta.json', encoding='utf-8') as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(directory, meta):
+    tmp = directory / 'meta.json.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(meta, fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, directory / 'meta.json')
+
+
+def customer_key(phone):
+    digits = ''.join(ch for ch in phone or '' if ch.isdigit())
+    if not digits:
+        return 0
+    return int.from_bytes(hashlib.blake2b(digits.encode(), digest_size=8).digest(), 'little')
+
+
+class _ColumnWriter:
+    """Appends to preallocated column files, doubling their capacity when full."""
+
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.rows = meta['rows']
+        self.capacity = meta['capacity']
+        self.arrays = {}
+        for name, dtype in COLUMNS.items():
+            path = directory / f'{name}.npy'
+            if path.exists():
+                self.arrays[name] = np.load(path, mmap_mode='r+')
+            else:
+                self.arrays[name] = np.lib.format.open_memmap(
+                    path, mode='w+', dtype=dtype, shape=(self.capacity,)
+                )
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for name, old in self.arrays.items():
+            path = self.directory / f'{name}.npy'
+            tmp = self.directory / f'{name}.npy.tmp'
+            new = np.lib.format.open_memmap(tmp, mode='w+', dtype=old.dtype, shape=(capacity,))
+            new[:self.rows] = old[:self.rows]
+            new.flush()
+            del old, new
+            os.replace(tmp, path)
+            self.arrays[name] = np.load(path, mmap_mode='r+')
+        self.capacity = capacity
+
+    def append(self, batch):
+        count = len(batch['order_id'])
+        if self.rows + count > self.capacity:
+            self._grow(self.rows + count)
+        for name, values in batch.items():
+            self.arrays[name][self.rows:self.rows + count] = values
+        self.rows += count
+
+    def flush(self):
+        for array in self.arrays.values():
+            array.flush()
+
+
+def build_sales_snapshot(directory=None, rebuild=False, batch_size=SNAPSHOT_BATCH_SIZE):
+    """Append OrderItem rows newer than the last run to the snapshot; returns the rows added.
+
+    Rows are only appended, so edits to orders already in the snapshot need ``rebuild``.
+    """
+    directory = Path(directory or snapshot_dir())
+    if rebuild and directory.exists():
+        shutil.rmtree(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    meta = _read_meta(directory) or {
+        'rows': 0,
+        'capacity': INITIAL_CAPACITY,
+        'last_item_id': 0,
+        'codes': {name: [] for name in CODED_COLUMNS},
+    }
+    writer = _ColumnWriter(directory, meta)
+    codes = {name: {value: i for i, value in enumerate(meta['codes'][name])} for name in CODED_COLUMNS}
+
+    cutoff = timezone.now() - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS)
+    rows = (
+        OrderItem.objects.filter(id__gt=meta['last_item_id'])
+        .order_by('id')
+        .values_list(
+            'id', 'order_id', 'order__created_at', 'product_id', 'product__category_id',
+            'quantity', 'price', 'order__payment_method', 'order__delivery_method', 'order__phone',
+        )
+    )
+    batch = {name: [] for name in COLUMNS}
+    local_ts, added, last_id = {}, 0, meta['last_item_id']
+
+    def flush_batch():
+        nonlocal batch
+        if batch['order_id']:
+            writer.append({name: np.asarray(values, dtype=COLUMNS[name]) for name, values in batch.items()})
+            batch = {name: [] for name in COLUMNS}
+
+    for (item_id, order_id, created_at, product_id, category_id,
+         quantity, price, payment_method, delivery_method, phone) in rows.iterator(chunk_size=batch_size):
+        if created_at >= cutoff:
+            # Ids are handed out in creation order, so everything after this is newer too
+            break
+        if created_at not in local_ts:
+            naive = timezone.localtime(created_at).replace(tzinfo=None)
+            local_ts[created_at] = (int(created_at.timestamp()), int((naive - EPOCH).total_seconds()))
+        ts, local = local_ts[created_at]
+        row = {
+            'order_id': order_id,
+            'ts': ts,
+            'local_ts': local,
+            'product_id': product_id,
+            'category_id': category_id,
+            'quantity': quantity,
+            'unit_price': int(price * 100),
+            'customer': customer_key(phone),
+        }
+        for name, value in (('payment_method', payment_method), ('delivery_method', delivery_method)):
+            if value not in codes[name]:
+                codes[name][value] = len(codes[name])
+                meta['codes'][name].append(value)
+            row[name] = codes[name][value]
+        for name, value in row.items():
+            batch[name].append(value)
+        added += 1
+        last_id = item_id
+        if len(batch['order_id']) >= batch_size:
+            flush_batch()
+            local_ts.clear()
+    flush_batch()
+
+    writer.flush()
+    meta.update(rows=writer.rows, capacity=writer.capacity, last_item_id=last_id)
+    meta['built_at'] = timezone.now().isoformat()
+    _write_meta(directory, meta)
+    return added
+
+
+def _cents(value):
+    return (Decimal(int(value)) / 100).quantize(Decimal('0.01'))
+
+
+class SalesSnapshot:
+    """Read-only view over the snapshot columns, filtered to local days ``[start, end]``."""
+
+    def __init__(self, directory=None):
+        directory = Path(directory or snapshot_dir())
+        meta = _read_meta(directory)
+        if meta is None:
+            raise FileNotFoundError('No hay snapshot de ventas; ejecute manage.py build_sales_snapshot')
+        self.meta = meta
+        rows = meta['rows']
+        self.columns = {
+            name: np.load(directory / f'{name}.npy', mmap_mode='r')[:rows] for name in COLUMNS
+        }
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def select(self, start=None, end=None):
+        """Return the columns restricted to the local days in range (copies only when filtering)."""
+        if start is None and end is None:
+            return self.columns
+        day = self.columns['local_ts'] // 86400
+        mask = np.ones(len(day), dtype=bool)
+        if start:
+            mask &= day >= (start - date(1970, 1, 1)).days
+        if end:
+            mask &= day <= (end - date(1970, 1, 1)).days
+        return {name: column[mask] for name, column in self.columns.items()}
+
+    def _decode(self, dimension, keys):
+        if dimension in CODED_COLUMNS:
+            labels = self.meta['codes'][dimension]
+            return [labels[k] for k in keys]
+        return [int(k) for k in keys]
+
+    def totals_by(self, dimension, start=None, end=None):
+        """Units and revenue per value of ``dimension`` (a column, ``hour`` or ``weekday``)."""
+        cols = self.select(start, end)
+        if dimension == 'hour':
+            keys = (cols['local_ts'] // 3600) % 24
+        elif dimension == 'weekday':
+            # 1970-01-01 was a Thursday; 0 is Monday as in date.weekday()
+            keys = (cols['local_ts'] // 86400 + 3) % 7
+        else:
+            keys = cols[dimension]
+        revenue = cols['quantity'].astype(np.int64) * cols['unit_price']
+        values, inverse = np.unique(keys, return_inverse=True)
+        units = np.bincount(inverse, weights=cols['quantity'], minlength=len(values)).astype(np.int64)
+        amount = np.bincount(inverse, weights=revenue, minlength=len(values)).astype(np.int64)
+        return [
+            {dimension: label, 'quantity': int(u), 'revenue': _cents(a)}
+            for label, u, a in zip(self._decode(dimension, values), units, amount)
+        ]
+
+    def basket_sizes(self, start=None, end=None):
+        """Histogram of order lines per order plus average units and revenue per order."""
+        cols = self.select(start, end)
+        orders, inverse, lines = np.unique(cols['order_id'], return_inverse=True, return_counts=True)
+        if not len(orders):
+            return {'orders': 0, 'avg_lines': 0, 'avg_units': 0, 'avg_revenue': _cents(0), 'histogram': []}
+        units = np.bincount(inverse, weights=cols['quantity'])
+        revenue = np.bincount(inverse, weights=cols['quantity'].astype(np.int64) * cols['unit_price'])
+        sizes, counts = np.unique(lines, return_counts=True)
+        return {
+            'orders': len(orders),
+            'avg_lines': round(float(lines.mean()), 2),
+            'avg_units': round(float(units.mean()), 2),
+            'avg_revenue': _cents(round(revenue.mean())),
+            'histogram': [{'lines': int(s), 'orders': int(c)} for s, c in zip(sizes, counts)],
+        }
+
+    def repeat_customers(self, start=None, end=None):
+        """Customers (by phone) with more than one order and the orders-per-customer histogram."""
+        cols = self.select(start, end)
+        _, first_rows = np.unique(cols['order_id'], return_index=True)
+        customers = cols['customer'][first_rows]
+        customers = customers[customers != 0]
+        _, orders_per_customer = np.unique(customers, return_counts=True)
+        repeat = int((orders_per_customer > 1).sum())
+        total = len(orders_per_customer)
+        freq, counts = np.unique(orders_per_customer, return_counts=True)
+        return {
+            'customers': total,
+            'repeat_customers': repeat,
+            'repeat_rate': round(repeat / total, 4) if total else 0,
+            'repeat_orders_share': (
+                round(float(orders_per_customer[orders_per_customer > 1].sum()) / len(customers), 4)
+                if len(customers) else 0
+            ),
+            'histogram': [{'orders': int(f), 'customers': int(c)} for f, c in zip(freq, counts)],
+        }
+
+
+SNAPSHOT_QUESTIONS = {
+    'basket-sizes': lambda snap, start, end: snap.basket_sizes(start, end),
+    'repeat-customers': lambda snap, start, end: snap.repeat_customers(start, end),
+    'hourly': lambda snap, start, end: snap.totals_by('hour', start, end),
+    'weekday': lambda snap, start, end: snap.totals_by('weekday', start, end),
+    'product': lambda snap, start, end: snap.totals_by('product_id', start, end),
+    'category': lambda snap, start, end: snap.totals_by('category_id', start, end),
+    'payment': lambda snap, start, end: snap.totals_by('payment_method', start, end),
+    'delivery': lambda snap, start, end: snap.totals_by('delivery_method', start, end),
+}
@@ -0,0 +1,72 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop import admin as shop_admin
+from shop.admin import EstimatedCountPaginator
+from shop.models import Category, Order, Product
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class AdminScalingTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser(username="admin", password="pass", email="a@example.com")
+        self.client.force_login(user)
+        self.categories = [Category.objects.create(name=f"Cat {i}", slug=f"cat-{i}") for i in range(3)]
+        for i in range(9):
+            Product.objects.create(category=self.categories[i % 3], name=f"Producto {i}", price=Decimal("1.00"))
+        self.juana = Order.objects.create(name="Juana Pérez", phone="3514445566", payment_method="cash")
+        self.pedro = Order.objects.create(name="Pedro Gómez", phone="3517778899", payment_method="cash")
+
+    def _changelist_orders(self, q):
+        resp = self.client.get(reverse("admin:shop_order_changelist"), {"q": q})
+        self.assertEqual(resp.status_code, 200)
+        return set(resp.context["cl"].result_list)
+
+    def test_paginator_caps_count(self):
+        with mock.patch.object(shop_admin, "ADMIN_EXACT_COUNT_LIMIT", 4):
+            paginator = EstimatedCountPaginator(Product.objects.order_by("id"), 2)
+            self.assertEqual(paginator.count, 4)
+            self.assertEqual(paginator.num_pages, 2)
+        self.assertEqual(EstimatedCountPaginator(Product.objects.order_by("id"), 2).count, 9)
+
+    def test_product_changelist_runs_no_full_count_or_per_row_queries(self):
+        url = reverse("admin:shop_product_changelist")
+        with CaptureQueriesContext(connection) as captured:
+            resp = self.client.get(url, {"category": self.categories[0].id})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context["cl"].result_list), 3)
+        self.assertIsNone(resp.context["cl"].full_result_count)
+        counts = [q["sql"] for q in captured if "COUNT(" in q["sql"].upper()]
+        self.assertEqual(len(counts), 1)
+        self.assertIn("LIMIT", counts[0].upper())
+        category_selects = [q for q in captured if 'FROM "shop_category"' in q["sql"]]
+        self.assertEqual(len(category_selects), 1)
+
+        with CaptureQueriesContext(connection) as more:
+            Product.objects.create(category=self.categories[0], name="Producto extra", price=Decimal("1.00"))
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as fewer:
+            self.client.get(url)
+        self.assertEqual(len(fewer), len(more) - 1)
+
+    def test_order_search_by_phone_id_and_name(self):
+        self.assertEqual(self._changelist_orders("4445"), {self.juana})
+        self.assertEqual(self._changelist_orders(str(self.pedro.pk)), {self.pedro})
+        self.assertEqual(self._changelist_orders("pérez"), {self.juana})
+        self.assertEqual(self._changelist_orders("juana pérez"), {self.juana})
+
+    def test_category_uses_autocomplete(self):
+        product = Product.objects.first()
+        resp = self.client.get(reverse("admin:shop_product_change", args=[product.pk]))
+        self.assertContains(resp, "admin-autocomplete")
+        resp = self.client.get(
+            reverse("admin:autocomplete"),
+            {"app_label": "shop", "model_name": "product", "field_name": "category", "term": "Cat 1"},
+        )
+        self.assertEqual([r["text"] for r in resp.json()["results"]], ["Cat 1"])
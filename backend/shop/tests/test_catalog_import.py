@@ -0,0 +1,188 @@
+import io
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from openpyxl import Workbook
+from PIL import Image
+
+from shop.catalog_import import import_catalog
+from shop.models import Category, Product
+
+
+def _csv(text):
+    return io.BytesIO(text.encode("utf-8"))
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        self.almacen = Category.objects.create(name="Almacén", slug="almacen")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+    def test_insert_then_diff_by_sku(self):
+        data = (
+            "Código;Nombre;Categoría;Precio;Precio oferta;Stock\n"
+            "A1;Arroz 1kg;Almacén;1.234,50;;10\n"
+            "B2;Yerba 500g;Infusiones;2500;2300,00;5\n"
+        )
+        report = import_catalog(_csv(data), "csv", chunk_size=1)
+        self.assertEqual((report["inserted"], report["updated"], report["unchanged"]), (2, 0, 0))
+        self.assertEqual(report["categories_created"], 1)
+        arroz = Product.objects.get(sku="A1")
+        self.assertEqual((arroz.price, arroz.offer_price, arroz.stock, arroz.category), (
+            Decimal("1234.50"), None, 10, self.almacen
+        ))
+        self.assertEqual(Product.objects.get(sku="B2").category.slug, "infusiones")
+
+        data = "sku,precio\nA1,1234.50\nB2,2600\n"
+        report = import_catalog(_csv(data), "csv")
+        self.assertEqual((report["inserted"], report["updated"], report["unchanged"]), (0, 1, 1))
+        yerba = Product.objects.get(sku="B2")
+        self.assertEqual((yerba.price, yerba.offer_price, yerba.stock), (Decimal("2600.00"), Decimal("2300.00"), 5))
+
+    def test_diff_by_name_only_touches_present_columns(self):
+        product = Product.objects.create(
+            category=self.almacen, name="Harina 000", description="Para pan", price=Decimal("900.00"), stock=3
+        )
+        report = import_catalog(_csv("nombre,precio,activo\nHarina 000,950,no\n"), "csv", key="name")
+        self.assertEqual((report["inserted"], report["updated"]), (0, 1))
+        product.refresh_from_db()
+        self.assertEqual((product.price, product.is_active, product.description, product.stock), (
+            Decimal("950.00"), False, "Para pan", 3
+        ))
+
+    def test_bad_rows_skipped_and_reported(self):
+        data = (
+            "sku,nombre,categoria,precio\n"
+            "A1,Arroz,Almacén,abc\nA2,Fideos,,100\n,Sin código,Almacén,1\nA3,Sal,Almacén,50\n"
+        )
+        report = import_catalog(_csv(data), "csv")
+        self.assertEqual(report["inserted"], 1)
+        self.assertEqual(report["skipped"], 3)
+        self.assertEqual([line for line, _ in report["errors"]], [2, 3, 4])
+        self.assertEqual(list(Product.objects.values_list("sku", flat=True)), ["A3"])
+
+    def test_sku_clashes_reported_as_row_errors(self):
+        Product.objects.create(category=self.almacen, name="Arroz", sku="A1", price=Decimal("10.00"))
+        data = (
+            "nombre,sku,categoria,precio\n"
+            "Yerba,A1,Almacén,100\n"
+            "Sal,B1,Almacén,50\n"
+            "Sal fina,B1,Almacén,60\n"
+            "Arroz,A1,Almacén,12\n"
+        )
+        report = import_catalog(_csv(data), "csv", key="name")
+        self.assertEqual((report["inserted"], report["updated"], report["skipped"]), (1, 1, 2))
+        self.assertEqual(report["errors"], [
+            (2, "el sku A1 ya es de otro producto"), (4, "el sku B1 se repite en el archivo"),
+        ])
+        self.assertEqual(
+            dict(Product.objects.values_list("name", "sku")), {"Arroz": "A1", "Sal": "B1"}
+        )
+        self.assertEqual(Product.objects.get(sku="A1").price, Decimal("12.00"))
+
+    def test_es_ar_thousands_without_decimals(self):
+        data = (
+            "sku;nombre;categoria;precio;stock\n"
+            "A1;Yerba;Almacén;2.500;1.200\n"
+            "A2;Aceite;Almacén;$ 12.999;3\n"
+            "A3;Sal;Almacén;1.234.567;0\n"
+            "A4;Azúcar;Almacén;12.5;7\n"
+            "A5;Harina;Almacén;900;1.5\n"
+            "A6;Fideos;Almacén;800;2,5\n"
+        )
+        report = import_catalog(_csv(data), "csv")
+        self.assertEqual(report["inserted"], 4)
+        self.assertEqual([line for line, _ in report["errors"]], [6, 7])
+        self.assertEqual(
+            dict(Product.objects.values_list("sku", "price")),
+            {"A1": Decimal("2500.00"), "A2": Decimal("12999.00"), "A3": Decimal("1234567.00"), "A4": Decimal("12.50")},
+        )
+        self.assertEqual(Product.objects.get(sku="A1").stock, 1200)
+
+    def test_values_over_column_limits_reported(self):
+        data = (
+            "sku;nombre;categoria;precio;stock\n"
+            "A1;Yerba;Almacén;99.999.999.999;1\n"
+            f"A2;{'x' * 201};Almacén;10;1\n"
+            f"{'S' * 65};Sal;Almacén;10;1\n"
+            f"A3;Sal;{'c' * 121};10;1\n"
+            "A4;Arroz;Almacén;10;3000000000\n"
+            "A5;Azúcar;Almacén;99.999.999,99;1\n"
+        )
+        report = import_catalog(_csv(data), "csv")
+        self.assertEqual((report["inserted"], report["skipped"]), (1, 5))
+        self.assertEqual([line for line, _ in report["errors"]], [2, 3, 4, 5, 6])
+        self.assertIn("máximo", report["errors"][0][1])
+        self.assertEqual(report["errors"][1][1], "nombre de más de 200 caracteres")
+        self.assertEqual(Product.objects.get().price, Decimal("99999999.99"))
+
+    def test_xlsx_and_dry_run(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(["SKU", "Nombre", "Categoría", "Precio", "Activo"])
+        sheet.append(["X1", "Aceite 1.5L", "Almacén", 3199.9, True])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+
+        buffer.seek(0)
+        report = import_catalog(buffer, "xlsx", dry_run=True)
+        self.assertEqual(report["inserted"], 1)
+        self.assertFalse(Product.objects.exists())
+
+        buffer.seek(0)
+        import_catalog(buffer, "xlsx")
+        self.assertEqual(Product.objects.get(sku="X1").price, Decimal("3199.90"))
+
+    def test_command_attaches_local_images(self):
+        Image.new("RGB", (4, 4), "red").save(self.tmp / "arroz.png")
+        path = self.tmp / "lista.csv"
+        path.write_text(
+            "sku,nombre,categoria,precio,imagen\nA1,Arroz,Almacén,10,arroz.png\nA2,Sal,Almacén,5,falta.png\n"
+        )
+        out, err = StringIO(), StringIO()
+        with override_settings(MEDIA_ROOT=self.tmp / "media"):
+            call_command("import_catalog", str(path), workers=2, stdout=out, stderr=err)
+            image = Product.objects.get(sku="A1").image
+            self.assertTrue(image.name.startswith("products/arroz"))
+            self.assertTrue(image.storage.exists(image.name))
+        self.assertFalse(Product.objects.get(sku="A2").image)
+        self.assertIn("2 nuevos", out.getvalue())
+        self.assertIn("1 imágenes", out.getvalue())
+        self.assertIn("fila 3: imagen no encontrada", err.getvalue())
+
+    def test_images_outside_the_images_dir_rejected(self):
+        images = self.tmp / "imagenes"
+        images.mkdir()
+        (self.tmp / "secreto.png").write_bytes(b"no")
+        data = (
+            "sku,nombre,categoria,precio,imagen\n"
+            "A1,Arroz,Almacén,10,../secreto.png\n"
+            f"A2,Sal,Almacén,5,{self.tmp / 'secreto.png'}\n"
+        )
+        with override_settings(MEDIA_ROOT=self.tmp / "media"):
+            report = import_catalog(_csv(data), "csv", images_dir=images)
+        self.assertEqual((report["inserted"], report["skipped"], report["images"]), (0, 2, 0))
+        self.assertTrue(all(message.startswith("imagen fuera") for _, message in report["errors"]))
+        self.assertFalse((self.tmp / "media").exists())
+
+    @override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+    def test_admin_upload(self):
+        user = get_user_model().objects.create_superuser(username="admin", password="pass", email="a@example.com")
+        self.client.force_login(user)
+        url = reverse("admin:shop_product_import")
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        upload = SimpleUploadedFile("lista.csv", b"sku,nombre,categoria,precio\nA1,Arroz,Almac\xc3\xa9n,10\n")
+        resp = self.client.post(url, {"file": upload, "key": "sku"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["report"]["inserted"], 1)
+        self.assertEqual(Product.objects.get(sku="A1").category, self.almacen)
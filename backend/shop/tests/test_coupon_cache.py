@@ -0,0 +1,162 @@
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop import cache_versions, coupons
+from shop.bloom import BloomFilter
+from shop.coupons import get_cached_coupon, invalidate_coupon_cache
+from shop.models import Coupon, SharedBloomFilter
+
+
+class CouponCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.coupon = Coupon.objects.create(
+            code="Verano10",
+            type=Coupon.TYPE_FIXED,
+            amount=Decimal("10.00"),
+            min_subtotal=Decimal("0"),
+            active=True,
+        )
+
+    def test_code_normalized_on_save(self):
+        self.assertEqual(self.coupon.code_normalized, "verano10")
+
+    @override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+    def test_admin_rejects_case_only_duplicate(self):
+        staff = get_user_model().objects.create_superuser(username="admin", password="pass", email="a@example.com")
+        self.client.force_login(staff)
+        resp = self.client.post(reverse("admin:shop_coupon_add"), {
+            "code": "VERANO10", "type": Coupon.TYPE_FIXED, "amount": "5", "percent": "0", "percent_cap": "0",
+            "min_subtotal": "0", "active": "on", "used_count": "0", "counter_shards": "0",
+        })
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("code", resp.context["adminform"].form.errors)
+        self.assertEqual(Coupon.objects.count(), 1)
+
+        self.coupon.code = "VERANO10"
+        self.coupon.full_clean()
+
+    def test_validation_served_from_cache(self):
+        get_cached_coupon("VERANO10")  # warm up
+        # Only the shared throttle upsert reaches the database
+        with self.assertNumQueries(1):
+            r = self.client.post(
+                "/api/coupons/validate/",
+                {"code": "  verano10 "},
+                content_type="application/json",
+            )
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.json()["valid"])
+
+    def test_cache_invalidated_on_save(self):
+        self.assertIsNotNone(get_cached_coupon("verano10"))
+        self.coupon.active = False
+        self.coupon.save()
+        self.assertIsNone(get_cached_coupon("verano10"))
+
+    def test_unknown_code_rejected_by_bloom_filter(self):
+        get_cached_coupon("verano10")  # builds and shares the filter
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_cached_coupon("NOEXISTE99"))
+
+    def test_generate_coupons_command(self):
+        call_command("generate_coupons", count=500, prefix="camp", length=6, amount="100", stdout=StringIO())
+        self.assertEqual(Coupon.objects.filter(code_normalized__startswith="camp").count(), 500)
+        code = Coupon.objects.filter(code_normalized__startswith="camp").first().code
+        self.assertIsNotNone(get_cached_coupon(code.lower()))
+
+
+def _fresh_state():
+    return {"version": None, "loaded_at": 0.0, "bloom": None, "coupons": {}}
+
+
+class SharedCouponVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Coupon.objects.create(code="Verano10", type=Coupon.TYPE_FIXED, amount=Decimal("10.00"))
+
+    @override_settings(CACHE_VERSION_CHECK_SECONDS=0)
+    def test_coupon_created_by_another_process_is_seen(self):
+        self.assertIsNotNone(get_cached_coupon("verano10"))  # filter built and stored here
+
+        # Another worker (or generate_coupons) with its own memos
+        with mock.patch.object(cache_versions, "_versions", {}), mock.patch.dict(coupons._state, _fresh_state()):
+            Coupon.objects.bulk_create([
+                Coupon(code="Nuevo5", code_normalized="nuevo5", type=Coupon.TYPE_FIXED, amount=Decimal("5.00"))
+            ])
+            self.assertIsNone(get_cached_coupon("nuevo5"))
+            with self.captureOnCommitCallbacks(execute=True):
+                invalidate_coupon_cache()
+
+        # This worker still holds the old filter, but under the old version
+        self.assertIsNotNone(get_cached_coupon("nuevo5"))
+
+    def test_filter_built_once_for_every_worker(self):
+        get_cached_coupon("verano10")
+        # Another worker at the same version loads the stored filter instead of scanning the codes
+        with mock.patch.dict(coupons._state, _fresh_state()), CaptureQueriesContext(connection) as captured:
+            self.assertIsNone(get_cached_coupon("noexiste99"))
+        self.assertEqual(len(captured), 1)
+        self.assertIn('"shop_sharedbloomfilter"', captured[0]["sql"])
+
+        # A worker still on an older version never overwrites the newer filter
+        stored = SharedBloomFilter.objects.get()
+        with mock.patch.dict(coupons._state, _fresh_state()):
+            coupons._shared_bloom(stored.version - 1)
+        self.assertEqual(SharedBloomFilter.objects.get().version, stored.version)
+
+    def test_version_rechecked_after_interval(self):
+        with override_settings(CACHE_VERSION_CHECK_SECONDS=0):
+            version = cache_versions.get_version("coupons")
+        with override_settings(CACHE_VERSION_CHECK_SECONDS=60):
+            # Bumped by another process
+            with mock.patch.object(cache_versions, "_versions", {}), self.captureOnCommitCallbacks(execute=True):
+                cache_versions.bump_version("coupons")
+            # Memo still fresh: no query, old stamp
+            with self.assertNumQueries(0):
+                self.assertEqual(cache_versions.get_version("coupons"), version)
+        with override_settings(CACHE_VERSION_CHECK_SECONDS=0):
+            self.assertNotEqual(cache_versions.get_version("coupons"), version)
+
+
+class CodeNormalizedMigrationTests(TestCase):
+    migration = import_module("shop.migrations.0008_coupon_code_normalized")
+
+    def test_populates_normalized_codes(self):
+        Coupon.objects.filter(pk=self.make("Promo").pk).update(code_normalized="")
+        self.migration.populate_code_normalized(apps, None)
+        self.assertEqual(Coupon.objects.get().code_normalized, "promo")
+
+    def test_case_only_duplicates_abort_with_listing(self):
+        self.make("PROMO")
+        other = self.make("otro")
+        # Legacy rows from before the normalized column existed
+        Coupon.objects.filter(pk=other.pk).update(code=" promo")
+        with self.assertRaisesMessage(RuntimeError, "'promo': 'PROMO', ' promo'"):
+            self.migration.populate_code_normalized(apps, None)
+
+    def make(self, code):
+        return Coupon.objects.create(code=code, type=Coupon.TYPE_FIXED, amount=Decimal("1.00"))
+
+
+class BloomFilterTests(TestCase):
+    def test_membership_and_roundtrip(self):
+        bloom = BloomFilter.for_capacity(1000)
+        for i in range(1000):
+            bloom.add(f"code{i}")
+        restored = BloomFilter.loads(bloom.dumps())
+        self.assertTrue(all(f"code{i}" in restored for i in range(1000)))
+        false_positives = sum(f"other{i}" in restored for i in range(10000))
+        self.assertLess(false_positives, 300)
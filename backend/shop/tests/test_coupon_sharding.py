@@ -0,0 +1,68 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from shop.coupons import get_redeemed_count, reconcile_coupon_counters
+from shop.models import Category, Product, Coupon, CouponRedemptionSlot
+from shop.serializers import OrderSerializer
+
+
+class ShardedCouponCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Cat", slug="cat")
+        self.product = Product.objects.create(
+            category=self.category, name="Prod", price=Decimal("10.00"), stock=100
+        )
+        self.coupon = Coupon.objects.create(
+            code="MASIVO",
+            type=Coupon.TYPE_FIXED,
+            amount=Decimal("5.00"),
+            min_subtotal=0,
+            active=True,
+            usage_limit=5,
+            counter_shards=4,
+        )
+
+    def _order(self):
+        data = {
+            "name": "John",
+            "phone": "123",
+            "payment_method": "cash",
+            "delivery_method": "pickup",
+            "items": [{"product_id": self.product.id, "quantity": 1}],
+            "coupon_code": "masivo",
+        }
+        serializer = OrderSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_slots_split_usage_limit(self):
+        slots = CouponRedemptionSlot.objects.filter(coupon=self.coupon)
+        self.assertEqual(slots.count(), 4)
+        self.assertEqual(sum(s.capacity for s in slots), 5)
+
+    def test_limit_enforced_across_slots(self):
+        for _ in range(5):
+            self.assertEqual(self._order().discount_total, Decimal("5"))
+        self.assertEqual(get_redeemed_count(self.coupon), 5)
+
+        order = self._order()
+        self.assertEqual(order.discount_total, 0)
+        self.assertEqual(order.coupon_code, "")
+
+    def test_reconcile_folds_slots_into_used_count(self):
+        for _ in range(3):
+            self._order()
+        self.assertEqual(reconcile_coupon_counters(self.coupon), 3)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 3)
+        slots = CouponRedemptionSlot.objects.filter(coupon=self.coupon)
+        self.assertEqual(sum(s.capacity for s in slots), 5)
+
+        self.coupon.counter_shards = 0
+        self.coupon.save()
+        self.coupon.refresh_from_db()
+        self.assertFalse(CouponRedemptionSlot.objects.filter(coupon=self.coupon).exists())
+        self.assertEqual(self.coupon.used_count, 3)
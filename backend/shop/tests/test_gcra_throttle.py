@@ -0,0 +1,35 @@
+from django.test import TestCase
+
+from shop.models import ThrottleBucket
+from shop.throttling import DatabaseThrottleStore
+
+
+class DatabaseThrottleStoreTests(TestCase):
+    def setUp(self):
+        self.store = DatabaseThrottleStore()
+
+    def test_burst_then_steady_rate(self):
+        now = 1_000_000.0
+        for i in range(5):
+            allowed, _ = self.store.consume("k", 5, 60, now)
+            self.assertTrue(allowed, f"request {i} rejected")
+        allowed, wait = self.store.consume("k", 5, 60, now)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 12.0)
+
+        # One emission interval later exactly one more request conforms
+        self.assertTrue(self.store.consume("k", 5, 60, now + 12)[0])
+        self.assertFalse(self.store.consume("k", 5, 60, now + 12)[0])
+        self.assertEqual(ThrottleBucket.objects.count(), 1)
+
+    def test_keys_are_independent(self):
+        now = 1_000_000.0
+        self.assertTrue(self.store.consume("a", 1, 60, now)[0])
+        self.assertFalse(self.store.consume("a", 1, 60, now)[0])
+        self.assertTrue(self.store.consume("b", 1, 60, now)[0])
+
+    def test_locked_update_fallback_matches_upsert(self):
+        now = 1_000_000.0
+        self.assertTrue(self.store._locked_update("c", 30.0, 60, now))
+        self.assertTrue(self.store._locked_update("c", 30.0, 60, now))
+        self.assertFalse(self.store._locked_update("c", 30.0, 60, now))
@@ -0,0 +1,68 @@
+import tempfile
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F, Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from shop.dataset import generate_dataset
+from shop.models import Category, Coupon, Order, OrderItem, Product
+
+
+class GenerateDatasetTests(TestCase):
+    END = date(2026, 3, 31)
+
+    def _generate(self, **kwargs):
+        options = dict(categories=12, products=300, orders=400, coupons=20, days=30, end=self.END,
+                       batch_size=100, images=False, derived=False)
+        options.update(kwargs)
+        generate_dataset(**options)
+
+    def _snapshot(self):
+        return (
+            list(Product.objects.order_by('id').values_list('name', 'price', 'category__name', 'stock')),
+            list(Order.objects.order_by('id').values_list('total', 'coupon_code', 'created_at')),
+            list(OrderItem.objects.order_by('id').values_list('product__name', 'quantity')),
+        )
+
+    def test_volumes_history_and_totals(self):
+        self._generate()
+        self.assertEqual(Category.objects.count(), 12)
+        self.assertEqual(Product.objects.count(), 300)
+        self.assertEqual(Coupon.objects.count(), 20)
+        self.assertEqual(Order.objects.count(), 400)
+        self.assertEqual(Product.objects.values('name').distinct().count(), 300)
+        self.assertTrue(Product.objects.filter(name__regex=r'[áéíóúñ]').exists())
+
+        days = [timezone.localtime(dt).date() for dt in Order.objects.order_by('id').values_list('created_at', flat=True)]
+        self.assertEqual(days, sorted(days))
+        self.assertEqual(days[-1], self.END)
+        self.assertGreaterEqual(days[0], date(2026, 3, 2))
+
+        for order in Order.objects.annotate(items_total=Sum(F('items__price') * F('items__quantity'))):
+            self.assertEqual(order.total, order.items_total - order.discount_total + order.shipping_cost)
+
+    def test_reproducible_from_seed(self):
+        self._generate(seed=7)
+        first = self._snapshot()
+        Order.objects.all().delete()
+        Product.objects.all().delete()
+        Category.objects.all().delete()
+        Coupon.objects.all().delete()
+        self._generate(seed=7)
+        self.assertEqual(self._snapshot(), first)
+
+    def test_command_images_and_guard(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            call_command('generate_dataset', categories=3, products=10, orders=20, coupons=2, days=5,
+                         end=self.END, stdout=StringIO())
+            product = Product.objects.first()
+            self.assertTrue(product.image.name.startswith('products/dataset/'))
+            self.assertTrue(product.image.storage.exists(product.image.name))
+            self.assertGreater(Product.objects.filter(popularity__gt=0).count(), 0)
+
+            with self.assertRaises(CommandError):
+                call_command('generate_dataset', products=10, orders=0, stdout=StringIO())
@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APITestCase
+
+from shop.models import Category, Coupon, Product
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Cat", slug="cat")
+        self.product = Product.objects.create(category=category, name="Prod", price=Decimal("10.00"), stock=2)
+        Coupon.objects.create(code="OFF5", type=Coupon.TYPE_FIXED, amount=Decimal("5.00"))
+        self.order = {
+            "name": "John",
+            "phone": "123",
+            "address": "street",
+            "payment_method": "cash",
+            "delivery_method": "pickup",
+            "items": [{"product_id": self.product.id, "quantity": 2}],
+        }
+        User.objects.create_user("tester", password="pass")
+        self.client.login(username="tester", password="pass")
+
+    def test_request_metrics_exposed(self):
+        before = sample("shop_http_requests_total", route="product-list", method="GET", status="200")
+        self.client.get(reverse("product-list"))
+        self.assertEqual(
+            sample("shop_http_requests_total", route="product-list", method="GET", status="200"), before + 1
+        )
+        self.assertGreater(sample("shop_db_queries_total", route="product-list"), 0)
+
+        resp = self.client.get(reverse("metrics"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["Content-Type"].startswith("text/plain"))
+        body = resp.content.decode()
+        self.assertIn('shop_http_request_duration_seconds_bucket{le="0.005",method="GET",route="product-list"}', body)
+        self.assertIn("shop_orders_created_total", body)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+        resp = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_business_counters_count_after_commit(self):
+        orders, stockouts, coupons = (
+            sample("shop_orders_created_total"),
+            sample("shop_stockouts_total"),
+            sample("shop_coupon_redemptions_total"),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse("order-list"), {**self.order, "coupon_code": "OFF5"}, format="json")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(sample("shop_orders_created_total"), orders + 1)
+        self.assertEqual(sample("shop_stockouts_total"), stockouts + 1)
+        self.assertEqual(sample("shop_coupon_redemptions_total"), coupons + 1)
+
+        # A rejected order counts nothing
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse("order-list"), self.order, format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(sample("shop_orders_created_total"), orders + 1)
+
+    def test_throttle_rejections_counted(self):
+        before = sample("shop_throttle_rejections_total", scope="orders")
+        self.order["items"][0]["quantity"] = 0
+        for _ in range(11):
+            resp = self.client.post(reverse("order-list"), self.order, format="json")
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(sample("shop_throttle_rejections_total", scope="orders"), before + 1)
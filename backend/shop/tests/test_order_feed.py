@@ -0,0 +1,161 @@
+import asyncio
+import json
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock, skipIf
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from shop import order_feed
+from shop.models import Category, Product
+from shop.serializers import OrderSerializer
+
+
+class OrderFeedTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Cat", slug="cat")
+        self.product = Product.objects.create(category=category, name="Prod", price=Decimal("10.00"), stock=10)
+        self.staff = get_user_model().objects.create_user(username="staff", password="pass", is_staff=True)
+        patcher = mock.patch.multiple(order_feed, ORDER_FEED_POLL_SECONDS=0.01, ORDER_FEED_MAX_SECONDS=1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _order(self):
+        serializer = OrderSerializer(data={
+            "name": "John",
+            "phone": "123",
+            "payment_method": "cash",
+            "delivery_method": "pickup",
+            "items": [{"product_id": self.product.id, "quantity": 2}],
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    async def _next_event(self, stream):
+        while True:
+            chunk = await asyncio.wait_for(stream.__anext__(), timeout=2)
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk.startswith("id:"):
+                return json.loads(chunk.split("data: ", 1)[1])
+
+    async def test_requires_staff(self):
+        resp = await self.async_client.get(reverse("order-feed"))
+        self.assertEqual(resp.status_code, 403)
+
+    async def test_pushes_new_orders(self):
+        await sync_to_async(self.async_client.force_login)(self.staff)
+        resp = await self.async_client.get(reverse("order-feed"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        stream = resp.streaming_content.__aiter__()
+        self.assertIn("retry:", (await stream.__anext__()).decode())
+        # Let the poller record its high-water mark before the order exists
+        await asyncio.sleep(0.05)
+
+        order = await sync_to_async(self._order)()
+        event = await self._next_event(stream)
+        self.assertEqual(event["id"], order.id)
+        self.assertEqual(event["items"], 1)
+
+        # The stream ends after ORDER_FEED_MAX_SECONDS and the last client stops the poller
+        remaining = [chunk async for chunk in stream]
+        self.assertFalse(any(chunk.startswith(b"id:") for chunk in remaining))
+        self.assertIsNone(order_feed.order_feed.task)
+
+    async def test_last_event_id_replays_missed_orders(self):
+        first = await sync_to_async(self._order)()
+        second = await sync_to_async(self._order)()
+        await sync_to_async(self.async_client.force_login)(self.staff)
+        resp = await self.async_client.get(reverse("order-feed"), headers={"Last-Event-ID": str(first.id)})
+        stream = resp.streaming_content.__aiter__()
+        event = await self._next_event(stream)
+        self.assertEqual(event["id"], second.id)
+        async for _ in stream:
+            pass
+
+    def test_wsgi_rejected(self):
+        self.client.force_login(self.staff)
+        resp = self.client.get(reverse("order-feed"))
+        self.assertEqual(resp.status_code, 501)
+
+
+class FakeListenConnection:
+    """Stands in for psycopg.AsyncConnection: records statements, replays notifications."""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.executed = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql):
+        self.executed.append(sql)
+
+    async def notifies(self):
+        for payload in self.payloads:
+            yield SimpleNamespace(channel=order_feed.ORDER_FEED_CHANNEL, payload=payload)
+
+
+class OrderFeedListenTests(TestCase):
+    def test_notify_carries_order_summary(self):
+        cursor = mock.MagicMock()
+        fake = mock.MagicMock(vendor="postgresql")
+        fake.cursor.return_value.__enter__.return_value = cursor
+        order = SimpleNamespace(
+            id=7, name="Ana", total=Decimal("12.50"), payment_method="cash", delivery_method="pickup",
+            created_at=timezone.now(),
+        )
+        with mock.patch.object(order_feed, "connection", fake):
+            order_feed.notify_new_order(order, 3)
+        sql, (channel, payload) = cursor.execute.call_args.args
+        self.assertEqual(sql, "SELECT pg_notify(%s, %s)")
+        self.assertEqual(channel, order_feed.ORDER_FEED_CHANNEL)
+        self.assertEqual(json.loads(payload)["id"], 7)
+        self.assertEqual(json.loads(payload)["items"], 3)
+
+    async def test_listen_publishes_notifications(self):
+        summaries = [{"id": 1, "items": 2}, {"id": 2, "items": 1}]
+        conn = FakeListenConnection([json.dumps(s) for s in summaries])
+        feed = order_feed.OrderFeed()
+        queue = asyncio.Queue()
+        feed.subscribers.add(queue)
+        with mock.patch("psycopg.AsyncConnection.connect", mock.AsyncMock(return_value=conn)) as connect:
+            await feed._listen()
+        self.assertEqual(conn.executed, [f"LISTEN {order_feed.ORDER_FEED_CHANNEL}"])
+        self.assertTrue(connect.call_args.kwargs["autocommit"])
+        self.assertNotIn("cursor_factory", connect.call_args.kwargs)
+        self.assertEqual([queue.get_nowait(), queue.get_nowait()], summaries)
+
+
+@skipIf(connection.vendor != "postgresql", "LISTEN/NOTIFY is PostgreSQL only")
+class OrderFeedPostgresTests(TransactionTestCase):
+    async def test_committed_order_reaches_listener(self):
+        category = await Category.objects.acreate(name="Cat", slug="cat")
+        product = await Product.objects.acreate(category=category, name="Prod", price=Decimal("10.00"), stock=10)
+        queue = order_feed.order_feed.subscribe()
+        try:
+            # Give the feed task time to open its connection and LISTEN
+            await asyncio.sleep(0.5)
+
+            def place_order():
+                serializer = OrderSerializer(data={
+                    "name": "John", "phone": "123", "payment_method": "cash", "delivery_method": "pickup",
+                    "items": [{"product_id": product.id, "quantity": 1}],
+                })
+                serializer.is_valid(raise_exception=True)
+                return serializer.save()
+
+            order = await sync_to_async(place_order)()
+            summary = await asyncio.wait_for(queue.get(), timeout=5)
+            self.assertEqual(summary["id"], order.id)
+        finally:
+            order_feed.order_feed.unsubscribe(queue)
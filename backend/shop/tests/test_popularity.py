@@ -0,0 +1,55 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from shop.models import Category, DailyProductSales, Product
+from shop.popularity import POPULARITY_WINDOW_DAYS, update_popularity
+
+
+class PopularityTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.today = timezone.localdate()
+        category = Category.objects.create(name="Cat", slug="cat")
+        self.old_hit, self.steady, self.unsold = [
+            Product.objects.create(category=category, name=name, price=Decimal("1.00"), stock=5)
+            for name in ("Galletitas viejas", "Galletitas diarias", "Galletitas nuevas")
+        ]
+        # 60 units a month ago vs 3 a day for the last ten days
+        self._sold(self.old_hit, 30, 60)
+        for age in range(10):
+            self._sold(self.steady, age, 3)
+
+    def _sold(self, product, age, quantity):
+        DailyProductSales.objects.create(
+            day=self.today - timedelta(days=age), product=product, quantity=quantity, revenue=quantity
+        )
+
+    def test_decayed_and_scaled(self):
+        call_command("update_popularity", stdout=StringIO())
+        scores = dict(Product.objects.values_list("name", "popularity"))
+        self.assertEqual(scores["Galletitas diarias"], 1.0)
+        self.assertLess(scores["Galletitas viejas"], 1.0)
+        self.assertGreater(scores["Galletitas viejas"], 0)
+        self.assertEqual(scores["Galletitas nuevas"], 0)
+
+    def test_scores_expire_after_window(self):
+        update_popularity()
+        later = self.today + timedelta(days=POPULARITY_WINDOW_DAYS + 30)
+        update_popularity(today=later)
+        self.assertFalse(Product.objects.filter(popularity__gt=0).exists())
+
+    def test_ordering_and_search_relevance(self):
+        update_popularity()
+        resp = self.client.get(reverse("product-list"), {"ordering": "-popularity"})
+        names = [p["name"] for p in resp.data["results"]]
+        self.assertEqual(names, ["Galletitas diarias", "Galletitas viejas", "Galletitas nuevas"])
+
+        resp = self.client.get(reverse("product-list"), {"search": "galletitas", "ordering": "-relevance"})
+        self.assertEqual(resp.data["results"][0]["name"], "Galletitas diarias")
@@ -0,0 +1,144 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop import cache_versions, catalog
+from shop.models import Category, PriceAdjustment, Product
+from shop.recommendations import related_cache_key
+
+
+class PriceAdjustmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = get_user_model().objects.create_superuser(username="admin", password="pass", email="a@example.com")
+        self.almacen = Category.objects.create(name="Almacén", slug="almacen")
+        self.bebidas = Category.objects.create(name="Bebidas", slug="bebidas")
+        self.arroz = Product.objects.create(category=self.almacen, name="Arroz", price=Decimal("10.00"))
+        self.fideos = Product.objects.create(
+            category=self.almacen, name="Fideos", price=Decimal("8.00"), offer_price=Decimal("6.00")
+        )
+        self.agua = Product.objects.create(category=self.bebidas, name="Agua", price=Decimal("103.00"))
+
+    def _prices(self, product):
+        product.refresh_from_db()
+        return product.price, product.offer_price
+
+    def test_percent_change_in_one_update(self):
+        with CaptureQueriesContext(connection) as captured:
+            entry = catalog.adjust_prices(
+                Product.objects.filter(category=self.almacen), "percent", Decimal("12.5"), scope="Almacén"
+            )
+        product_queries = [q["sql"] for q in captured if '"shop_product"' in q["sql"]]
+        # The MAX() guard against overflowing the price columns, then the UPDATE itself
+        self.assertEqual(len(product_queries), 2)
+        self.assertIn("MAX(", product_queries[0])
+        self.assertTrue(product_queries[1].startswith("UPDATE"))
+
+        self.assertEqual(self._prices(self.arroz), (Decimal("11.25"), None))
+        self.assertEqual(self._prices(self.fideos), (Decimal("9.00"), Decimal("6.75")))
+        self.assertEqual(self._prices(self.agua), (Decimal("103.00"), None))
+        self.assertEqual(entry.product_count, 2)
+        self.assertEqual(entry.fields, "price,offer_price")
+
+    def test_rounding_step_and_floor(self):
+        catalog.adjust_prices(Product.objects.filter(pk=self.agua.pk), "percent", Decimal("10"), rounding=Decimal("5"))
+        self.assertEqual(self._prices(self.agua), (Decimal("115.00"), None))
+
+        catalog.adjust_prices(
+            Product.objects.filter(pk=self.fideos.pk), "amount", Decimal("-7"), fields=("offer_price",)
+        )
+        self.assertEqual(self._prices(self.fideos), (Decimal("8.00"), Decimal("0.01")))
+
+    def test_catalog_version_bumped_after_commit(self):
+        key = related_cache_key(self.arroz.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            catalog.adjust_prices(Product.objects.all(), "amount", Decimal("1"))
+        self.assertNotEqual(related_cache_key(self.arroz.pk), key)
+
+    @override_settings(CACHE_VERSION_CHECK_SECONDS=0)
+    def test_catalog_version_shared_with_other_workers(self):
+        key = related_cache_key(self.arroz.pk)
+        # A command or another worker adjusts prices; this worker's memo is not involved
+        with mock.patch.object(cache_versions, "_versions", {}):
+            with self.captureOnCommitCallbacks(execute=True):
+                catalog.adjust_prices(Product.objects.all(), "amount", Decimal("1"))
+        self.assertNotEqual(related_cache_key(self.arroz.pk), key)
+
+    def test_adjustment_past_max_price_rejected(self):
+        self.agua.price = Decimal("50000000.00")
+        self.agua.save()
+        with self.assertRaisesMessage(ValueError, "máximo"):
+            catalog.adjust_prices(Product.objects.all(), "percent", Decimal("100"))
+        with self.assertRaisesMessage(ValueError, "máximo"):
+            catalog.adjust_prices(Product.objects.all(), "amount", Decimal("49999999.99"), rounding=Decimal("1"))
+        self.assertEqual(self._prices(self.agua), (Decimal("50000000.00"), None))
+        self.assertFalse(PriceAdjustment.objects.exists())
+
+        entry = catalog.adjust_prices(Product.objects.all(), "amount", Decimal("49999999.99"))
+        self.assertEqual(entry.product_count, 3)
+        self.assertEqual(self._prices(self.agua), (catalog.MAX_PRICE, None))
+
+    def test_parse_rejects_bad_input(self):
+        for params in (
+            {"kind": "double", "value": "10"},
+            {"kind": "percent", "value": "abc"},
+            {"kind": "percent", "value": "0"},
+            {"kind": "percent", "value": "-95"},
+            {"kind": "amount", "value": "10", "rounding": "0.05"},
+            {"kind": "amount", "value": "10", "fields": ["stock"]},
+        ):
+            with self.subTest(params=params), self.assertRaises(ValueError):
+                catalog.parse_price_adjustment(params)
+
+    def test_staff_api(self):
+        client = APIClient()
+        url = reverse("product-adjust-prices")
+        body = {"kind": "percent", "value": "20", "rounding": "1", "category": self.almacen.pk}
+        self.assertEqual(client.post(url, body, format="json").status_code, 403)
+
+        client.force_authenticate(self.staff)
+        resp = client.post(url, body, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["product_count"], 2)
+        self.assertEqual(resp.json()["scope"], "Categoría Almacén")
+        self.assertEqual(self._prices(self.fideos), (Decimal("10.00"), Decimal("7.00")))
+
+        body = {"kind": "amount", "value": "-1", "ids": [self.agua.pk], "fields": ["price"]}
+        resp = client.post(url, body, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self._prices(self.agua), (Decimal("102.00"), None))
+
+        resp = client.post(url, {"kind": "amount", "value": "1", "ids": [1], "category": 1}, format="json")
+        self.assertEqual(resp.status_code, 400)
+
+        Product.objects.filter(pk=self.agua.pk).update(price=Decimal("20000000.00"))
+        resp = client.post(url, {"kind": "percent", "value": "500", "ids": [self.agua.pk]}, format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("máximo", resp.json()["detail"])
+        self.assertEqual(self._prices(self.agua), (Decimal("20000000.00"), None))
+        self.assertEqual(PriceAdjustment.objects.count(), 2)
+
+    @override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+    def test_admin_action_asks_then_applies(self):
+        self.client.force_login(self.staff)
+        url = reverse("admin:shop_product_changelist")
+        data = {"action": "adjust_prices", helpers.ACTION_CHECKBOX_NAME: [self.arroz.pk, self.agua.pk], "index": 0}
+        resp = self.client.post(url, data)
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Se ajustarán 2 productos")
+        self.assertEqual(self._prices(self.arroz), (Decimal("10.00"), None))
+
+        resp = self.client.post(url, {**data, "apply": "1", "kind": "amount", "value": "2.5", "fields": ["price"]})
+        self.assertRedirects(resp, url, fetch_redirect_response=False)
+        self.assertEqual(self._prices(self.arroz), (Decimal("12.50"), None))
+        self.assertEqual(self._prices(self.agua), (Decimal("105.50"), None))
+        entry = PriceAdjustment.objects.get()
+        self.assertEqual((entry.user, entry.product_count), (self.staff, 2))
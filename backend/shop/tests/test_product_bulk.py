@@ -0,0 +1,68 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.models import Category, Product
+
+
+class ProductBulkTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('product-bulk')
+        self.category = Category.objects.create(name="Cat", slug="cat")
+        self.prod_a = Product.objects.create(
+            category=self.category, name="A", price=Decimal("10.00"), stock=3
+        )
+        self.prod_b = Product.objects.create(
+            category=self.category,
+            name="B",
+            price=Decimal("8.00"),
+            offer_price=Decimal("6.00"),
+            stock=0,
+            is_active=False,
+        )
+
+    def test_returns_minimal_projection_in_one_query(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.url, {'ids': f'{self.prod_b.id},{self.prod_a.id}'})
+        self.assertEqual(resp.status_code, 200)
+        rows = resp.json()
+        self.assertEqual([r['id'] for r in rows], [self.prod_a.id, self.prod_b.id])
+        self.assertEqual(set(rows[0].keys()), {'id', 'price', 'offer_price', 'stock', 'is_active'})
+        self.assertEqual(rows[1]['offer_price'], '6.00')
+        self.assertFalse(rows[1]['is_active'])
+
+    def test_post_body_and_etag(self):
+        resp = self.client.post(self.url, {'ids': [self.prod_a.id]}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        etag = resp['ETag']
+
+        resp = self.client.post(
+            self.url, {'ids': [self.prod_a.id]}, format='json', HTTP_IF_NONE_MATCH=etag
+        )
+        # Unsafe method with a matching If-None-Match: 412, not 304 (RFC 9110)
+        self.assertEqual(resp.status_code, 412)
+
+        Product.objects.filter(pk=self.prod_a.pk).update(stock=1)
+        resp = self.client.post(
+            self.url, {'ids': [self.prod_a.id]}, format='json', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()[0]['stock'], 1)
+
+    def test_get_not_modified_skips_serialization(self):
+        params = {'ids': f'{self.prod_a.id},{self.prod_b.id}'}
+        etag = self.client.get(self.url, params)['ETag']
+        with mock.patch('shop.views.ProductStockSerializer.to_representation') as to_representation:
+            with self.assertNumQueries(1):
+                resp = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+        to_representation.assert_not_called()
+
+    def test_invalid_ids_return_400(self):
+        resp = self.client.get(self.url, {'ids': '1,abc'})
+        self.assertEqual(resp.status_code, 400)
@@ -0,0 +1,61 @@
+import json
+import pstats
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from shop.models import Category, Order, Product
+from shop.profiling import SQL_FRAME, profile_endpoint
+
+
+class ProfileEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Almacén", slug="almacen")
+        self.product = Product.objects.create(category=category, name="Leche entera", price=Decimal("1.00"), stock=50)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.output = Path(tmp.name)
+
+    def test_command_writes_pstats_and_collapsed_stacks(self):
+        out = StringIO()
+        call_command("profile_endpoint", "/api/products/?search=leche", repeat=3, warmup=1,
+                     output=str(self.output), stdout=out)
+
+        stats = pstats.Stats(str(self.output / "profile.pstats"))
+        self.assertTrue(any(func[2] == "profiled_request" for func in stats.stats))
+        for line in (self.output / "stacks.collapsed").read_text().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            self.assertTrue(count.isdigit())
+            self.assertNotIn("profiled_request", stack)
+        self.assertIn("{200: 3}", out.getvalue())
+        self.assertIn("consultas", out.getvalue())
+
+    def test_sampling_only_skips_cprofile(self):
+        result = profile_endpoint("/api/products/", repeat=2, warmup=0, use_cprofile=False, output=self.output)
+        self.assertIsNone(result["profiler"])
+        self.assertEqual(set(result["files"]), {"collapsed"})
+        self.assertFalse((self.output / "profile.pstats").exists())
+        self.assertGreater(result["queries"], 0)
+        self.assertLessEqual(result["sql_ms"], result["wall_ms"])
+        self.assertTrue(all(
+            stack.endswith(SQL_FRAME) or SQL_FRAME not in stack for stack in result["sampler"].counts
+        ))
+
+    def test_writes_are_rolled_back(self):
+        body = {
+            "name": "Perfil", "phone": "351", "address": "Calle 1", "payment_method": "cash",
+            "delivery_method": "pickup", "items": [{"product_id": self.product.id, "quantity": 2}],
+        }
+        result = profile_endpoint("/api/orders/", method="post", data=json.dumps(body), repeat=2, warmup=1,
+                                  use_cprofile=False, output=self.output)
+
+        self.assertEqual(result["statuses"], {201: 2})
+        self.assertFalse(Order.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 50)
@@ -0,0 +1,84 @@
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from shop.models import Category, Product, Order, OrderItem, ProductCooccurrence, ProductRecommendation
+from shop.serializers import OrderSerializer
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Cat", slug="cat")
+        self.bread, self.butter, self.jam, self.milk = [
+            Product.objects.create(category=category, name=name, price=Decimal("1.00"), stock=100)
+            for name in ("Pan", "Manteca", "Mermelada", "Leche")
+        ]
+
+    def _order(self, *products):
+        serializer = OrderSerializer(data={
+            "name": "John",
+            "phone": "123",
+            "payment_method": "cash",
+            "delivery_method": "pickup",
+            "items": [{"product_id": p.id, "quantity": 1} for p in products],
+        })
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            return serializer.save()
+
+    def _related(self, product):
+        return [row["id"] for row in self.client.get(f"/api/products/{product.id}/related/").json()]
+
+    def test_incremental_counts_and_top_k(self):
+        self._order(self.bread, self.butter)
+        self._order(self.bread, self.butter, self.jam)
+        self._order(self.bread, self.jam)
+        self._order(self.bread, self.butter)
+
+        pair = ProductCooccurrence.objects.get(product=self.bread, other=self.butter)
+        self.assertEqual(pair.count, 3)
+        self.assertEqual(
+            ProductRecommendation.objects.get(product=self.bread).related_ids, [self.butter.id, self.jam.id]
+        )
+        self.assertEqual(self._related(self.bread), [self.butter.id, self.jam.id])
+        self.assertEqual(self._related(self.milk), [])
+
+    def test_served_from_cache_and_refreshed_by_new_orders(self):
+        self._order(self.milk, self.bread)
+        self.assertEqual(self._related(self.milk), [self.bread.id])
+        with self.assertNumQueries(0):
+            self.assertEqual(self._related(self.milk), [self.bread.id])
+
+        self._order(self.milk, self.jam)
+        self._order(self.milk, self.jam)
+        self.assertEqual(self._related(self.milk), [self.jam.id, self.bread.id])
+
+    def test_cooccurrence_failure_does_not_fail_committed_order(self):
+        with mock.patch("shop.serializers.record_order_cooccurrence", side_effect=RuntimeError("db down")):
+            with self.assertLogs(level="ERROR"):
+                order = self._order(self.bread, self.butter)
+        self.assertTrue(Order.objects.filter(pk=order.pk).exists())
+        self.assertFalse(ProductCooccurrence.objects.exists())
+
+    def test_rebuild_matches_incremental(self):
+        self._order(self.bread, self.butter, self.jam)
+        self._order(self.bread, self.jam)
+        incremental = dict(ProductRecommendation.objects.values_list("product_id", "related_ids"))
+        counts = set(ProductCooccurrence.objects.values_list("product_id", "other_id", "count"))
+
+        # Rows created outside the serializer are only picked up by a rebuild
+        order = Order.objects.create(name="X", phone="1", payment_method="cash")
+        OrderItem.objects.create(order=order, product=self.milk, quantity=1, price=Decimal("1"))
+        OrderItem.objects.create(order=order, product=self.butter, quantity=1, price=Decimal("1"))
+        call_command("rebuild_recommendations", stdout=StringIO())
+
+        rebuilt = set(ProductCooccurrence.objects.values_list("product_id", "other_id", "count"))
+        self.assertEqual(rebuilt - counts, {(self.milk.id, self.butter.id, 1), (self.butter.id, self.milk.id, 1)})
+        recs = dict(ProductRecommendation.objects.values_list("product_id", "related_ids"))
+        self.assertEqual(recs[self.jam.id], incremental[self.jam.id])
+        self.assertEqual(recs[self.milk.id], [self.butter.id])
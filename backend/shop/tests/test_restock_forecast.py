@@ -0,0 +1,80 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from shop import forecast
+from shop.models import Category, DailyProductSales, Product
+
+
+class RestockForecastTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        category = Category.objects.create(name="Cat", slug="cat")
+        listed = timezone.now() - timedelta(days=forecast.RESTOCK_WINDOW_DAYS + 1)
+        self.fast = Product.objects.create(category=category, name="Rápido", price=Decimal("1"), stock=20)
+        self.slow = Product.objects.create(category=category, name="Lento", price=Decimal("1"), stock=20)
+        self.idle = Product.objects.create(category=category, name="Quieto", price=Decimal("1"), stock=5)
+        Product.objects.update(created_at=listed)
+        for age in range(1, forecast.RESTOCK_WINDOW_DAYS + 1):
+            day = self.today - timedelta(days=age)
+            DailyProductSales.objects.create(day=day, product=self.fast, quantity=10, revenue=10)
+            DailyProductSales.objects.create(day=day, product=self.slow, quantity=1, revenue=1)
+        # Today's partial sales are ignored
+        DailyProductSales.objects.create(day=self.today, product=self.slow, quantity=500, revenue=500)
+
+    def test_ordered_by_urgency(self):
+        result = forecast.restock_forecast()
+        rows = result["results"]
+        self.assertEqual([r["product_id"] for r in rows], [self.fast.id, self.slow.id, self.idle.id])
+        self.assertAlmostEqual(rows[0]["velocity"], 10, places=1)
+        self.assertAlmostEqual(rows[0]["days_to_stockout"], 2, places=1)
+        self.assertTrue(rows[0]["alert"])
+        self.assertEqual(rows[0]["reorder_quantity"], 10 * (forecast.RESTOCK_LEAD_DAYS + forecast.RESTOCK_COVER_DAYS) - 20)
+        self.assertFalse(rows[1]["alert"])
+        self.assertIsNone(rows[2]["days_to_stockout"])
+
+    def test_recent_sales_weigh_more(self):
+        DailyProductSales.objects.filter(product=self.slow, day=self.today - timedelta(days=1)).update(quantity=50)
+        rate = forecast.restock_forecast()["results"][1]["velocity"]
+        self.assertGreater(rate, 1 + 49 / forecast.RESTOCK_WINDOW_DAYS)
+
+    def test_velocities_read_the_window_in_one_query(self):
+        # Product ids, weighted sales for the whole window, recently listed products
+        with self.assertNumQueries(3):
+            ids, velocity = forecast._velocities(self.today)
+        self.assertEqual(list(ids), [self.fast.id, self.slow.id, self.idle.id])
+        # Same EWMA as summing day by day
+        expected = sum(forecast.DECAY ** age for age in range(forecast.RESTOCK_WINDOW_DAYS))
+        expected *= (1 - forecast.DECAY) / (1 - forecast.DECAY ** forecast.RESTOCK_WINDOW_DAYS)
+        self.assertAlmostEqual(velocity[1], expected)
+        self.assertEqual(velocity[2], 0)
+
+    def test_new_product_not_diluted(self):
+        Product.objects.filter(pk=self.idle.pk).update(created_at=timezone.now() - timedelta(days=2))
+        for age in (1, 2):
+            DailyProductSales.objects.create(
+                day=self.today - timedelta(days=age), product=self.idle, quantity=4, revenue=4
+            )
+        rows = {r["product_id"]: r for r in forecast.restock_forecast()["results"]}
+        self.assertAlmostEqual(rows[self.idle.id]["velocity"], 4, places=1)
+
+    @override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+    def test_api_and_admin(self):
+        client = APIClient()
+        get_user_model().objects.create_superuser(username="admin", password="pass", email="a@example.com")
+        client.login(username="admin", password="pass")
+
+        resp = client.get(reverse("restock-forecast"), {"alerts": "1"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["count"], 1)
+
+        resp = client.get(reverse("admin:shop_product_restock"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Rápido")
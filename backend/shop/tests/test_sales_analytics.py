@@ -0,0 +1,71 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from shop import analytics, cache_versions
+from shop.models import Category, Product, DailyPaymentSales, DailyProductSales
+
+
+class SalesAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Cat", slug="cat")
+        self.products = [
+            Product.objects.create(category=self.category, name=f"P{i}", price=Decimal("1.00"))
+            for i in range(5)
+        ]
+        self.today = timezone.localdate()
+        self.old_day = self.today - timezone.timedelta(days=40)
+        for day in (self.old_day, self.today):
+            for i, product in enumerate(self.products):
+                DailyProductSales.objects.create(day=day, product=product, quantity=i + 1, revenue=Decimal(i + 1))
+            DailyPaymentSales.objects.create(day=day, payment_method="cash", quantity=15, revenue=Decimal("15"))
+
+    def test_closed_days_cached_and_today_recomputed(self):
+        first = analytics.sales_stats(self.old_day)
+        self.assertEqual(first["by_day"][0]["quantity"], 15)
+
+        DailyPaymentSales.objects.filter(day=self.old_day).update(quantity=99)
+        DailyPaymentSales.objects.filter(day=self.today).update(quantity=20)
+        second = analytics.sales_stats(self.old_day)
+        self.assertEqual([row["quantity"] for row in second["by_day"]], [15, 20])
+
+        analytics.invalidate_sales_stats_cache()
+        third = analytics.sales_stats(self.old_day)
+        self.assertEqual([row["quantity"] for row in third["by_day"]], [99, 20])
+
+    @override_settings(CACHE_VERSION_CHECK_SECONDS=0)
+    def test_rebuild_in_another_process_reaches_this_worker(self):
+        analytics.sales_stats(self.old_day)
+        DailyPaymentSales.objects.filter(day=self.old_day).update(quantity=99)
+        # e.g. manage.py rebuild_sales_rollups: its own version memo, this worker's cache untouched
+        with mock.patch.object(cache_versions, "_versions", {}), self.captureOnCommitCallbacks(execute=True):
+            analytics.invalidate_sales_stats_cache()
+        stats = analytics.sales_stats(self.old_day)
+        self.assertEqual(stats["by_day"][0]["quantity"], 99)
+
+    def test_by_product_top_n_pagination(self):
+        stats = analytics.sales_stats(top=2, page=2)
+        self.assertEqual(stats["by_product_count"], 5)
+        self.assertEqual([row["product__name"] for row in stats["by_product"]], ["P2", "P1"])
+
+    @override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+    def test_api_and_admin_share_params(self):
+        User = get_user_model()
+        User.objects.create_superuser(username="admin", password="pass", email="a@example.com")
+        self.client.login(username="admin", password="pass")
+
+        resp = self.client.get(reverse("sales-stats"), {"top": "0"})
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get(reverse("sales-stats"), {"top": "3"})
+        self.assertEqual(len(resp.json()["by_product"]), 3)
+
+        resp = self.client.get(reverse("admin:shop_order_stats"), {"top": "3", "page": "2"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([row["product__name"] for row in resp.context["by_product"]], ["P1", "P0"])
+        self.assertContains(resp, "page=1")
@@ -0,0 +1,80 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from shop.models import Category, Product, Order, OrderItem
+
+
+class SalesExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name="Cat", slug="cat")
+        self.prod_a = Product.objects.create(category=category, name="Prod A", price=Decimal("10.00"))
+        self.prod_b = Product.objects.create(category=category, name="Prod B", price=Decimal("5.00"))
+        self.first = self._order(datetime(2024, 3, 1, 12), [(self.prod_a, 2), (self.prod_b, 1)])
+        self.second = self._order(datetime(2024, 3, 2, 12), [(self.prod_b, 3)])
+
+    def _order(self, when, items):
+        order = Order.objects.create(name="Buyer", phone="123", payment_method="cash")
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.make_aware(when))
+        for product, qty in items:
+            OrderItem.objects.create(order=order, product=product, quantity=qty, price=product.price)
+        return order
+
+    def _login(self, is_staff=True):
+        get_user_model().objects.create_user(username="u", password="pass", is_staff=is_staff)
+        self.client.login(username="u", password="pass")
+
+    def _content(self, resp):
+        return b"".join(resp.streaming_content)
+
+    def test_requires_staff(self):
+        self.assertEqual(self.client.get(reverse("sales-export")).status_code, 403)
+        self._login(is_staff=False)
+        self.assertEqual(self.client.get(reverse("sales-export")).status_code, 403)
+
+    def test_csv_one_line_per_item(self):
+        self._login()
+        resp = self.client.get(reverse("sales-export"), {"start": "2024-03-01", "end": "2024-03-01"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        rows = list(csv.DictReader(io.StringIO(self._content(resp).decode())))
+        self.assertEqual([(r["order_id"], r["product_name"], r["line_total"]) for r in rows], [
+            (str(self.first.id), "Prod A", "20.00"),
+            (str(self.first.id), "Prod B", "5.00"),
+        ])
+
+    def test_ndjson_gzip_nests_items(self):
+        self._login()
+        resp = self.client.get(reverse("sales-export"), {"output": "ndjson", "gzip": "1"})
+        self.assertEqual(resp["Content-Type"], "application/gzip")
+        lines = gzip.decompress(self._content(resp)).decode().splitlines()
+        orders = [json.loads(line) for line in lines]
+        self.assertEqual([o["id"] for o in orders], [self.first.id, self.second.id])
+        self.assertEqual(len(orders[0]["items"]), 2)
+        self.assertEqual(orders[1]["items"][0]["quantity"], 3)
+
+    async def test_asgi_streams_without_buffering(self):
+        staff = await sync_to_async(get_user_model().objects.create_user)(username="s", is_staff=True)
+        await sync_to_async(self.async_client.force_login)(staff)
+        resp = await self.async_client.get(reverse("sales-export"), {"output": "ndjson"})
+        self.assertEqual(resp.status_code, 200)
+        # An async iterator: Django sends each chunk as it is produced instead of list()-ing the stream
+        self.assertTrue(resp.is_async)
+        content = b"".join([chunk async for chunk in resp.streaming_content])
+        self.assertEqual([json.loads(line)["id"] for line in content.splitlines()], [self.first.id, self.second.id])
+
+    def test_rejects_unknown_output(self):
+        self._login()
+        self.assertEqual(self.client.get(reverse("sales-export"), {"output": "xlsx"}).status_code, 400)
@@ -0,0 +1,103 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from shop import analytics
+from shop.models import (
+    Category,
+    Order,
+    Product,
+    DailyCategorySales,
+    DailyPaymentSales,
+    DailyProductSales,
+)
+from shop.rollups import rebuild_sales_rollups
+from shop.serializers import OrderSerializer
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Cat", slug="cat")
+        self.prod_a = Product.objects.create(category=self.category, name="A", price=Decimal("10.00"), stock=50)
+        self.prod_b = Product.objects.create(
+            category=self.category, name="B", price=Decimal("8.00"), offer_price=Decimal("6.00"), stock=50
+        )
+
+    def _order(self, payment_method, items):
+        serializer = OrderSerializer(data={
+            "name": "John",
+            "phone": "123",
+            "payment_method": payment_method,
+            "delivery_method": "pickup",
+            "items": [{"product_id": p.id, "quantity": q} for p, q in items],
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def _snapshot(self):
+        return {
+            model.__name__: sorted(
+                model.objects.values_list(*fields, "quantity", "revenue")
+            )
+            for model, fields in (
+                (DailyProductSales, ("day", "product_id")),
+                (DailyCategorySales, ("day", "category_id")),
+                (DailyPaymentSales, ("day", "payment_method")),
+            )
+        }
+
+    def test_orders_update_rollups(self):
+        self._order("cash", [(self.prod_a, 2), (self.prod_b, 1)])
+        self._order("transfer", [(self.prod_a, 1)])
+
+        today = timezone.localdate()
+        row = DailyProductSales.objects.get(day=today, product=self.prod_a)
+        self.assertEqual((row.quantity, row.revenue), (3, Decimal("30.00")))
+        row = DailyCategorySales.objects.get(day=today, category=self.category)
+        self.assertEqual((row.quantity, row.revenue), (4, Decimal("36.00")))
+        row = DailyPaymentSales.objects.get(day=today, payment_method="cash")
+        self.assertEqual((row.quantity, row.revenue), (3, Decimal("26.00")))
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self._order("cash", [(self.prod_a, 2), (self.prod_b, 1)])
+        self._order("cash", [(self.prod_b, 4)])
+        incremental = self._snapshot()
+        rebuild_sales_rollups()
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_deleted_order_subtracted_from_rollups(self):
+        self._order("cash", [(self.prod_a, 2), (self.prod_b, 1)])
+        order = self._order("cash", [(self.prod_b, 4)])
+        order.delete()
+        incremental = self._snapshot()
+        rebuild_sales_rollups()
+        self.assertEqual(self._snapshot(), incremental)
+        self.assertFalse(DailyProductSales.objects.filter(product=self.prod_b, quantity=0).exists())
+
+        Order.objects.all().delete()
+        self.assertEqual(self._snapshot(), {name: [] for name in incremental})
+
+    @override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+    def test_admin_delete_updates_cached_closed_day(self):
+        order = self._order("cash", [(self.prod_a, 2)])
+        yesterday = timezone.now() - timedelta(days=1)
+        Order.objects.filter(pk=order.pk).update(created_at=yesterday)
+        rebuild_sales_rollups()
+        day = timezone.localdate(yesterday)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(analytics.sales_stats(day, day)["by_product"][0]["revenue"], 20.0)
+
+        staff = get_user_model().objects.create_superuser(username="admin", password="pass", email="a@example.com")
+        self.client.force_login(staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse("admin:shop_order_changelist"), {
+                "action": "delete_selected", helpers.ACTION_CHECKBOX_NAME: [order.pk], "post": "yes",
+            })
+        self.assertEqual(resp.status_code, 302)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(analytics.sales_stats(day, day)["by_product"], [])
@@ -0,0 +1,91 @@
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from shop import analytics
+from shop.models import Category, Product, Order, OrderItem, DailyCategorySales, DailyPaymentSales, DailyProductSales
+from shop.rollups import rebuild_sales_rollups
+
+
+def _keyed(rows, key):
+    return {row[key]: (row['quantity'], Decimal(row['revenue'])) for row in rows}
+
+
+class SalesScanEquivalenceTests(TestCase):
+    def setUp(self):
+        cat_a = Category.objects.create(name="A", slug="a")
+        cat_b = Category.objects.create(name="B", slug="b")
+        products = [
+            Product.objects.create(category=cat_a, name="P1", price=Decimal("10.00")),
+            Product.objects.create(category=cat_a, name="P2", price=Decimal("3.50")),
+            Product.objects.create(category=cat_b, name="P3", price=Decimal("7.25")),
+        ]
+        now = timezone.now()
+        for i in range(12):
+            order = Order.objects.create(
+                name="Buyer", phone="1", payment_method="cash" if i % 3 else "transfer"
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=now - timezone.timedelta(days=i * 9, hours=i))
+            for j, product in enumerate(products[: 1 + i % 3]):
+                OrderItem.objects.create(order=order, product=product, quantity=1 + j + i % 2, price=product.price)
+        rebuild_sales_rollups()
+        self.start = (now - timezone.timedelta(days=60)).date()
+
+    def assertStatsEqual(self, a, b):
+        self.assertEqual(_keyed(a['by_product'], 'product_id'), _keyed(b['by_product'], 'product_id'))
+        self.assertEqual(
+            _keyed(a['by_category'], 'product__category_id'), _keyed(b['by_category'], 'product__category_id')
+        )
+        self.assertEqual(_keyed(a['by_day'], 'day'), _keyed(b['by_day'], 'day'))
+        self.assertEqual(_keyed(a['by_month'], 'month'), _keyed(b['by_month'], 'month'))
+        self.assertEqual(
+            _keyed(a['by_payment'], 'order__payment_method'), _keyed(b['by_payment'], 'order__payment_method')
+        )
+
+    def test_scan_matches_rollups(self):
+        for start in (None, self.start):
+            self.assertStatsEqual(
+                analytics.sales_stats_from_items(start),
+                analytics.sales_stats(start),
+            )
+
+    @skipIf(connection.vendor != "postgresql", "GROUPING SETS path is PostgreSQL only")
+    def test_grouping_sets_match_python_scan(self):
+        groupings = dict(analytics.STATS_GROUPINGS, day_product=('day', 'product_id'))
+        for start in (None, self.start):
+            self.assertEqual(
+                analytics._scan_grouping_sets(groupings, start, None),
+                analytics._scan_python(groupings, start, None),
+            )
+
+    def _snapshot(self):
+        return {
+            model.__name__: sorted(model.objects.values_list("day", key, "quantity", "revenue"))
+            for model, key in (
+                (DailyProductSales, "product_id"),
+                (DailyCategorySales, "category_id"),
+                (DailyPaymentSales, "payment_method"),
+            )
+        }
+
+    def test_rebuild_scans_one_month_at_a_time(self):
+        before = self._snapshot()
+        with mock.patch("shop.rollups.scan_order_items", wraps=analytics.scan_order_items) as scan:
+            rebuild_sales_rollups()
+        # Twelve orders nine days apart span four or five calendar months
+        self.assertGreaterEqual(scan.call_count, 4)
+        for call in scan.call_args_list:
+            first, last = call.args[1:]
+            self.assertEqual((first.year, first.month), (last.year, last.month))
+        self.assertEqual(self._snapshot(), before)
+
+    @skipIf(connection.vendor != "postgresql", "GROUPING SETS path is PostgreSQL only")
+    def test_rebuild_with_grouping_sets_matches_python_scan(self):
+        rebuild_sales_rollups()
+        grouping_sets = self._snapshot()
+        with mock.patch("shop.rollups.scan_order_items", analytics._scan_python):
+            rebuild_sales_rollups()
+        self.assertEqual(self._snapshot(), grouping_sets)
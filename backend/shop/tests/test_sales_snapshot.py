@@ -0,0 +1,83 @@
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from shop import snapshot
+from shop.models import Category, Product, Order, OrderItem
+
+
+class SalesSnapshotTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        settings_override = override_settings(SALES_SNAPSHOT_DIR=self.dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.category = Category.objects.create(name="Cat", slug="cat")
+        self.prod_a = Product.objects.create(category=self.category, name="A", price=Decimal("10.00"))
+        self.prod_b = Product.objects.create(category=self.category, name="B", price=Decimal("2.50"))
+
+    def _order(self, when, phone, items, payment="cash"):
+        order = Order.objects.create(name="Buyer", phone=phone, payment_method=payment)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.make_aware(when))
+        for product, qty in items:
+            OrderItem.objects.create(order=order, product=product, quantity=qty, price=product.price)
+        return order
+
+    def test_incremental_append_and_questions(self):
+        self._order(datetime(2024, 5, 1, 9, 30), "351-111", [(self.prod_a, 1), (self.prod_b, 2)])
+        self._order(datetime(2024, 5, 1, 18, 0), "351 111", [(self.prod_b, 4)], payment="transfer")
+        self.assertEqual(snapshot.build_sales_snapshot(), 3)
+
+        self._order(datetime(2024, 5, 2, 9, 0), "351-222", [(self.prod_a, 3)])
+        # Too recent: left for the next run in case its transaction is still open
+        Order.objects.create(name="Nuevo", phone="1", payment_method="cash").items.create(
+            product=self.prod_a, quantity=1, price=Decimal("10.00")
+        )
+        self.assertEqual(snapshot.build_sales_snapshot(batch_size=1), 1)
+
+        snap = snapshot.SalesSnapshot()
+        self.assertEqual(len(snap), 4)
+        hourly = {row["hour"]: row for row in snap.totals_by("hour")}
+        self.assertEqual(hourly[9]["quantity"], 6)
+        self.assertEqual(hourly[9]["revenue"], Decimal("45.00"))
+        payments = {row["payment_method"]: row["revenue"] for row in snap.totals_by("payment_method")}
+        self.assertEqual(payments, {"cash": Decimal("45.00"), "transfer": Decimal("10.00")})
+
+        baskets = snap.basket_sizes(date(2024, 5, 1), date(2024, 5, 1))
+        self.assertEqual(baskets["orders"], 2)
+        self.assertEqual(baskets["histogram"], [{"lines": 1, "orders": 1}, {"lines": 2, "orders": 1}])
+
+        repeat = snap.repeat_customers()
+        self.assertEqual(repeat["customers"], 2)
+        self.assertEqual(repeat["repeat_customers"], 1)
+
+    def test_growth_keeps_rows(self):
+        for day in range(1, 6):
+            self._order(datetime(2024, 6, day, 12), str(day), [(self.prod_a, day)])
+        with mock.patch.object(snapshot, "INITIAL_CAPACITY", 2):
+            snapshot.build_sales_snapshot(batch_size=2)
+        snap = snapshot.SalesSnapshot()
+        self.assertEqual(list(snap.columns["quantity"]), [1, 2, 3, 4, 5])
+
+    def test_api(self):
+        client = APIClient()
+        get_user_model().objects.create_user(username="u", password="pass", is_staff=True)
+        client.login(username="u", password="pass")
+        url = reverse("snapshot-stats", args=["basket-sizes"])
+        self.assertEqual(client.get(url).status_code, 503)
+
+        self._order(datetime(2024, 5, 1, 9), "1", [(self.prod_a, 1)])
+        snapshot.build_sales_snapshot()
+        resp = client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["results"]["orders"], 1)
+        self.assertEqual(client.get(reverse("snapshot-stats", args=["nope"])).status_code, 404)
@@ -0,0 +1,79 @@
+import json
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.models import Category, Product
+
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name="Cat", slug="cat")
+        self.product = Product.objects.create(category=category, name="Yerba", price=Decimal("1.00"), stock=5)
+
+    def _timing(self, response):
+        entries = {}
+        for entry in response["Server-Timing"].split(", "):
+            name, *params = entry.split(";")
+            entries[name] = dict(p.split("=", 1) for p in params)
+        return entries
+
+    def test_header_and_log_line(self):
+        with self.assertLogs("shop.perf", "INFO") as logs:
+            resp = self.client.get(reverse("product-list"))
+        self.assertEqual(resp.status_code, 200)
+        timing = self._timing(resp)
+        self.assertEqual(set(timing), {"db", "serialize", "render", "app", "cache", "total"})
+        self.assertRegex(timing["db"]["desc"], r'^"[1-9]\d* queries"$')
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line["view"], "product-list")
+        self.assertEqual(line["status"], 200)
+        self.assertEqual(f'"{line["sql_count"]} queries"', timing["db"]["desc"])
+        self.assertGreater(line["render_ms"], 0)
+        self.assertGreater(line["serialize_ms"], 0)
+
+    def test_serialize_phase_reported_apart_from_app(self):
+        # Every perf_counter() read advances a fake clock by one second
+        clock = iter(range(1000))
+
+        def to_representation(serializer, instance):
+            next(clock)
+            return {"id": instance.id}
+
+        with mock.patch("rest_framework.serializers.ModelSerializer.to_representation", to_representation):
+            with mock.patch("shop.instrumentation.time.perf_counter", side_effect=lambda: float(next(clock))):
+                resp = self.client.get(reverse("product-list"))
+        timing = {name: float(v["dur"]) for name, v in self._timing(resp).items() if "dur" in v}
+        # One product serialized: start read, one tick inside, end read
+        self.assertEqual(timing["serialize"], 2000.0)
+        self.assertAlmostEqual(
+            timing["app"], timing["total"] - timing["db"] - timing["serialize"] - timing["render"], places=1
+        )
+
+    def test_cache_hits_counted(self):
+        url = reverse("product-related", args=[self.product.id])
+        # The catalog version the cache key is built from is read from the database, not the cache
+        self.assertEqual(self._timing(self.client.get(url))["cache"]["desc"], '"0 hits 1 misses"')
+        self.assertEqual(self._timing(self.client.get(url))["cache"]["desc"], '"1 hits 0 misses"')
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_disabled(self):
+        self.assertNotIn("Server-Timing", self.client.get(reverse("product-list")))
+
+    def test_slow_sampled_request_is_profiled(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with override_settings(
+                SERVER_TIMING_PROFILE_RATE=1.0, SERVER_TIMING_PROFILE_THRESHOLD_MS=0, SERVER_TIMING_PROFILE_DIR=tmp
+            ):
+                self.client.get(reverse("product-list"))
+            dumps = list(Path(tmp).glob("*-product-list-*ms.prof"))
+            self.assertEqual(len(dumps), 1)
@@ -0,0 +1,79 @@
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.models import Category, Product
+from shop import slow_queries
+from shop.slow_queries import fingerprint
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        slow_queries._last_explained.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name="Cat", slug="cat")
+        self.product = Product.objects.create(category=category, name="Yerba", price=Decimal("1.00"), stock=5)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.log = Path(tmp.name) / "slow.log"
+
+    def _entries(self):
+        return [json.loads(line) for line in self.log.read_text().splitlines()]
+
+    def test_fingerprint_folds_literals_and_in_lists(self):
+        a, _ = fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'")
+        b, normalized = fingerprint("SELECT *  FROM t WHERE id IN (%s) AND name = 'other'")
+        self.assertEqual(a, b)
+        self.assertEqual(normalized, "SELECT * FROM t WHERE id IN (...) AND name = ?")
+
+    def test_slow_queries_logged_with_view_origin_and_plan(self):
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_LOG_FILE=self.log):
+            self.client.get(reverse("product-related", args=[self.product.id]))
+        entries = self._entries()
+        self.assertTrue(entries)
+        self.assertEqual({e["view"] for e in entries}, {"product-related"})
+        related = [e for e in entries if "shop_productrecommendation" in e["sql"]]
+        self.assertTrue(related[0]["origin"].startswith("shop/recommendations.py:"))
+        self.assertIn("shop_productrecommendation", related[0]["plan"])
+
+    def test_summary_command_groups_by_fingerprint(self):
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_LOG_FILE=self.log):
+            for _ in range(3):
+                list(Product.objects.filter(id__in=[self.product.id, 1, 2]))
+            list(Product.objects.filter(id__in=[self.product.id]))
+        entries = self._entries()
+        self.assertEqual(len({e["fingerprint"] for e in entries}), 1)
+        # Outside a request there is no view; the origin is this test
+        self.assertIsNone(entries[0]["view"])
+        self.assertIn("test_slow_queries.py", entries[0]["origin"])
+        # The same shape is explained only once per interval
+        self.assertEqual(sum(1 for e in entries if e["plan"]), 1)
+
+        out = StringIO()
+        call_command("slow_queries", file=str(self.log), sort="count", plans=True, stdout=out)
+        self.assertIn(f"{entries[0]['fingerprint']}  4x", out.getvalue())
+        self.assertIn("1 consultas distintas", out.getvalue())
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_logging_failure_does_not_fail_the_request(self):
+        unwritable = self.log / "not-a-dir" / "slow.log"
+        self.log.write_text("")  # a file where the log directory should be
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_LOG_FILE=unwritable):
+            with self.assertLogs("shop.perf", "WARNING") as logs:
+                resp = self.client.get(reverse("product-related", args=[self.product.id]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("No se pudo registrar la consulta lenta", logs.output[0])
+
+    def test_disabled(self):
+        with override_settings(SLOW_QUERY_LOG_FILE=self.log):
+            list(Product.objects.all())
+        self.assertFalse(self.log.exists())
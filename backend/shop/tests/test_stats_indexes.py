@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from shop.analytics import filter_order_items, local_day_range
+from shop.models import OrderItem
+
+
+@override_settings(TIME_ZONE="America/Argentina/Cordoba")
+class StatsDateRangeIndexTests(TestCase):
+    def test_local_day_range_is_half_open_in_time_zone(self):
+        since, until = local_day_range(date(2025, 3, 1), date(2025, 3, 31))
+        self.assertEqual(since.isoformat(), "2025-03-01T00:00:00-03:00")
+        self.assertEqual(until.isoformat(), "2025-04-01T00:00:00-03:00")
+
+    def test_date_filter_uses_created_at_index(self):
+        items = filter_order_items(OrderItem.objects.all(), date(2025, 3, 1), date(2025, 3, 31))
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                # Empty test tables make a sequential scan look cheapest
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = items.explain()
+        self.assertIn("order_created_at_idx", plan)
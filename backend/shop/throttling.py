@@ -0,0 +1,150 @@
+import hashlib
+import random
+import sqlite3
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from rest_framework.throttling import ScopedRateThrottle
+
+from .metrics import THROTTLED
+from .models import ThrottleBucket
+
+# GCRA (generic cell rate algorithm): each key stores a single timestamp, the
+# theoretical arrival time (TAT) of the next conforming request. A request is
+# allowed when ``max(tat, now) + interval - period <= now``, which admits bursts
+# of up to ``limit`` requests and then one every ``period / limit`` seconds.
+# Checking and advancing the TAT is a single atomic statement in the store, so
+# the limit holds across every worker instead of per process.
+
+CLEANUP_PROBABILITY = 0.001
+
+
+class DatabaseThrottleStore:
+    """Keeps GCRA state in ThrottleBucket using one upsert per request."""
+
+    def _supports_upsert(self):
+        if connection.vendor == 'postgresql':
+            return True
+        return connection.vendor == 'sqlite' and sqlite3.sqlite_version_info >= (3, 35)
+
+    def _upsert(self, key, interval, period, now):
+        qn = connection.ops.quote_name
+        table = qn(ThrottleBucket._meta.db_table)
+        key_col, tat_col = qn('key'), qn('tat')
+        greatest = 'GREATEST' if connection.vendor == 'postgresql' else 'MAX'
+        sql = (
+            f'INSERT INTO {table} ({key_col}, {tat_col}) VALUES (%s, %s) '
+            f'ON CONFLICT ({key_col}) DO UPDATE SET {tat_col} = {greatest}({table}.{tat_col}, %s) + %s '
+            f'WHERE {greatest}({table}.{tat_col}, %s) + %s - %s <= %s '
+            f'RETURNING {tat_col}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [key, now + interval, now, interval, now, interval, period, now])
+            return cursor.fetchone() is not None
+
+    def _locked_update(self, key, interval, period, now):
+        with transaction.atomic():
+            bucket, created = ThrottleBucket.objects.select_for_update().get_or_create(
+                key=key, defaults={'tat': now + interval}
+            )
+            if created:
+                return True
+            new_tat = max(bucket.tat, now) + interval
+            if new_tat - period > now:
+                return False
+            bucket.tat = new_tat
+            bucket.save(update_fields=['tat'])
+            return True
+
+    def consume(self, key, limit, period, now):
+        """Return ``(allowed, wait_seconds)`` for one request on ``key``."""
+        interval = period / limit
+        if self._supports_upsert():
+            allowed = self._upsert(key, interval, period, now)
+        else:
+            allowed = self._locked_update(key, interval, period, now)
+        if random.random() < CLEANUP_PROBABILITY:
+            ThrottleBucket.objects.filter(tat__lt=now).delete()
+        if allowed:
+            return True, None
+        tat = ThrottleBucket.objects.filter(key=key).values_list('tat', flat=True).first()
+        wait = max(tat, now) + interval - period - now if tat is not None else interval
+        return False, max(wait, 0.0)
+
+
+class RedisThrottleStore:
+    """Keeps GCRA state in Redis, checked and updated by a Lua script."""
+
+    SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local period = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+if tat < now then tat = now end
+local new_tat = tat + interval
+if new_tat - period > now then
+  return {0, tostring(new_tat - period - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, '0'}
+"""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured('THROTTLE_STORE=redis requiere el paquete "redis"') from exc
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def consume(self, key, limit, period, now):
+        allowed, wait = self.script(keys=[key], args=[now, period / limit, period])
+        if int(allowed):
+            return True, None
+        return False, float(wait)
+
+
+_store = None
+
+
+def get_throttle_store():
+    global _store
+    if _store is None:
+        backend = getattr(settings, 'THROTTLE_STORE', 'database')
+        if backend == 'redis':
+            _store = RedisThrottleStore(settings.THROTTLE_REDIS_URL)
+        elif backend == 'database':
+            _store = DatabaseThrottleStore()
+        else:
+            raise ImproperlyConfigured(f'THROTTLE_STORE desconocido: {backend}')
+    return _store
+
+
+class GCRAScopedRateThrottle(ScopedRateThrottle):
+    """Drop-in replacement for ScopedRateThrottle enforcing the scope rate across workers."""
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        if len(key) > ThrottleBucket._meta.get_field('key').max_length:
+            key = hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+        allowed, self._wait = get_throttle_store().consume(
+            key, self.num_requests, self.duration, self.timer()
+        )
+        if not allowed:
+            THROTTLED.labels(self.scope).inc()
+        return allowed
+
+    def wait(self):
+        return self._wait
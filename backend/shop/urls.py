@@ -8,6 +8,10 @@ from .views import (
     CouponValidateView,
     AnnouncementViewSet,
     sales_stats,
+    sales_export,
+    snapshot_stats,
+    restock_forecast,
+    order_feed_stream,
 )
 
 router = DefaultRouter()
@@ -18,7 +22,12 @@ router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'announcements', AnnouncementViewSet, basename='announcement')
 
 urlpatterns = [
+    # Before the router so 'feed' is not taken for an order id
+    path('orders/feed/', order_feed_stream, name='order-feed'),
     path('', include(router.urls)),
     path('coupons/validate/', CouponValidateView.as_view(), name='coupon-validate'),
     path('stats/sales/', sales_stats, name='sales-stats'),
+    path('stats/export/', sales_export, name='sales-export'),
+    path('stats/snapshot/<str:question>/', snapshot_stats, name='snapshot-stats'),
+    path('stats/restock/', restock_forecast, name='restock-forecast'),
 ]
@@ -1,20 +1,24 @@
+import hashlib
+import hmac
 import logging
 import unicodedata
 
+from django.conf import settings
 from django.core.cache import cache
 from django.db import models
 from django.db.models import Value
 from django.db.models.functions import Coalesce, Lower, Replace
-from django.utils import timezone
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, status, viewsets
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.exceptions import NotFound
 from rest_framework.filters import OrderingFilter
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
 
 from .models import (
@@ -22,19 +26,25 @@ from .models import (
     Product,
     SiteConfig,
     Order,
-    OrderItem,
-    Coupon,
     Announcement,
     SITE_CONFIG_CACHE_KEY,
     SITE_CONFIG_CACHE_TIMEOUT,
 )
+from . import analytics, catalog, exports, forecast, metrics, snapshot
+from .coupons import get_cached_coupon
+from .order_feed import order_feed_events
+from .popularity import SEARCH_POPULARITY_WEIGHT
+from .recommendations import RELATED_CACHE_TIMEOUT, related_cache_key, related_products
 from .serializers import (
     CategorySerializer,
     ProductSerializer,
+    ProductStockSerializer,
     SiteConfigSerializer,
     OrderSerializer,
     AnnouncementSerializer,
+    PriceAdjustmentSerializer,
 )
+from .throttling import GCRAScopedRateThrottle
 
 
 logger = logging.getLogger(__name__)
@@ -95,9 +105,12 @@ class ProductViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.
     permission_classes = [AllowAny]
     filter_backends = [DjangoFilterBackend, StockAwareOrderingFilter]
     filterset_fields = ['category', 'promoted']
-    ordering_fields = ['name', 'price', 'offer_price', 'created_at', 'has_offer', 'relevance', 'in_stock']
+    ordering_fields = [
+        'name', 'price', 'offer_price', 'created_at', 'has_offer', 'relevance', 'in_stock', 'popularity'
+    ]
     ordering = ('-in_stock', 'has_offer', 'offer_price')
     pagination_class = ProductPagination
+    BULK_MAX_IDS = 200
 
     def list(self, request, *args, **kwargs):
         try:
@@ -111,6 +124,97 @@ class ProductViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.
             empty = {'count': 0, 'next': None, 'previous': None, 'results': []}
             return Response(empty, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get', 'post'], url_path='bulk')
+    def bulk(self, request):
+        """Minimal price/stock projection for a set of ids, used to refresh persisted carts."""
+        if request.method == 'POST':
+            raw_ids = request.data.get('ids', [])
+        else:
+            raw_ids = [
+                part
+                for value in request.query_params.getlist('ids')
+                for part in value.split(',')
+                if part.strip()
+            ]
+        if not isinstance(raw_ids, list):
+            return Response({'detail': 'ids debe ser una lista'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = sorted({int(pk) for pk in raw_ids})
+        except (TypeError, ValueError):
+            return Response({'detail': 'ids inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.BULK_MAX_IDS:
+            return Response(
+                {'detail': f'Máximo {self.BULK_MAX_IDS} productos por consulta'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Inactive products are included on purpose so the cart can drop them.
+        fields = ProductStockSerializer.Meta.fields
+        products = list(Product.objects.filter(id__in=ids).order_by('id').values(*fields)) if ids else []
+        # The validator comes from the raw column values, so a match skips serialization
+        validator = '|'.join(','.join(str(row[field]) for field in fields) for row in products)
+        etag = '"%s"' % hashlib.md5(validator.encode('utf-8')).hexdigest()
+        if etag in request.headers.get('If-None-Match', ''):
+            # RFC 9110 13.1.2: only GET/HEAD answer a matching If-None-Match with 304
+            if request.method in ('GET', 'HEAD'):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = Response(status=status.HTTP_412_PRECONDITION_FAILED)
+        else:
+            response = Response(ProductStockSerializer(products, many=True).data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='adjust-prices', permission_classes=[IsAdminUser])
+    def adjust_prices(self, request):
+        """Staff: percentage or fixed change to the prices of a category or a list of ids, in one UPDATE."""
+        try:
+            params = catalog.parse_price_adjustment(request.data)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        category_id, raw_ids = request.data.get('category'), request.data.get('ids')
+        if bool(category_id) == bool(raw_ids):
+            return Response({'detail': 'Indicar category o ids (no ambos)'}, status=status.HTTP_400_BAD_REQUEST)
+        # Inactive products are adjusted too so their prices are current when reactivated
+        if category_id:
+            category = Category.objects.filter(pk=category_id).first() if str(category_id).isdigit() else None
+            if category is None:
+                return Response({'detail': 'Categoría inexistente'}, status=status.HTTP_400_BAD_REQUEST)
+            products, scope = Product.objects.filter(category=category), f'Categoría {category.name}'
+        else:
+            if not isinstance(raw_ids, list):
+                return Response({'detail': 'ids debe ser una lista'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                ids = {int(pk) for pk in raw_ids}
+            except (TypeError, ValueError):
+                return Response({'detail': 'ids inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+            products, scope = Product.objects.filter(id__in=ids), f'{len(ids)} productos por id'
+
+        try:
+            entry = catalog.adjust_prices(products, user=request.user, scope=scope, **params)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(PriceAdjustmentSerializer(entry).data)
+
+    @action(detail=True, methods=['get'], url_path='related')
+    def related(self, request, pk=None):
+        """Frequently bought together, read from the materialized top-K list."""
+        try:
+            product_id = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound()
+        key = related_cache_key(product_id)
+        data = cache.get(key)
+        if data is None:
+            serializer = ProductSerializer(
+                related_products(product_id), many=True, context=self.get_serializer_context()
+            )
+            data = list(serializer.data)
+            cache.set(key, data, RELATED_CACHE_TIMEOUT)
+        return Response(data)
+
     def _normalized_field(self, field_name: str):
         """Lowercase field with common accent replacements for accent-tolerant search."""
 
@@ -132,8 +236,11 @@ class ProductViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.
     def get_queryset(self):
         from django.db import connection
 
+        # Best sellers get a head start; text similarity is added on top when available
         qs = self.queryset.annotate(
-            relevance=models.Value(0.0, output_field=models.FloatField())
+            relevance=models.ExpressionWrapper(
+                models.F('popularity') * SEARCH_POPULARITY_WEIGHT, output_field=models.FloatField()
+            )
         )
 
         search_term = self.request.query_params.get('search', '').strip()
@@ -198,7 +305,9 @@ class ProductViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.
                                 | models.Q(description_similarity__gt=0.15)
                             )
                             qs = qs.annotate(
-                                relevance=models.F('name_similarity') + models.F('description_similarity')
+                                relevance=models.F('name_similarity')
+                                + models.F('description_similarity')
+                                + models.F('popularity') * SEARCH_POPULARITY_WEIGHT
                             )
                             if not self.request.query_params.get(OrderingFilter.ordering_param):
                                 self.ordering = ('-in_stock', '-relevance', 'has_offer', 'offer_price')
@@ -244,12 +353,12 @@ class SiteConfigViewSet(viewsets.ViewSet):
 class OrderViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [GCRAScopedRateThrottle]
     throttle_scope = 'orders'
 
 
 class CouponValidateView(APIView):
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [GCRAScopedRateThrottle]
     throttle_scope = 'coupon_validate'
     permission_classes = [AllowAny]
 
@@ -257,23 +366,9 @@ class CouponValidateView(APIView):
         code = request.data.get('code', '').strip()[:40]
         if not code:
             return Response({'detail': 'Código requerido'}, status=status.HTTP_400_BAD_REQUEST)
-        now = timezone.now()
-        c = (
-            Coupon.objects.filter(code__iexact=code, active=True)
-            .filter(
-                models.Q(expires_at__isnull=True) | models.Q(expires_at__gt=now),
-                models.Q(usage_limit__isnull=True) | models.Q(used_count__lt=models.F('usage_limit')),
-            )
-            .first()
-        )
+        c = get_cached_coupon(code)
         if not c:
             return Response({'valid': False}, status=status.HTTP_200_OK)
-        now = timezone.now()
-        if (
-            (c.expires_at and c.expires_at < now)
-            or (c.usage_limit is not None and c.used_count >= c.usage_limit)
-        ):
-            return Response({'valid': False}, status=status.HTTP_200_OK)
 
         data = {
             'valid': True,
@@ -301,75 +396,126 @@ class AnnouncementViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         return qs
 
 
-def _parse_date_param(raw):
-    """Return date object from YYYY-MM-DD string, or None if empty/invalid."""
-    if not raw:
-        return None
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sales_stats(request):
     try:
-        return timezone.datetime.fromisoformat(raw).date()
-    except Exception:
-        return None
+        params = analytics.parse_stats_params(request.query_params)
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.query_params.get('source') == 'orders':
+        # Recompute from OrderItem in one scan, e.g. to audit the daily rollups
+        return Response(analytics.sales_stats_from_items(**params))
+    return Response(analytics.sales_stats(**params))
+
+
+EXPORT_OUTPUTS = {
+    'csv': (exports.iter_csv_lines, 'text/csv; charset=utf-8', 'csv'),
+    'ndjson': (exports.iter_ndjson_lines, 'application/x-ndjson', 'ndjson'),
+}
 
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def sales_stats(request):
-    start = _parse_date_param(request.query_params.get('start'))
-    end = _parse_date_param(request.query_params.get('end'))
-    if request.query_params.get('start') and start is None:
-        return Response({'detail': 'start inválido, use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
-    if request.query_params.get('end') and end is None:
-        return Response({'detail': 'end inválido, use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
-
-    items = OrderItem.objects.select_related('product__category', 'order')
-    if start:
-        items = items.filter(order__created_at__date__gte=start)
-    if end:
-        items = items.filter(order__created_at__date__lte=end)
-
-    by_product = (
-        items.values('product_id', 'product__name')
-        .annotate(
-            quantity=models.Sum('quantity'),
-            revenue=models.Sum(models.F('price') * models.F('quantity')),
-        )
-        .order_by('-revenue')
-    )
+@permission_classes([IsAdminUser])
+def sales_export(request):
+    """Stream orders with their items for ``start``/``end`` as CSV or NDJSON (``?output=``).
 
-    by_category = (
-        items.values('product__category_id', 'product__category__name')
-        .annotate(
-            quantity=models.Sum('quantity'),
-            revenue=models.Sum(models.F('price') * models.F('quantity')),
+    ``?gzip=1`` compresses the stream. ``format`` is left alone because DRF uses
+    it for content negotiation.
+    """
+    try:
+        params = analytics.parse_stats_params(request.query_params)
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    output = request.query_params.get('output', 'csv')
+    if output not in EXPORT_OUTPUTS:
+        return Response(
+            {'detail': f'output debe ser uno de: {", ".join(EXPORT_OUTPUTS)}'},
+            status=status.HTTP_400_BAD_REQUEST,
         )
-        .order_by('-revenue')
-    )
 
-    by_day = (
-        items.annotate(day=models.functions.TruncDay('order__created_at'))
-        .values('day')
-        .annotate(
-            quantity=models.Sum('quantity'),
-            revenue=models.Sum(models.F('price') * models.F('quantity')),
-        )
-        .order_by('day')
-    )
+    lines, content_type, extension = EXPORT_OUTPUTS[output]
+    stream = exports.buffered(lines(params['start'], params['end']))
+    filename = f'ventas.{extension}'
+    if request.query_params.get('gzip') in ('1', 'true'):
+        stream = exports.gzipped(stream)
+        content_type, filename = 'application/gzip', filename + '.gz'
+    if isinstance(request._request, ASGIRequest):
+        stream = exports.as_async(stream)
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Keep reverse proxies from buffering the whole export before relaying it
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
-    by_month = (
-        items.annotate(month=models.functions.TruncMonth('order__created_at'))
-        .values('month')
-        .annotate(
-            quantity=models.Sum('quantity'),
-            revenue=models.Sum(models.F('price') * models.F('quantity')),
-        )
-        .order_by('month')
-    )
 
-    return Response(
-        {
-            'by_product': list(by_product),
-            'by_category': list(by_category),
-            'by_day': list(by_day),
-            'by_month': list(by_month),
-        }
-    )
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def snapshot_stats(request, question):
+    """Answer one of SNAPSHOT_QUESTIONS from the columnar snapshot, never from the database."""
+    answer = snapshot.SNAPSHOT_QUESTIONS.get(question)
+    if answer is None:
+        raise NotFound(f'Consulta desconocida: {question}')
+    try:
+        params = analytics.parse_stats_params(request.query_params)
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        snap = snapshot.SalesSnapshot()
+    except FileNotFoundError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response({
+        'rows': len(snap),
+        'built_at': snap.meta.get('built_at'),
+        'results': answer(snap, params['start'], params['end']),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def restock_forecast(request):
+    """Products by days until stockout; ``?alerts=1`` keeps only those inside the lead time."""
+    try:
+        params = analytics.parse_stats_params(request.query_params)
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(forecast.restock_forecast(
+        top=params['top'],
+        page=params['page'],
+        alerts_only=request.query_params.get('alerts') in ('1', 'true'),
+    ))
+
+
+async def order_feed_stream(request):
+    """Server-Sent Events stream of new orders for staff (plain async view, ASGI only).
+
+    Reconnecting browsers send Last-Event-ID and get the orders they missed first.
+    """
+    is_staff = await sync_to_async(lambda: request.user.is_active and request.user.is_staff)()
+    if not is_staff:
+        return JsonResponse({'detail': 'Solo para staff'}, status=status.HTTP_403_FORBIDDEN)
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would hold a worker for its whole lifetime
+        return JsonResponse(
+            {'detail': 'El feed de pedidos requiere el servidor ASGI'}, status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    try:
+        after_id = int(last_id) if last_id else None
+    except ValueError:
+        return JsonResponse({'detail': 'Last-Event-ID inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(order_feed_events(after_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def prometheus_metrics(request):
+    """Prometheus scrape endpoint; with METRICS_TOKEN set it requires ``Authorization: Bearer <token>``."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    body, content_type = metrics.render_metrics()
+    return HttpResponse(body, content_type=content_type)
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shop.instrumentation.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -130,6 +131,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 DEFAULT_CHARSET = 'utf-8'
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'shop.instrumentation.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
     ],
@@ -146,6 +151,55 @@ REST_FRAMEWORK = {
     },
 }
 
+# Where shop.throttling keeps rate-limit state shared by all workers:
+# 'database' (default) or 'redis' (requires the redis package)
+THROTTLE_STORE = os.environ.get('DJANGO_THROTTLE_STORE', 'database')
+THROTTLE_REDIS_URL = os.environ.get('DJANGO_THROTTLE_REDIS_URL', 'redis://localhost:6379/0')
+
+# Cached data (coupons, sales stats, catalog) is keyed on version stamps stored in the
+# database; each worker re-reads a stamp at most this often (seconds), bounding staleness
+CACHE_VERSION_CHECK_SECONDS = float(os.getenv('DJANGO_CACHE_VERSION_CHECK_SECONDS', '5'))
+
+# Per-request timing (shop.instrumentation): Server-Timing header, one JSON line per
+# request on the "shop.perf" logger, and cProfile dumps for a sample of slow requests
+SERVER_TIMING_HEADER = os.getenv('DJANGO_SERVER_TIMING_HEADER', 'True').lower() in ('1', 'true', 'yes')
+SERVER_TIMING_PROFILE_RATE = float(os.getenv('DJANGO_PROFILE_SAMPLE_RATE', '0'))
+SERVER_TIMING_PROFILE_THRESHOLD_MS = int(os.getenv('DJANGO_PROFILE_THRESHOLD_MS', '500'))
+SERVER_TIMING_PROFILE_DIR = Path(os.getenv('DJANGO_PROFILE_DIR', BASE_DIR / 'var' / 'profiles'))
+
+# Statements slower than this (ms) are logged with their plan to SLOW_QUERY_LOG_FILE; 0 disables
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('DJANGO_SLOW_QUERY_MS', '200'))
+SLOW_QUERY_EXPLAIN = os.getenv('DJANGO_SLOW_QUERY_EXPLAIN', 'True').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_LOG_FILE = Path(os.getenv('DJANGO_SLOW_QUERY_LOG', BASE_DIR / 'var' / 'log' / 'slow_queries.log'))
+
+# Optional bearer token required by /metrics (served by the backend only, not proxied by nginx)
+METRICS_TOKEN = os.getenv('DJANGO_METRICS_TOKEN', '')
+
+CACHES = {
+    'default': {
+        # LocMemCache that also counts hits/misses for Server-Timing
+        'BACKEND': 'shop.instrumentation.InstrumentedLocMemCache',
+    }
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'shop.perf': {
+            'handlers': ['console'],
+            'level': os.getenv('DJANGO_PERF_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Directory holding the columnar sales snapshot written by build_sales_snapshot
+SALES_SNAPSHOT_DIR = Path(os.getenv('DJANGO_SALES_SNAPSHOT_DIR', BASE_DIR / 'var' / 'sales_snapshot'))
+
 # CORS allowed origins; override in production via
 # DJANGO_CORS_ALLOWED_ORIGINS env variable
 CORS_ALLOWED_ORIGINS = [
@@ -4,9 +4,12 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.static import serve
 
+from shop.views import prometheus_metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('shop.urls')),
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
 
 # Serve media files (for production behind Traefik; consider CDN/Nginx for heavy traffic)
@@ -26,6 +26,34 @@ export async function getProducts({ page = 1, search = '', ordering = '', catego
   return r.json()
 }
 
+// Igual que ProductViewSet.BULK_MAX_IDS en el backend
+const BULK_MAX_IDS = 200
+
+export async function getProductsBulk(ids) {
+  let r
+  if (ids.length <= BULK_MAX_IDS) {
+    // GET con los ids ordenados: misma URL para el mismo carrito, así el navegador
+    // revalida con If-None-Match (Cache-Control: no-cache) y recibe 304 si nada cambió
+    const url = new URL(`${API_URL}/products/bulk/`)
+    url.searchParams.set('ids', [...ids].sort((a, b) => a - b).join(','))
+    r = await fetch(url)
+  } else {
+    r = await fetch(`${API_URL}/products/bulk/`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ ids }),
+    })
+  }
+  if (!r.ok) throw new Error('Error al actualizar el carrito')
+  return r.json()
+}
+
+export async function getRelatedProducts(productId) {
+  const r = await fetch(`${API_URL}/products/${productId}/related/`)
+  if (!r.ok) throw new Error('Error al cargar recomendaciones')
+  return r.json()
+}
+
 export async function getSiteConfig() {
   const r = await fetch(`${API_URL}/config/`)
   if (!r.ok) throw new Error('Error al cargar configuración')
@@ -3,6 +3,7 @@ import { AnimatePresence, motion } from 'framer-motion'
 
 const OPTIONS = [
   { value: 'relevance', label: 'Relevancia' },
+  { value: 'popular', label: 'Más vendidos' },
   { value: 'recent', label: 'Más recientes' },
   { value: 'discount', label: 'Con descuento' },
   { value: 'price_high', label: 'Precio más alto' },
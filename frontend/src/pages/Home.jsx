@@ -48,6 +48,7 @@ export default function Home() {
     setError('')
     const orderingMap = {
       recent: '-created_at',
+      popular: '-popularity',
       discount: 'has_offer,offer_price',
       price_high: '-price',
       price_low: 'price',
@@ -1,5 +1,6 @@
 import React, { createContext, useContext, useEffect, useMemo, useState } from 'react'
 import { toast } from 'sonner'
+import { getProductsBulk } from '../api.js'
 
 const CartContext = createContext(null)
 const KEY = 'cart'
@@ -18,6 +19,28 @@ export function CartProvider({ children }) {
     localStorage.setItem(KEY, JSON.stringify(items))
   }, [items])
 
+  // Refrescar precios y stock del carrito persistido en una sola consulta
+  useEffect(() => {
+    const ids = items.map(it => it.product.id)
+    if (ids.length === 0) return
+    let cancelled = false
+    getProductsBulk(ids)
+      .then(rows => {
+        if (cancelled) return
+        const byId = new Map(rows.map(r => [r.id, r]))
+        setItems(prev => prev.flatMap(it => {
+          const fresh = byId.get(it.product.id)
+          if (!fresh || !fresh.is_active || fresh.stock <= 0) return []
+          const product = { ...it.product, price: fresh.price, offer_price: fresh.offer_price, stock: fresh.stock }
+          return [{ product, quantity: Math.min(it.quantity, fresh.stock) }]
+        }))
+      })
+      .catch(() => {})
+    return () => { cancelled = true }
+    // Solo al montar: el carrito viene de localStorage
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [])
+
   const add = (product, quantity = 1) => {
     setItems(prev => {
       const idx = prev.findIndex(p => p.product.id === product.id)